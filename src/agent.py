@@ -1,252 +1,384 @@
-from environment import Obstacle, FoodArea, HidingSpot
-import pygame
-import random
-import math
-
-class Agent:
-    def __init__(self, x, y):
-        self.position = pygame.Vector2(x, y)
-        self.velocity = pygame.Vector2(random.uniform(-1, 1), random.uniform(-1, 1)).normalize()
-        self.acceleration = pygame.Vector2(0, 0)
-        self.max_speed = 2
-        self.max_speed_squared = 4
-        self.max_force = 0.05
-        self.perception_radius = 75
-        self.perception_radius_squared = 5625
-        self.energy = 150
-        self.max_energy = 300
-        self.radius = 5
-        self.age = 0
-
-    def update(self, width, height):
-        self.velocity += self.acceleration
-        if self.velocity.length_squared() > self.max_speed_squared:
-            self.velocity.scale_to_length(self.max_speed)
-        self.position += self.velocity
-        self.acceleration *= 0
-        self.wrap(width, height)
-        self.age += 1
-
-    def wrap(self, width, height):
-        self.position.x %= width
-        self.position.y %= height
-
-    def seek(self, target):
-        desired = target - self.position
-        if desired.length_squared() > 0:
-            desired.scale_to_length(self.max_speed)
-            steer = desired - self.velocity
-            return self.limit_force(steer)
-        return pygame.Vector2(0, 0)
-
-    def limit_force(self, force):
-        if force.length_squared() > self.max_force * self.max_force:
-            force.scale_to_length(self.max_force)
-        return force
-
-    def avoid_obstacle(self, obstacle):
-        to_obstacle = obstacle.position - self.position
-        distance_squared = to_obstacle.length_squared()
-        if distance_squared < (obstacle.radius + self.radius + 10) ** 2:
-            avoid_force = -to_obstacle
-            if avoid_force.length_squared() > 0:
-                avoid_force.scale_to_length(self.max_force * 2)
-                self.acceleration += avoid_force
-
-    def draw(self, screen):
-        pygame.draw.circle(screen, self.color, (int(self.position.x), int(self.position.y)), self.radius)
-
-class Prey(Agent):
-    energy_decay_rate = 0.01
-    energy_gain_rate = 0.15
-    reproduction_energy_cost = 75
-    reproduction_interval = 400
-
-    def __init__(self, x, y):
-        super().__init__(x, y)
-        self.color = (46, 139, 87)  # Sea Green
-        self.reproduction_timer = 0
-
-    def update(self, prey_list, predator_list, width, height, obstacles, food_areas, hiding_spots, spatial_hash_prey, spatial_hash_predator, cell_size):
-        self.energy -= self.energy_decay_rate
-        if self.energy <= 0:
-            prey_list.remove(self)
-            return
-
-        nearby_prey = self.get_nearby_agents(spatial_hash_prey, cell_size)
-        nearby_predators = self.get_nearby_agents(spatial_hash_predator, cell_size)
-
-        self.acceleration = (
-            self.flock(nearby_prey) * 0.3 +
-            self.evade(nearby_predators) * 2.5 +
-            self.avoid_obstacles(obstacles) * 1.2 +
-            self.seek_food(food_areas) * 0.5 +
-            self.use_hiding_spots(hiding_spots, nearby_predators) * 0.7
-        )
-
-        self.acceleration = self.limit_force(self.acceleration)
-
-        super().update(width, height)
-        
-        self.reproduction_timer += 1
-        if self.reproduction_timer >= self.reproduction_interval and self.energy > self.reproduction_energy_cost:
-            self.reproduce(prey_list)
-            self.reproduction_timer = 0
-
-    def get_nearby_agents(self, spatial_hash, cell_size):
-        cell_x, cell_y = int(self.position.x // cell_size), int(self.position.y // cell_size)
-        return [agent for dx in (-1, 0, 1) for dy in (-1, 0, 1)
-                for agent in spatial_hash.get((cell_x + dx, cell_y + dy), [])]
-
-    def flock(self, nearby_prey):
-        alignment = cohesion = separation = pygame.Vector2(0, 0)
-        total = 0
-
-        for other in nearby_prey:
-            if other != self:
-                offset = other.position - self.position
-                distance_squared = offset.length_squared()
-                
-                if distance_squared > 0:  # Add this check
-                    separation += offset.normalize() / math.sqrt(distance_squared)
-                
-                alignment += other.velocity
-                cohesion += other.position
-                total += 1
-
-        if total > 0:
-            alignment = (alignment / total).normalize() * self.max_speed - self.velocity
-            cohesion = ((cohesion / total) - self.position).normalize() * self.max_speed - self.velocity
-            separation = (separation / total).normalize() * self.max_speed - self.velocity
-
-            return self.limit_force(alignment * 0.5 + cohesion * 0.3 + separation * 0.5)
-        return pygame.Vector2(0, 0)
-
-    def evade(self, nearby_predators):
-        evade_force = pygame.Vector2(0, 0)
-        for predator in nearby_predators:
-            offset = self.position - predator.position
-            distance_squared = offset.length_squared()
-            if distance_squared < self.perception_radius_squared:
-                if distance_squared > 0:
-                    evade_force += offset.normalize() * self.max_speed
-                else:
-                    evade_force += pygame.Vector2(random.uniform(-1, 1), random.uniform(-1, 1)).normalize() * self.max_speed
-        return self.limit_force(evade_force)
-
-    def avoid_obstacles(self, obstacles):
-        avoid_force = pygame.Vector2(0, 0)
-        for obstacle in obstacles:
-            offset = self.position - obstacle.position
-            distance_squared = offset.length_squared()
-            if distance_squared < (obstacle.radius + self.radius + 10) ** 2:
-                avoid_force += offset.normalize() * self.max_speed
-        return self.limit_force(avoid_force)
-
-    def seek_food(self, food_areas):
-        food_force = pygame.Vector2(0, 0)
-        for food_area in food_areas:
-            offset = food_area.position - self.position
-            if offset.length_squared() < food_area.radius ** 2:
-                self.energy = min(self.energy + self.energy_gain_rate, self.max_energy)
-                food_force += self.seek(food_area.position)
-        return self.limit_force(food_force)
-
-    def use_hiding_spots(self, hiding_spots, nearby_predators):
-        hiding_force = pygame.Vector2(0, 0)
-        for hiding_spot in hiding_spots:
-            for predator in nearby_predators:
-                if (self.position - predator.position).length_squared() < self.perception_radius_squared:
-                    offset = hiding_spot.position - self.position
-                    if offset.length_squared() < hiding_spot.radius ** 2:
-                        hiding_force += self.seek(hiding_spot.position)
-                        self.velocity *= 0.8
-        return self.limit_force(hiding_force)
-
-    def reproduce(self, prey_list):
-        if len(prey_list) < 150:  # Changed from 250 to 150
-            self.energy -= self.reproduction_energy_cost
-            new_prey = Prey(self.position.x, self.position.y)
-            new_prey.energy = self.reproduction_energy_cost / 2
-            prey_list.append(new_prey)
-
-class Predator(Agent):
-    energy_decay_rate = 0.015
-    energy_gain_from_prey = 40
-    reproduction_threshold = 6
-    reproduction_energy_cost = 120
-
-    def __init__(self, x, y):
-        super().__init__(x, y)
-        self.color = (178, 34, 34)  # Firebrick
-        self.prey_eaten = 0
-        self.max_speed = 1.8
-
-    def update(self, prey_list, predator_list, width, height, obstacles, food_areas, hiding_spots, spatial_hash_prey, spatial_hash_predator, cell_size):
-        self.energy -= self.energy_decay_rate
-        if self.energy <= 0:
-            predator_list.remove(self)
-            return
-
-        nearby_prey = self.get_nearby_agents(spatial_hash_prey, cell_size)
-
-        closest_prey = None
-        closest_distance_squared = float('inf')
-
-        for prey in nearby_prey:
-            distance_squared = (prey.position - self.position).length_squared()
-            if distance_squared < closest_distance_squared and distance_squared < self.perception_radius_squared:
-                closest_prey = prey
-                closest_distance_squared = distance_squared
-
-        if closest_prey:
-            self.acceleration = self.seek(closest_prey.position) * 0.8
-        else:
-            self.acceleration = pygame.Vector2(random.uniform(-1, 1), random.uniform(-1, 1)).normalize() * (self.max_force * 0.5)
-
-        for obstacle in obstacles:
-            self.avoid_obstacle(obstacle)
-
-        for hiding_spot in hiding_spots:
-            offset = self.position - hiding_spot.position
-            distance_squared = offset.length_squared()
-            if distance_squared < (hiding_spot.radius * 1.5) ** 2:
-                repel_force = offset.normalize() * self.max_force * 0.3
-                self.acceleration += repel_force
-
-        super().update(width, height)
-
-        for prey in nearby_prey:
-            if (self.position - prey.position).length_squared() < (self.radius + prey.radius) ** 2:
-                if prey in prey_list:
-                    prey_list.remove(prey)
-                    self.prey_eaten += 1
-                    self.energy = min(self.energy + self.energy_gain_from_prey, self.max_energy)
-                
-                    if self.prey_eaten >= self.reproduction_threshold and self.energy > self.reproduction_energy_cost * 1.2:
-                        self.reproduce(predator_list)
-                        self.prey_eaten = 0
-                break
-
-    def reproduce(self, predator_list):
-        if len(predator_list) < 15:
-            self.energy -= self.reproduction_energy_cost
-            new_predator = Predator(self.position.x, self.position.y)
-            new_predator.energy = self.reproduction_energy_cost / 2
-            predator_list.append(new_predator)
-
-    def get_nearby_cells(self, cell_size):
-        x, y = int(self.position.x // cell_size), int(self.position.y // cell_size)
-        return [
-            (x + dx, y + dy)
-            for dx in [-1, 0, 1]
-            for dy in [-1, 0, 1]
-        ]
-
-    def get_nearby_agents(self, spatial_hash, cell_size):
-        nearby_cells = self.get_nearby_cells(cell_size)
-        nearby_agents = []
-        for cell in nearby_cells:
-            if cell in spatial_hash:
-                nearby_agents.extend(spatial_hash[cell])
-        return nearby_agents
\ No newline at end of file
+from environment import Obstacle, FoodArea, HidingSpot
+import pygame
+import random
+import math
+
+class Agent:
+    def __init__(self, x, y, rng=random):
+        self.position = pygame.Vector2()
+        self.velocity = pygame.Vector2()
+        self.acceleration = pygame.Vector2()
+        self.reset(x, y, rng)
+
+    def reset(self, x, y, rng=random):
+        """Give the agent the state of a newborn at (x, y), reusing its vectors."""
+        self.rng = rng
+        self.position.update(x, y)
+        self.velocity.update(rng.uniform(-1, 1), rng.uniform(-1, 1))
+        self.velocity.normalize_ip()
+        self.acceleration.update(0, 0)
+        self.max_speed = 2
+        self.max_speed_squared = 4
+        self.max_force = 0.05
+        self.perception_radius = 75
+        self.perception_radius_squared = 5625
+        self.energy = 150
+        self.max_energy = 300
+        self.radius = 5
+        self.age = 0
+        self.alive = True
+
+    def update(self, width, height):
+        self.velocity += self.acceleration
+        if self.velocity.length_squared() > self.max_speed_squared:
+            self.velocity.scale_to_length(self.max_speed)
+        self.position += self.velocity
+        self.acceleration *= 0
+        self.wrap(width, height)
+        self.age += 1
+
+    def wrap(self, width, height):
+        self.position.x %= width
+        self.position.y %= height
+
+    def seek(self, target):
+        desired = target - self.position
+        if desired.length_squared() > 0:
+            desired.scale_to_length(self.max_speed)
+            steer = desired - self.velocity
+            return self.limit_force(steer)
+        return pygame.Vector2(0, 0)
+
+    def limit_force(self, force):
+        if force.length_squared() > self.max_force * self.max_force:
+            force.scale_to_length(self.max_force)
+        return force
+
+    def avoid_obstacle(self, obstacle):
+        to_obstacle = obstacle.position - self.position
+        distance_squared = to_obstacle.length_squared()
+        if distance_squared < (obstacle.radius + self.radius + 10) ** 2:
+            avoid_force = -to_obstacle
+            if avoid_force.length_squared() > 0:
+                avoid_force.scale_to_length(self.max_force * 2)
+                self.acceleration += avoid_force
+
+    def draw(self, screen):
+        pygame.draw.circle(screen, self.color, (int(self.position.x), int(self.position.y)), self.radius)
+
+class Prey(Agent):
+    energy_decay_rate = 0.01
+    energy_gain_rate = 0.15
+    reproduction_energy_cost = 75
+    reproduction_interval = 400
+    max_population = 150
+    # Weights of the steering behaviours
+    flock_weight = 0.3
+    evade_weight = 2.5
+    obstacle_weight = 1.2
+    food_weight = 0.5
+    hiding_weight = 0.7
+
+    def reset(self, x, y, rng=random):
+        super().reset(x, y, rng)
+        self.color = (46, 139, 87)  # Sea Green
+        self.reproduction_timer = 0
+
+    def update(self, lifecycle, width, height, obstacles, food_areas, hiding_spots, spatial_hash_prey, spatial_hash_predator, cell_size):
+        self.energy -= self.energy_decay_rate
+        if self.energy <= 0:
+            lifecycle.remove(self)
+            return
+
+        nearby_prey = self.get_nearby_agents(spatial_hash_prey, cell_size)
+        threats = self.find_threats(self.get_nearby_agents(spatial_hash_predator, cell_size))
+
+        self.acceleration = (
+            self.flock(nearby_prey) * self.flock_weight +
+            self.evade(threats) * self.evade_weight +
+            self.avoid_obstacles(obstacles) * self.obstacle_weight +
+            self.seek_food(food_areas) * self.food_weight +
+            self.use_hiding_spots(hiding_spots, len(threats)) * self.hiding_weight
+        )
+
+        self.acceleration = self.limit_force(self.acceleration)
+
+        super().update(width, height)
+        
+        self.reproduction_timer += 1
+        if self.reproduction_timer >= self.reproduction_interval and self.energy > self.reproduction_energy_cost:
+            self.reproduce(lifecycle)
+            self.reproduction_timer = 0
+
+    def get_nearby_agents(self, spatial_hash, cell_size):
+        cell_x, cell_y = int(self.position.x // cell_size), int(self.position.y // cell_size)
+        return [agent for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                for agent in spatial_hash.get((cell_x + dx, cell_y + dy), [])]
+
+    def flock(self, nearby_prey):
+        alignment = pygame.Vector2(0, 0)
+        cohesion = pygame.Vector2(0, 0)
+        separation = pygame.Vector2(0, 0)
+        total = 0
+
+        for other in nearby_prey:
+            if other != self:
+                offset = other.position - self.position
+                distance_squared = offset.length_squared()
+                
+                if distance_squared > 0:  # Add this check
+                    separation += offset.normalize() / math.sqrt(distance_squared)
+                
+                alignment += other.velocity
+                cohesion += other.position
+                total += 1
+
+        if total > 0:
+            alignment = (alignment / total).normalize() * self.max_speed - self.velocity
+            cohesion = ((cohesion / total) - self.position).normalize() * self.max_speed - self.velocity
+            separation = (separation / total).normalize() * self.max_speed - self.velocity
+
+            return self.limit_force(alignment * 0.5 + cohesion * 0.3 + separation * 0.5)
+        return pygame.Vector2(0, 0)
+
+    def find_threats(self, nearby_predators):
+        """Offsets from every predator within perception to this prey; evade
+        and use_hiding_spots both work from this one distance pass."""
+        threats = []
+        for predator in nearby_predators:
+            offset = self.position - predator.position
+            if offset.length_squared() < self.perception_radius_squared:
+                threats.append(offset)
+        return threats
+
+    def evade(self, threats):
+        evade_force = pygame.Vector2(0, 0)
+        for offset in threats:
+            if offset.length_squared() > 0:
+                evade_force += offset.normalize() * self.max_speed
+            else:
+                evade_force += pygame.Vector2(self.rng.uniform(-1, 1), self.rng.uniform(-1, 1)).normalize() * self.max_speed
+        return self.limit_force(evade_force)
+
+    def avoid_obstacles(self, obstacles):
+        avoid_force = pygame.Vector2(0, 0)
+        for obstacle in obstacles:
+            offset = self.position - obstacle.position
+            distance_squared = offset.length_squared()
+            if distance_squared < (obstacle.radius + self.radius + 10) ** 2:
+                avoid_force += offset.normalize() * self.max_speed
+        return self.limit_force(avoid_force)
+
+    def seek_food(self, food_areas):
+        food_force = pygame.Vector2(0, 0)
+        for food_area in food_areas:
+            offset = food_area.position - self.position
+            if offset.length_squared() < food_area.radius ** 2:
+                self.energy = min(self.energy + self.energy_gain_rate, self.max_energy)
+                food_force += self.seek(food_area.position)
+        return self.limit_force(food_force)
+
+    def use_hiding_spots(self, hiding_spots, threat_count):
+        hiding_force = pygame.Vector2(0, 0)
+        if not threat_count:
+            return hiding_force
+        for hiding_spot in hiding_spots:
+            offset = hiding_spot.position - self.position
+            if offset.length_squared() < hiding_spot.radius ** 2:
+                # Once per threatening predator
+                for _ in range(threat_count):
+                    hiding_force += self.seek(hiding_spot.position)
+                    self.velocity *= 0.8
+        return self.limit_force(hiding_force)
+
+    def reproduce(self, lifecycle):
+        if lifecycle.prey_count < lifecycle.max_prey:
+            self.energy -= self.reproduction_energy_cost
+            new_prey = lifecycle.spawn(Prey, self.position.x, self.position.y, self.rng)
+            new_prey.energy = self.reproduction_energy_cost / 2
+            lifecycle.add(new_prey)
+
+class Predator(Agent):
+    energy_decay_rate = 0.015
+    energy_gain_from_prey = 40
+    reproduction_threshold = 6
+    reproduction_energy_cost = 120
+    max_population = 15
+    # Weights of chasing prey and of wandering, as fractions of max_force for the latter
+    chase_weight = 0.8
+    wander_weight = 0.5
+
+    def reset(self, x, y, rng=random):
+        super().reset(x, y, rng)
+        self.color = (178, 34, 34)  # Firebrick
+        self.prey_eaten = 0
+        self.max_speed = 1.8
+
+    def update(self, lifecycle, width, height, obstacles, food_areas, hiding_spots, spatial_hash_prey, spatial_hash_predator, cell_size):
+        self.energy -= self.energy_decay_rate
+        if self.energy <= 0:
+            lifecycle.remove(self)
+            return
+
+        nearby_prey = self.get_nearby_agents(spatial_hash_prey, cell_size)
+
+        closest_prey = None
+        closest_distance_squared = float('inf')
+
+        # Prey seen now are the only ones close enough to catch after moving
+        visible_prey = []
+        for prey in nearby_prey:
+            if not prey.alive:
+                continue
+            distance_squared = (prey.position - self.position).length_squared()
+            if distance_squared < self.perception_radius_squared:
+                visible_prey.append(prey)
+                if distance_squared < closest_distance_squared:
+                    closest_prey = prey
+                    closest_distance_squared = distance_squared
+
+        if closest_prey:
+            self.acceleration = self.seek(closest_prey.position) * self.chase_weight
+        else:
+            self.acceleration = pygame.Vector2(self.rng.uniform(-1, 1), self.rng.uniform(-1, 1)).normalize() * (self.max_force * self.wander_weight)
+
+        for obstacle in obstacles:
+            self.avoid_obstacle(obstacle)
+
+        for hiding_spot in hiding_spots:
+            offset = self.position - hiding_spot.position
+            distance_squared = offset.length_squared()
+            if distance_squared < (hiding_spot.radius * 1.5) ** 2:
+                repel_force = offset.normalize() * self.max_force * 0.3
+                self.acceleration += repel_force
+
+        super().update(width, height)
+
+        # Claim the nearest prey in contact; the kill is settled by the lifecycle
+        caught_prey = None
+        caught_distance_squared = float('inf')
+        for prey in visible_prey:
+            distance_squared = (self.position - prey.position).length_squared()
+            if distance_squared < (self.radius + prey.radius) ** 2 and distance_squared < caught_distance_squared:
+                caught_prey = prey
+                caught_distance_squared = distance_squared
+
+        if caught_prey:
+            lifecycle.claim(self, caught_prey, caught_distance_squared)
+
+    def eat(self, prey, lifecycle):
+        lifecycle.remove(prey)
+        self.prey_eaten += 1
+        self.energy = min(self.energy + self.energy_gain_from_prey, self.max_energy)
+
+        if self.prey_eaten >= self.reproduction_threshold and self.energy > self.reproduction_energy_cost * 1.2:
+            self.reproduce(lifecycle)
+            self.prey_eaten = 0
+
+    def reproduce(self, lifecycle):
+        if lifecycle.predator_count < lifecycle.max_predators:
+            self.energy -= self.reproduction_energy_cost
+            new_predator = lifecycle.spawn(Predator, self.position.x, self.position.y, self.rng)
+            new_predator.energy = self.reproduction_energy_cost / 2
+            lifecycle.add(new_predator)
+
+    def get_nearby_cells(self, cell_size):
+        x, y = int(self.position.x // cell_size), int(self.position.y // cell_size)
+        return [
+            (x + dx, y + dy)
+            for dx in [-1, 0, 1]
+            for dy in [-1, 0, 1]
+        ]
+
+    def get_nearby_agents(self, spatial_hash, cell_size):
+        nearby_cells = self.get_nearby_cells(cell_size)
+        nearby_agents = []
+        for cell in nearby_cells:
+            if cell in spatial_hash:
+                nearby_agents.extend(spatial_hash[cell])
+        return nearby_agents
+
+class AgentPool:
+    """Dead agents kept for reuse, by class.
+
+    acquire() re-initialises a pooled agent in place, drawing the same random
+    numbers a new one would, so recycling never changes a run; it only
+    constructs a new agent when the pool is empty.
+    """
+
+    def __init__(self):
+        self.free = {}
+
+    def __len__(self):
+        return sum(len(agents) for agents in self.free.values())
+
+    def acquire(self, cls, x, y, rng=random):
+        free = self.free.get(cls)
+        if not free:
+            return cls(x, y, rng)
+        agent = free.pop()
+        agent.reset(x, y, rng)
+        return agent
+
+    def release(self, agents):
+        for agent in agents:
+            self.free.setdefault(type(agent), []).append(agent)
+
+class Lifecycle:
+    """Deaths, births and kills recorded while the agents of one tick update.
+
+    Agents are only flagged with ``alive = False`` during the tick; finish()
+    settles predator claims and compacts both lists in a single pass. When two
+    predators catch the same prey, the closer one gets it and ties go to the
+    predator that updated first. Newborns come from ``pool`` and the dead go
+    back to it; births stop at ``max_prey`` and ``max_predators``.
+    """
+
+    def __init__(self, prey_list, predator_list, pool=None, max_prey=Prey.max_population,
+                 max_predators=Predator.max_population):
+        self.prey_list = prey_list
+        self.predator_list = predator_list
+        self.pool = AgentPool() if pool is None else pool
+        self.max_prey = max_prey
+        self.max_predators = max_predators
+        self.prey_count = len(prey_list)
+        self.predator_count = len(predator_list)
+        self.prey_births = []
+        self.predator_births = []
+        self.claims = {}
+        self.claim_count = 0
+
+    def remove(self, agent):
+        agent.alive = False
+        if isinstance(agent, Prey):
+            self.prey_count -= 1
+        else:
+            self.predator_count -= 1
+
+    def spawn(self, cls, x, y, rng=random):
+        return self.pool.acquire(cls, x, y, rng)
+
+    def add(self, agent):
+        if isinstance(agent, Prey):
+            self.prey_births.append(agent)
+            self.prey_count += 1
+        else:
+            self.predator_births.append(agent)
+            self.predator_count += 1
+
+    def claim(self, predator, prey, distance_squared):
+        # Predators claim at most once per tick, in update order
+        order = self.claim_count
+        self.claim_count += 1
+        current = self.claims.get(prey)
+        if current is None or distance_squared < current[0]:
+            self.claims[prey] = (distance_squared, order, predator)
+
+    def finish(self):
+        for prey, (_, _, predator) in sorted(self.claims.items(), key=lambda claim: claim[1][1]):
+            predator.eat(prey, self)
+
+        for agents, births in ((self.prey_list, self.prey_births), (self.predator_list, self.predator_births)):
+            self.pool.release(agent for agent in agents if not agent.alive)
+            agents[:] = [agent for agent in agents if agent.alive]
+            agents.extend(births)
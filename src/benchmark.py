@@ -0,0 +1,214 @@
+from simulation import (Simulation, VectorSimulation, SIMULATION_WIDTH, SIMULATION_HEIGHT, NUM_PREY, NUM_OBSTACLES,
+                        NUM_FOOD_AREAS, NUM_HIDING_SPOTS)
+from sweep import apply_parameters
+import argparse
+import json
+import numpy as np
+import platform
+import sys
+import time
+import tracemalloc
+
+ENGINES = {'vector': VectorSimulation, 'object': Simulation}
+
+
+def scaled_world(agents):
+    """World settings for ``agents`` prey (plus 1% predators) at the default density."""
+    scale = (agents / NUM_PREY) ** 0.5
+    return {'width': int(SIMULATION_WIDTH * scale), 'height': int(SIMULATION_HEIGHT * scale), 'num_prey': agents,
+            'num_predators': max(agents // 100, 1), 'num_obstacles': int(NUM_OBSTACLES * scale ** 2),
+            'num_food_areas': int(NUM_FOOD_AREAS * scale ** 2), 'num_hiding_spots': int(NUM_HIDING_SPOTS * scale ** 2)}
+
+def dense_flock(simulation):
+    """Pack every prey into one disk in the middle of the world."""
+    rng = np.random.default_rng(0)
+    n = simulation.num_prey
+    radius = 3 * n ** 0.5
+    angle = rng.uniform(0, 2 * np.pi, n)
+    distance = radius * np.sqrt(rng.uniform(0, 1, n))
+    positions = np.column_stack((simulation.width / 2 + distance * np.cos(angle),
+                                 simulation.height / 2 + distance * np.sin(angle)))
+    if isinstance(simulation, VectorSimulation):
+        simulation.prey.position[:n] = positions
+        simulation.prey_grid.rebuild(simulation.prey.position[:n])
+    else:
+        for prey, (x, y) in zip(simulation.prey_list, positions):
+            prey.position.update(x, y)
+
+# Each scenario is the world's constructor arguments, species parameter
+# overrides (vector engine only) and an optional setup applied after reset.
+SCENARIOS = {
+    'sparse': {'world': {'width': 3000, 'height': 2000, 'num_prey': 200, 'num_predators': 3}, 'ticks': 500},
+    'dense_flock': {'world': {'num_prey': 1000, 'num_predators': 3}, 'setup': dense_flock,
+                    'parameters': {'prey.max_population': 2000}, 'ticks': 50},
+    'heavy_predation': {'world': {'num_prey': 1000, 'num_predators': 100},
+                        'parameters': {'prey.max_population': 2000, 'predator.max_population': 500},
+                        'ticks': 200},
+    'many_features': {'world': {'num_prey': 500, 'num_obstacles': 60, 'num_food_areas': 40,
+                                'num_hiding_spots': 40}, 'ticks': 200},
+    'agents_1k': {'world': scaled_world(1000), 'ticks': 200, 'scaling': True},
+    'agents_10k': {'world': scaled_world(10000), 'ticks': 50, 'scaling': True},
+    'agents_100k': {'world': scaled_world(100000), 'ticks': 10, 'scaling': True},
+    # 100x the default area at the default density, with and without sleeping
+    'quiet_100x': {'world': dict(scaled_world(10000), num_predators=30), 'ticks': 50},
+    'quiet_100x_lod': {'world': dict(scaled_world(10000), num_predators=30, sleep_interval=8), 'ticks': 50},
+}
+
+def agent_count(simulation):
+    return simulation.prey_stats.count + simulation.predator_stats.count
+
+def build(scenario, engine, seed):
+    simulation = ENGINES[engine](seed=seed, **scenario['world'])
+    if engine == 'vector' and scenario.get('parameters'):
+        apply_parameters(simulation, scenario['parameters'])
+    if scenario.get('setup'):
+        scenario['setup'](simulation)
+    return simulation
+
+def run_scenario(name, engine='vector', seed=0, tick_scale=1.0, warmup=2):
+    """Time one scenario from a fixed seed.
+
+    The timed run and the memory run are separate so that tracemalloc's
+    overhead does not show up in the timings. Peak memory covers building
+    the world plus one tick, which is where the largest arrays live.
+    """
+    scenario = SCENARIOS[name]
+    ticks = max(int(scenario['ticks'] * tick_scale), 1)
+
+    simulation = build(scenario, engine, seed)
+    simulation.step(warmup)
+    agent_ticks = 0
+    awake = 0.0
+    start = time.perf_counter()
+    for _ in range(ticks):
+        agent_ticks += agent_count(simulation)
+        prey = simulation.prey_stats.count
+        simulation.step()
+        awake += getattr(simulation, 'awake', prey) / max(prey, 1)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    build(scenario, engine, seed).step()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'scenario': name,
+        'engine': engine,
+        'seed': seed,
+        'ticks': ticks,
+        'seconds': seconds,
+        'ticks_per_second': ticks / seconds,
+        'mean_agents': agent_ticks / ticks,
+        'microseconds_per_agent_tick': 1e6 * seconds / max(agent_ticks, 1),
+        'peak_memory_bytes': peak_memory,
+        'final_prey': simulation.prey_stats.count,
+        'final_predators': simulation.predator_stats.count,
+        'awake_fraction': awake / ticks,
+    }
+
+def detail_error(name, seed=0, tick_scale=1.0):
+    """Run a sleeping scenario next to the same world at full detail and
+    report how far the population aggregates drift apart (relative errors)."""
+    scenario = SCENARIOS[name]
+    full = dict(scenario, world=dict(scenario['world'], sleep_interval=1))
+    ticks = max(int(scenario['ticks'] * tick_scale), 1)
+    runs = [build(spec, 'vector', seed) for spec in (scenario, full)]
+    prey_error = 0.0
+    for _ in range(ticks):
+        for simulation in runs:
+            simulation.step()
+        prey_error = max(prey_error, abs(runs[0].prey_stats.count - runs[1].prey_stats.count) /
+                         max(runs[1].prey_stats.count, 1))
+    lod, reference = (simulation.prey_stats for simulation in runs)
+    return {
+        'max_prey_count_error': prey_error,
+        'prey_energy_error': abs(lod.mean_energy - reference.mean_energy) / max(reference.mean_energy, 1e-9),
+        'kills': [runs[0].predator_stats.kills, runs[1].predator_stats.kills],
+    }
+
+def scaling_exponent(results):
+    """Slope of log(seconds per tick) against log(agents) over the scaling
+    scenarios: 1.0 is linear, 2.0 is quadratic. None with fewer than two."""
+    points = [(result['mean_agents'], 1 / result['ticks_per_second']) for result in results
+              if SCENARIOS[result['scenario']].get('scaling')]
+    if len(points) < 2:
+        return None
+    agents, seconds = np.log(np.array(points)).T
+    return float(np.polyfit(agents, seconds, 1)[0])
+
+def compare(results, baseline, tolerance=0.1):
+    """Scenarios whose ticks/s dropped more than ``tolerance`` (a fraction)
+    below the baseline run of the same scenario and engine."""
+    previous = {(result['scenario'], result['engine']): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get((result['scenario'], result['engine']))
+        if old is None:
+            continue
+        change = result['ticks_per_second'] / old['ticks_per_second'] - 1
+        if change < -tolerance:
+            regressions.append({'scenario': result['scenario'], 'engine': result['engine'],
+                                'baseline': old['ticks_per_second'], 'current': result['ticks_per_second'],
+                                'change': change})
+    return regressions
+
+def run_benchmarks(names, engine='vector', seed=0, tick_scale=1.0, errors=False):
+    results = []
+    for name in names:
+        result = run_scenario(name, engine, seed, tick_scale)
+        if errors and engine == 'vector' and SCENARIOS[name]['world'].get('sleep_interval', 1) > 1:
+            result['detail_error'] = detail_error(name, seed, tick_scale)
+        print(f"{name:16} {result['ticks_per_second']:10.2f} ticks/s {result['microseconds_per_agent_tick']:8.3f} "
+              f"us/agent-tick {result['peak_memory_bytes'] / 2 ** 20:8.1f} MiB peak", file=sys.stderr)
+        results.append(result)
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'results': results,
+        'scaling_exponent': scaling_exponent(results),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the simulation on standard headless scenarios.")
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO',
+                        help="default: all of " + ', '.join(SCENARIOS))
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='vector')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tick-scale', type=float, default=1.0,
+                        help="multiply every scenario's tick count, e.g. 0.1 for a quick check")
+    parser.add_argument('--detail-error', action='store_true',
+                        help="also run sleeping scenarios at full detail and report the difference")
+    parser.add_argument('--out', help="write the results as JSON")
+    parser.add_argument('--baseline', help="JSON from an earlier run to compare ticks/s against")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="slowdown, as a fraction, reported as a regression (default 0.1)")
+    args = parser.parse_args(argv)
+
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario: {name}")
+    report = run_benchmarks(args.scenarios or list(SCENARIOS), args.engine, args.seed, args.tick_scale,
+                            args.detail_error)
+    if report['scaling_exponent'] is not None:
+        print(f"scaling exponent {report['scaling_exponent']:.2f}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare(report['results'], json.load(f), args.tolerance)
+        for regression in report['regressions']:
+            print(f"REGRESSION {regression['scenario']}: {regression['baseline']:.1f} -> "
+                  f"{regression['current']:.1f} ticks/s ({regression['change']:+.0%})", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    return 1 if report.get('regressions') else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+from simulation import VectorSimulation
+import numpy as np
+
+def save_checkpoint(simulation, path, compress=False):
+    """Write the complete state of ``simulation`` to an .npz file.
+
+    Uncompressed checkpoints are written and read at disk speed; ``compress``
+    trades time for size when checkpoints are archived.
+    """
+    save = np.savez_compressed if compress else np.savez
+    with open(path, 'wb') as file:
+        save(file, **simulation.state())
+
+def load_state(path):
+    with np.load(path, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+def load_checkpoint(path, cls=VectorSimulation, seed=None, **kwargs):
+    """New simulation of type ``cls`` restored from a checkpoint file.
+
+    Without a ``seed`` the restored world continues exactly as the saved one
+    would have; with one its random streams restart from that seed.
+    """
+    simulation = cls(num_prey=0, num_predators=0, num_obstacles=0, num_food_areas=0, num_hiding_spots=0, **kwargs)
+    simulation.load_state(load_state(path))
+    if seed is not None:
+        simulation.reseed(seed)
+    return simulation
+
+def fork_many(state, branches, seeds=None, cls=VectorSimulation, **kwargs):
+    """``branches`` simulations all restored from one state (a dict from
+    state() or load_state()). ``seeds`` gives every branch its own random
+    streams; without it the branches start out identical and differ only by
+    the parameters the caller changes afterwards."""
+    simulations = []
+    for branch in range(branches):
+        simulation = cls(num_prey=0, num_predators=0, num_obstacles=0, num_food_areas=0, num_hiding_spots=0, **kwargs)
+        simulation.load_state(state)
+        if seeds is not None:
+            simulation.reseed(seeds[branch])
+        simulations.append(simulation)
+    return simulations
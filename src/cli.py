@@ -0,0 +1,160 @@
+from scenario import ENGINES, build_simulation, load_scenario, scenario_parameters, simulation_settings
+from scheduler import SPEEDS
+from telemetry import OVERFLOW_POLICIES
+import argparse
+import json
+import os
+import sys
+import time
+
+# Only the viewer modes import pygame (through main), so headless runs start
+# without it and work where SDL is not installed.
+
+SCENARIO_SUFFIXES = ('.json', '.toml')
+
+def run(args):
+    scenario = load_scenario(args.scenario)
+    engine = args.engine or scenario.get('engine', 'vector')
+    if (args.view or args.serve) and engine not in ('vector', 'parallel'):
+        sys.exit(f"error: the viewer shows vector or parallel worlds, not {engine}")
+    if args.checkpoint and engine not in ('vector', 'parallel'):
+        sys.exit(f"error: checkpoints save vector or parallel worlds, not {engine}")
+    simulation = build_simulation(scenario, engine, args.seed)
+    if args.view:
+        from main import view
+        view(simulation, args.speed, args.trace, args.record, args.telemetry, args.telemetry_overflow)
+        return 0
+    if args.serve:
+        from remote import serve
+        try:
+            serve(simulation, args.serve, args.fps, args.bits, args.speed)
+        finally:
+            if hasattr(simulation, 'close'):
+                simulation.close()
+        return 0
+
+    from recorder import Recorder
+    from telemetry import Telemetry
+    recorder = Recorder(args.record, simulation) if args.record else None
+    telemetry = Telemetry(simulation, args.telemetry, overflow=args.telemetry_overflow) if args.telemetry else None
+    ticks = scenario.get('ticks', 1000) if args.ticks is None else args.ticks
+    try:
+        start = time.perf_counter()
+        simulation.step(ticks)
+        seconds = time.perf_counter() - start
+        if recorder is not None:
+            recorder.close()
+        if telemetry is not None:
+            telemetry.close()
+        if args.checkpoint:
+            from checkpoint import save_checkpoint
+            save_checkpoint(simulation, args.checkpoint)
+    finally:
+        if hasattr(simulation, 'close'):
+            simulation.close()
+    print(json.dumps({
+        'scenario': scenario.get('name', args.scenario),
+        'engine': engine,
+        'seed': simulation.seed,
+        'ticks': ticks,
+        'seconds': seconds,
+        'prey': simulation.prey_stats.count,
+        'predators': simulation.predator_stats.count,
+        'prey_totals': simulation.prey_stats.totals(),
+        'predator_totals': simulation.predator_stats.totals(),
+    }, indent=2))
+    return 0
+
+def bench(args):
+    import benchmark
+    # Scenario files can be timed next to the built-in benchmark scenarios
+    for argument in args.arguments:
+        if argument.endswith(SCENARIO_SUFFIXES) and os.path.isfile(argument):
+            scenario = load_scenario(argument)
+            benchmark.SCENARIOS[argument] = {'world': simulation_settings(scenario),
+                                             'parameters': scenario_parameters(scenario),
+                                             'ticks': scenario.get('ticks', 200)}
+    return benchmark.main(args.arguments)
+
+def sweep(args):
+    from sweep import parse_ranges, run_sweep
+    scenario = load_scenario(args.scenario)
+    seed = scenario.get('seed', 0) if args.seed is None else args.seed
+    ticks = scenario.get('ticks', 5000) if args.ticks is None else args.ticks
+    path = run_sweep(parse_ranges(args.parameters), args.out, replicates=args.replicates, ticks=ticks,
+                     interval=args.interval, seed=seed, workers=args.workers,
+                     world=simulation_settings(scenario), parameters=scenario_parameters(scenario))
+    print(f"Wrote {path}")
+    return 0
+
+def connect(args):
+    from main import connect
+    connect(args.address, args.trace)
+    return 0
+
+def replay(args):
+    from main import replay as replay_trajectory
+    replay_trajectory(args.trajectory, args.speed, args.trace)
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run, serve, benchmark, sweep or replay predator-prey scenarios.")
+    modes = parser.add_subparsers(dest='mode', required=True)
+
+    parser_run = modes.add_parser('run', help="run a scenario file headless, or in the viewer with --view")
+    parser_run.add_argument('scenario', help="scenario file (.json or .toml)")
+    parser_run.add_argument('--engine', choices=ENGINES, help="override the scenario's engine")
+    parser_run.add_argument('--seed', type=int, default=None, help="override the scenario's seed")
+    parser_run.add_argument('--ticks', type=int, default=None, help="override the scenario's tick count")
+    parser_run.add_argument('--record', metavar='PATH', help="stream every tick to a trajectory file")
+    parser_run.add_argument('--telemetry', metavar='TARGET',
+                            help="stream per-tick statistics to a .csv file, an NPZ directory or tcp://host:port")
+    parser_run.add_argument('--telemetry-overflow', choices=OVERFLOW_POLICIES, default='block')
+    parser_run.add_argument('--checkpoint', metavar='PATH', help="save the final state (vector or parallel engine)")
+    parser_run.add_argument('--view', action='store_true', help="open the viewer instead of running headless")
+    parser_run.add_argument('--speed', type=int, default=1, choices=[speed for speed in SPEEDS if speed],
+                            help="initial fast-forward multiplier of the viewer")
+    parser_run.add_argument('--trace', metavar='PATH', help="profile the viewer and write a Chrome trace on exit")
+    parser_run.add_argument('--serve', metavar='ADDRESS',
+                            help="run headless and stream to viewers connecting to tcp://host:port or unix:/path")
+    parser_run.add_argument('--fps', type=int, default=30, help="frames per second streamed with --serve")
+    parser_run.add_argument('--bits', type=int, default=10, choices=range(8, 17), metavar='{8..16}',
+                            help="position precision streamed with --serve, in bits per axis")
+    parser_run.set_defaults(handler=run)
+
+    parser_bench = modes.add_parser('bench', help="time benchmark scenarios or scenario files")
+    parser_bench.add_argument('arguments', nargs=argparse.REMAINDER,
+                              help="scenario names or files and benchmark.py options")
+    parser_bench.set_defaults(handler=bench)
+
+    parser_sweep = modes.add_parser('sweep', help="sweep species parameters over a scenario's world")
+    parser_sweep.add_argument('scenario', help="scenario file (.json or .toml)")
+    parser_sweep.add_argument('parameters', nargs='+', metavar='NAME=VALUES',
+                              help="e.g. prey.energy_gain_rate=0.05:0.3:6 or predator.reproduction_threshold=3,6,9")
+    parser_sweep.add_argument('--out', default='sweep_output')
+    parser_sweep.add_argument('--replicates', type=int, default=1)
+    parser_sweep.add_argument('--ticks', type=int, default=None, help="override the scenario's tick count")
+    parser_sweep.add_argument('--interval', type=int, default=10)
+    parser_sweep.add_argument('--seed', type=int, default=None, help="override the scenario's seed")
+    parser_sweep.add_argument('--workers', type=int, default=None)
+    parser_sweep.set_defaults(handler=sweep)
+
+    parser_connect = modes.add_parser('connect', help="view a simulation streamed by run --serve")
+    parser_connect.add_argument('address', help="tcp://host:port or unix:/path")
+    parser_connect.add_argument('--trace', metavar='PATH')
+    parser_connect.set_defaults(handler=connect)
+
+    parser_replay = modes.add_parser('replay', help="play back a recorded trajectory in the viewer")
+    parser_replay.add_argument('trajectory')
+    parser_replay.add_argument('--speed', type=int, default=1, choices=[speed for speed in SPEEDS if speed])
+    parser_replay.add_argument('--trace', metavar='PATH')
+    parser_replay.set_defaults(handler=replay)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.handler(args)
+    except ValueError as error:
+        parser.exit(2, f"error: {error}\n")
+
+if __name__ == "__main__":
+    sys.exit(main())
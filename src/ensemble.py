@@ -0,0 +1,336 @@
+from simulation import (VectorSimulation, SIMULATION_WIDTH, SIMULATION_HEIGHT, NUM_PREY, NUM_PREDATORS, NUM_OBSTACLES,
+                        NUM_FOOD_AREAS, NUM_HIDING_SPOTS, MAX_HISTORY, environment_arrays)
+from population import PreyPopulation, PredatorPopulation
+from spatial import FeatureIndex, SpatialGrid
+from stats import RingBuffer, population_sums
+from sweep import parameter_grid, parse_ranges
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import numpy as np
+import sys
+import time
+
+class EnsembleGrid(SpatialGrid):
+    """SpatialGrid over a row of worlds that each wrap on their own.
+
+    World w occupies x in [w * stride + margin, w * stride + margin + width),
+    so the world of any position is x // stride. Every world gets its own
+    block of ``world_columns`` columns and neighbour lookups wrap inside that
+    block, so no query ever reaches into another world.
+    """
+
+    def __init__(self, worlds, width, height, cell_size):
+        super().__init__(width, height, cell_size)
+        self.worlds = worlds
+        self.stride = 2 * width
+        self.margin = width / 2
+        self.world_columns = self.columns
+        self.columns = worlds * self.world_columns
+        self.counts = np.zeros(self.columns * self.rows, dtype=np.intp)
+        self.cell_start = np.zeros(self.columns * self.rows, dtype=np.intp)
+
+    @property
+    def shape(self):
+        return self.rows, self.worlds, self.world_columns
+
+    def cell_coordinates(self, positions):
+        world = (positions[:, 0] // self.stride).astype(np.intp)
+        local = positions[:, 0] - world * self.stride - self.margin
+        column = np.clip((local // self.cell_width).astype(np.intp), 0, self.world_columns - 1)
+        cell_y = np.minimum((positions[:, 1] // self.cell_height).astype(np.intp), self.rows - 1)
+        return world * self.world_columns + column, cell_y
+
+    def neighbour_offsets(self, radius):
+        ring_x = int(np.ceil(radius / self.cell_width))
+        ring_y = int(np.ceil(radius / self.cell_height))
+        dx = np.unique(np.arange(-ring_x, ring_x + 1) % self.world_columns)
+        dy = np.unique(np.arange(-ring_y, ring_y + 1) % self.rows)
+        return np.repeat(dx, len(dy)), np.tile(dy, len(dx))
+
+    def candidates(self, positions, radius):
+        dx, dy = self.neighbour_offsets(radius)
+        cell_x, cell_y = self.cell_coordinates(positions)
+        column = cell_x % self.world_columns
+        x = (cell_x - column)[:, None] + (column[:, None] + dx) % self.world_columns
+        y = (cell_y[:, None] + dy) % self.rows
+        query = np.repeat(np.arange(len(positions)), len(dx))
+        return self.expand(query, (y * self.columns + x).ravel())
+
+class WorldRows:
+    """Population mixin for rows spread over the worlds of an EnsembleGrid
+    layout. ``world_parameters`` maps a parameter name to one value per
+    world; parameter() looks those up by each row's world."""
+
+    stride = 1
+    margin = 0
+
+    def __init__(self, capacity=256, rng=None):
+        self.world_parameters = {}
+        super().__init__(capacity, rng)
+
+    def world_of(self, rows):
+        return (self.position[rows, 0] // self.stride).astype(np.intp)
+
+    def parameter(self, name, rows):
+        values = self.world_parameters.get(name)
+        if values is None:
+            return getattr(self, name)
+        return values[self.world_of(rows)]
+
+    def world_values(self, name, worlds):
+        values = self.world_parameters.get(name)
+        return np.full(worlds, getattr(self, name), dtype=float) if values is None else values
+
+    def wrap(self, width, height):
+        position = self.position[:self.count]
+        origin = position[:, 0] // self.stride * self.stride + self.margin
+        position[:, 0] -= origin
+        np.mod(position[:, 0], width, out=position[:, 0])
+        position[:, 0] += origin
+        np.mod(position[:, 1], height, out=position[:, 1])
+
+class EnsemblePreyPopulation(WorldRows, PreyPopulation):
+    world_parameter_names = ('energy_decay_rate', 'energy_gain_rate', 'reproduction_energy_cost',
+                             'reproduction_interval', 'max_population')
+
+class EnsemblePredatorPopulation(WorldRows, PredatorPopulation):
+    world_parameter_names = ('energy_decay_rate', 'energy_gain_from_prey', 'reproduction_threshold',
+                             'reproduction_energy_cost', 'max_population')
+
+class EnsembleSimulation(VectorSimulation):
+    """``worlds`` independent copies of the VectorSimulation world advanced in
+    one batched step.
+
+    The worlds sit side by side in the same population arrays, each wrapping
+    on its own and separated by empty margins, so every neighbour and feature
+    lookup stays inside an agent's own world and the per-tick cost is that of
+    one VectorSimulation holding all the agents. World w is laid out, agents
+    and environment features alike, exactly as VectorSimulation(seed=seeds[w])
+    would be; ``seeds`` defaults to one per world drawn from ``seed``. The
+    random draws made while stepping come from ensemble-wide streams seeded by
+    ``seed``, so the ensemble as a whole is reproducible but a world does not
+    replay the standalone run of its seed.
+
+    ``parameters`` is a list with one dict per world of "prey.<name>" /
+    "predator.<name>" overrides, as in sweep.py. Energy, reproduction and cap
+    parameters can differ between worlds; movement and perception are shared
+    and set on ``prey`` and ``predator`` as usual. Per-world population counts
+    are kept in ``prey_counts`` and ``predator_counts`` and sampled into
+    ``prey_world_history`` and ``predator_world_history``; the tick at which a
+    world lost all its prey or predators is in ``prey_extinction`` and
+    ``predator_extinction`` (-1 while alive). An extinct world just has no
+    rows, so it costs nothing and never holds the others up.
+
+    Ensembles cannot be checkpointed or forked: state(), load_state() and
+    fork() raise NotImplementedError.
+    """
+
+    prey_class = EnsemblePreyPopulation
+    predator_class = EnsemblePredatorPopulation
+
+    def __init__(self, worlds, width=SIMULATION_WIDTH, height=SIMULATION_HEIGHT, num_prey=NUM_PREY,
+                 num_predators=NUM_PREDATORS, num_obstacles=NUM_OBSTACLES, num_food_areas=NUM_FOOD_AREAS,
+                 num_hiding_spots=NUM_HIDING_SPOTS, seed=None, seeds=None, parameters=None, cell_size=None,
+                 max_history=MAX_HISTORY, history_interval=1, sleep_interval=1):
+        if seeds is None:
+            seeds = np.random.SeedSequence(seed).generate_state(worlds)
+        elif len(seeds) != worlds:
+            raise ValueError(f"Expected {worlds} seeds, got {len(seeds)}")
+        self.worlds = worlds
+        self.seeds = [int(world_seed) for world_seed in seeds]
+        self.stride = 2 * width
+        self.margin = width / 2
+        self.history_interval = history_interval
+        self.prey_world_history = RingBuffer(max_history, shape=(worlds,))
+        self.predator_world_history = RingBuffer(max_history, shape=(worlds,))
+        super().__init__(width, height, num_prey, num_predators, num_obstacles, num_food_areas, num_hiding_spots,
+                         cell_size=cell_size, max_history=max_history, history_interval=history_interval, seed=seed,
+                         sleep_interval=sleep_interval)
+        if parameters is not None:
+            self.set_world_parameters(parameters)
+
+    def create_grid(self):
+        return EnsembleGrid(self.worlds, self.width, self.height, self.cell_size)
+
+    def index_features(self):
+        width = self.worlds * self.stride
+        self.obstacle_index = FeatureIndex(self.obstacle_array, width, self.height)
+        self.food_area_index = FeatureIndex(self.food_area_array, width, self.height)
+        self.hiding_spot_index = FeatureIndex(self.hiding_spot_array, width, self.height)
+
+    def origin(self, world):
+        return np.array([world * self.stride + self.margin, 0.0])
+
+    def reset(self, seed=None):
+        self.reseed(seed)
+        for population in (self.prey, self.predator):
+            population.stride = self.stride
+            population.margin = self.margin
+        prey, predators = [], []
+        features = ([], [], [])
+        for world, world_seed in enumerate(self.seeds):
+            # The same draws VectorSimulation.reset() makes from its world stream
+            rng = np.random.default_rng(np.random.SeedSequence(world_seed).spawn(3)[0])
+            for positions, n in ((prey, self.num_prey), (predators, self.num_predators)):
+                positions.append(np.column_stack((rng.integers(0, self.width, n, endpoint=True),
+                                                  rng.integers(0, self.height, n, endpoint=True))) + self.origin(world))
+            for arrays, array in zip(features, environment_arrays(self.width, self.height, self.num_obstacles,
+                                                                  self.num_food_areas, self.num_hiding_spots, rng)):
+                array[:, :2] += self.origin(world)
+                arrays.append(array)
+
+        self.prey.count = 0
+        self.predator.count = 0
+        self.prey.add(np.concatenate(prey))
+        self.predator.add(np.concatenate(predators))
+        self.prey_grid.rebuild(self.prey.position[:self.prey.count])
+        self.predator_grid.rebuild(self.predator.position[:self.predator.count])
+        self.obstacle_array, self.food_area_array, self.hiding_spot_array = (np.concatenate(arrays)
+                                                                             for arrays in features)
+        self.index_features()
+
+        self.prey_stats.reset(*population_sums(self.prey))
+        self.predator_stats.reset(*population_sums(self.predator))
+        self.tick = 0
+        self.prey_world_history.clear()
+        self.predator_world_history.clear()
+        self.prey_extinction = np.full(self.worlds, -1)
+        self.predator_extinction = np.full(self.worlds, -1)
+        self.count_worlds()
+
+    def set_world_parameters(self, parameters):
+        """Give world w the overrides in ``parameters[w]``; names missing from
+        a world's dict keep the species' shared value."""
+        if len(parameters) != self.worlds:
+            raise ValueError(f"Expected parameters for {self.worlds} worlds, got {len(parameters)}")
+        species = {'prey': self.prey, 'predator': self.predator}
+        for population in species.values():
+            population.world_parameters = {}
+        for name in sorted(set().union(*parameters)):
+            population, attribute = name.split('.', 1)
+            if population not in species:
+                raise ValueError(f"Unknown species in parameter: {name}")
+            population = species[population]
+            if attribute not in population.world_parameter_names:
+                raise ValueError(f"{name} is shared by every world; set it on the ensemble's "
+                                 f"{type(population).__name__} instead")
+            default = getattr(population, attribute)
+            population.world_parameters[attribute] = np.array([world.get(name, default) for world in parameters],
+                                                              dtype=float)
+
+    def world_parameters(self, world):
+        """The parameter values world ``world`` runs with, in sweep naming."""
+        values = {}
+        for species, population in (('prey', self.prey), ('predator', self.predator)):
+            for name in population.world_parameter_names:
+                values[f'{species}.{name}'] = population.world_values(name, self.worlds)[world].item()
+        return values
+
+    def limit_births(self, population, ready, alive):
+        """The ready rows that fit under their own world's max_population,
+        lowest rows first within each world."""
+        if not len(ready):
+            return ready
+        world = population.world_of(ready)
+        living = np.bincount(population.world_of(np.flatnonzero(alive)), minlength=self.worlds)
+        room = population.world_values('max_population', self.worlds) - living
+        order = np.argsort(world, kind='stable')
+        grouped = world[order]
+        rank = np.empty(len(ready), dtype=np.intp)
+        rank[order] = np.arange(len(ready)) - np.searchsorted(grouped, grouped)
+        return ready[rank < room[world]]
+
+    def count_worlds(self):
+        self.prey_counts = np.bincount(self.prey.world_of(slice(0, self.prey.count)), minlength=self.worlds)
+        self.predator_counts = np.bincount(self.predator.world_of(slice(0, self.predator.count)),
+                                           minlength=self.worlds)
+        for counts, extinction in ((self.prey_counts, self.prey_extinction),
+                                   (self.predator_counts, self.predator_extinction)):
+            extinction[(counts == 0) & (extinction < 0)] = self.tick
+        if self.tick % self.history_interval == 0:
+            self.prey_world_history.append(self.prey_counts)
+            self.predator_world_history.append(self.predator_counts)
+
+    def update(self):
+        super().update()
+        self.count_worlds()
+
+    def state(self):
+        raise NotImplementedError("Checkpoints are not supported for ensembles")
+
+    def load_state(self, state):
+        raise NotImplementedError("Checkpoints are not supported for ensembles")
+
+    def fork(self, seed=None, **kwargs):
+        raise NotImplementedError("Forks are not supported for ensembles")
+
+def run_batch(task):
+    """Step one ensemble of the task's worlds; executed inside a pool worker."""
+    ensemble = EnsembleSimulation(len(task['seeds']), seed=task['seed'], seeds=task['seeds'],
+                                  parameters=task['parameters'], **task['world'])
+    samples = task['ticks'] // task['interval'] + 1
+    prey = np.zeros((samples, ensemble.worlds), dtype=np.int32)
+    predators = np.zeros((samples, ensemble.worlds), dtype=np.int32)
+    prey[0] = ensemble.prey_counts
+    predators[0] = ensemble.predator_counts
+    for sample in range(1, samples):
+        ensemble.step(task['interval'])
+        prey[sample] = ensemble.prey_counts
+        predators[sample] = ensemble.predator_counts
+    return task, prey, predators, ensemble.prey_extinction, ensemble.predator_extinction
+
+def run_ensemble(parameters, ticks, interval=10, seed=0, batch=1000, workers=None, world=None):
+    """Run one world per dict in ``parameters`` for ``ticks``, ``batch``
+    worlds to an EnsembleSimulation, with the batches spread over a process
+    pool.
+
+    Returns a dict with the sample ticks, (samples, worlds) prey and predator
+    counts taken every ``interval``, each world's seed and its extinction
+    ticks. The results depend on ``seed`` and ``batch`` but not on
+    ``workers``.
+    """
+    worlds = len(parameters)
+    batches = range(0, worlds, batch)
+    seeds = np.random.SeedSequence(seed).generate_state(worlds + len(batches))
+    tasks = [{'start': start, 'seed': int(seeds[worlds + index]), 'seeds': seeds[start:min(start + batch, worlds)].tolist(),
+              'parameters': parameters[start:start + batch], 'ticks': ticks, 'interval': interval,
+              'world': world or {}} for index, start in enumerate(batches)]
+    samples = ticks // interval + 1
+    results = {'tick': np.arange(samples) * interval, 'seed': seeds[:worlds],
+               'prey': np.zeros((samples, worlds), dtype=np.int32),
+               'predators': np.zeros((samples, worlds), dtype=np.int32),
+               'prey_extinction': np.zeros(worlds, dtype=np.int64),
+               'predator_extinction': np.zeros(worlds, dtype=np.int64)}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for task, *arrays in pool.map(run_batch, tasks):
+            rows = slice(task['start'], task['start'] + len(task['seeds']))
+            for name, array in zip(('prey', 'predators', 'prey_extinction', 'predator_extinction'), arrays):
+                results[name][..., rows] = array
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many independent headless worlds in batched ensembles.")
+    parser.add_argument('parameters', nargs='*', metavar='NAME=VALUES',
+                        help="per-world parameter ranges as in sweep.py; every combination gets --replicates worlds")
+    parser.add_argument('--replicates', type=int, default=1000)
+    parser.add_argument('--ticks', type=int, default=5000)
+    parser.add_argument('--interval', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch', type=int, default=1000, help="worlds stepped together in one process")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default='ensemble.npz')
+    args = parser.parse_args(argv)
+
+    ranges = parse_ranges(args.parameters)
+    parameters = [combination for combination in parameter_grid(ranges) for _ in range(args.replicates)]
+    start = time.perf_counter()
+    results = run_ensemble(parameters, args.ticks, args.interval, args.seed, args.batch, args.workers)
+    seconds = time.perf_counter() - start
+    for name in ranges:
+        results[name.replace('.', '_')] = np.array([world[name] for world in parameters])
+    np.savez_compressed(args.out, **results)
+    print(f"{len(parameters)} worlds x {args.ticks} ticks in {seconds:.1f} s "
+          f"({len(parameters) * args.ticks / seconds:.0f} world-ticks/s); wrote {args.out}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
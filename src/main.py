@@ -1,402 +1,506 @@
-from environment import Obstacle, FoodArea, HidingSpot
-import pygame
-import random
-from agent import Agent, Prey, Predator
-from collections import defaultdict
-import numpy as np
-
-# Initialize Pygame
-pygame.init()
-
-# Set up the display
-WIDTH, HEIGHT = 1200, 800
-SIMULATION_WIDTH = 900
-SIMULATION_HEIGHT = 600  
-CONTROL_PANEL_WIDTH = WIDTH - SIMULATION_WIDTH
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Emergent Ecosystem Simulation")
-
-# Colors
-BACKGROUND_COLOR = (240, 248, 255)  
-SIMULATION_BORDER = (70, 130, 180)
-PANEL_BACKGROUND = (230, 230, 250)
-TEXT_COLOR = (47, 79, 79)
-PREY_COLOR = (46, 139, 87)
-PREDATOR_COLOR = (178, 34, 34)
-OBSTACLE_COLOR = (119, 136, 153)
-FOOD_AREA_COLOR = (154, 205, 50)
-HIDING_SPOT_COLOR = (210, 180, 140)
-BUTTON_COLOR = (176, 196, 222)
-BUTTON_TEXT_COLOR = (25, 25, 112)
-SLIDER_COLOR = (176, 196, 222)
-SLIDER_HANDLE_COLOR = (70, 130, 180)  
-
-# Create lists to store agents
-prey_list = []
-predator_list = []
-
-# Initialize agents
-NUM_PREY = 100  # Increased initial prey count
-NUM_PREDATORS = 3  # Reduced initial predator count
-
-for _ in range(NUM_PREY):
-    x = random.randint(0, SIMULATION_WIDTH)
-    y = random.randint(0, SIMULATION_HEIGHT)
-    prey_list.append(Prey(x, y))
-
-for _ in range(NUM_PREDATORS):
-    x = random.randint(0, SIMULATION_WIDTH)
-    y = random.randint(0, SIMULATION_HEIGHT)
-    predator_list.append(Predator(x, y))
-
-# Create lists to store environmental features
-obstacles = []
-food_areas = []
-hiding_spots = []
-
-# Initialize environmental features
-NUM_OBSTACLES = 5  
-NUM_FOOD_AREAS = 3  
-NUM_HIDING_SPOTS = 3  
-
-for _ in range(NUM_OBSTACLES):
-    x = random.randint(50, SIMULATION_WIDTH - 50)
-    y = random.randint(50, SIMULATION_HEIGHT - 50)
-    radius = random.randint(20, 40)
-    obstacles.append(Obstacle(x, y, radius))
-
-for _ in range(NUM_FOOD_AREAS):
-    x = random.randint(50, SIMULATION_WIDTH - 50)
-    y = random.randint(50, SIMULATION_HEIGHT - 50)
-    radius = random.randint(50, 80)
-    food_areas.append(FoodArea(x, y, radius))
-
-for _ in range(NUM_HIDING_SPOTS):
-    x = random.randint(50, SIMULATION_WIDTH - 50)
-    y = random.randint(50, SIMULATION_HEIGHT - 50)
-    radius = random.randint(30, 60)
-    hiding_spots.append(HidingSpot(x, y, radius))
-
-# UI elements
-class Slider:
-    def __init__(self, x, y, width, height, min_val, max_val, initial_val, label):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.min_val = min_val
-        self.max_val = max_val
-        self.value = initial_val
-        self.label = label
-
-    def draw(self, screen):
-        pygame.draw.rect(screen, SLIDER_COLOR, self.rect)
-        pos = self.rect.x + int((self.value - self.min_val) / (self.max_val - self.min_val) * self.rect.width)
-        pygame.draw.line(screen, SLIDER_HANDLE_COLOR, (pos, self.rect.y), (pos, self.rect.y + self.rect.height), 4)
-        font = pygame.font.Font(None, 24)
-        label = font.render(f"{self.label}: {self.value:.2f}", True, TEXT_COLOR)
-        screen.blit(label, (self.rect.x, self.rect.y - 25))
-
-    def update(self, mouse_pos):
-        if self.rect.collidepoint(mouse_pos):
-            self.value = (mouse_pos[0] - self.rect.x) / self.rect.width * (self.max_val - self.min_val) + self.min_val
-            self.value = max(self.min_val, min(self.max_val, self.value))
-
-class Button:
-    def __init__(self, x, y, width, height, text, action):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.text = text
-        self.action = action
-
-    def draw(self, screen):
-        pygame.draw.rect(screen, BUTTON_COLOR, self.rect)
-        font = pygame.font.Font(None, 24)
-        text = font.render(self.text, True, BUTTON_TEXT_COLOR)
-        text_rect = text.get_rect(center=self.rect.center)
-        screen.blit(text, text_rect)
-
-    def handle_event(self, event):
-        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            if self.rect.collidepoint(event.pos):
-                self.action()
-
-# Create sliders
-sliders = [
-    Slider(SIMULATION_WIDTH + 20, 80, 260, 20, 0.005, 0.02, Prey.energy_decay_rate, "Prey Energy Decay"),
-    Slider(SIMULATION_WIDTH + 20, 140, 260, 20, 0.05, 0.3, Prey.energy_gain_rate, "Prey Energy Gain"),
-    Slider(SIMULATION_WIDTH + 20, 200, 260, 20, 0.01, 0.03, Predator.energy_decay_rate, "Predator Energy Decay"),
-    Slider(SIMULATION_WIDTH + 20, 260, 260, 20, 20, 60, Predator.energy_gain_from_prey, "Predator Energy Gain"),
-    Slider(SIMULATION_WIDTH + 20, 320, 260, 20, 3, 10, Predator.reproduction_threshold, "Predator Reproduction Threshold")
-]
-
-# Simulation control
-paused = False
-
-def toggle_pause():
-    global paused, last_update_time
-    paused = not paused
-    if not paused:
-        last_update_time = pygame.time.get_ticks()
-
-def restart_simulation():
-    global prey_list, predator_list, obstacles, food_areas, hiding_spots, elapsed_time, last_update_time
-    prey_list = [Prey(random.randint(0, SIMULATION_WIDTH), random.randint(0, SIMULATION_HEIGHT)) for _ in range(NUM_PREY)]
-    predator_list = [Predator(random.randint(0, SIMULATION_WIDTH), random.randint(0, SIMULATION_HEIGHT)) for _ in range(NUM_PREDATORS)]
-    
-    obstacles = []
-    food_areas = []
-    hiding_spots = []
-    
-    for _ in range(NUM_OBSTACLES):
-        x = random.randint(50, SIMULATION_WIDTH - 50)
-        y = random.randint(50, SIMULATION_HEIGHT - 50)
-        radius = random.randint(20, 40)
-        obstacles.append(Obstacle(x, y, radius))
-
-    for _ in range(NUM_FOOD_AREAS):
-        x = random.randint(50, SIMULATION_WIDTH - 50)
-        y = random.randint(50, SIMULATION_HEIGHT - 50)
-        radius = random.randint(50, 80)
-        food_areas.append(FoodArea(x, y, radius))
-
-    for _ in range(NUM_HIDING_SPOTS):
-        x = random.randint(50, SIMULATION_WIDTH - 50)
-        y = random.randint(50, SIMULATION_HEIGHT - 50)
-        radius = random.randint(30, 60)
-        hiding_spots.append(HidingSpot(x, y, radius))
-
-    elapsed_time = 0
-    last_update_time = pygame.time.get_ticks()
-
-# Create buttons
-buttons = [
-    Button(SIMULATION_WIDTH + 20, 380, 120, 40, "Pause", toggle_pause),
-    Button(SIMULATION_WIDTH + 150, 380, 120, 40, "Restart", restart_simulation)
-]
-
-# Add these new variables for statistics tracking
-MAX_HISTORY = 500
-prey_history = []
-predator_history = []
-
-# Add this function for spatial partitioning
-def create_spatial_hash(agents, cell_size):
-    spatial_hash = defaultdict(list)
-    for agent in agents:
-        cell_x = int(agent.position.x // cell_size)
-        cell_y = int(agent.position.y // cell_size)
-        spatial_hash[(cell_x, cell_y)].append(agent)
-    return spatial_hash
-
-CELL_SIZE = 50
-
-start_time = 0
-elapsed_time = 0
-last_update_time = 0
-
-# Main game loop
-running = True
-clock = pygame.time.Clock()
-frame_count = 0
-
-def draw_statistics(screen, font, prey_list, predator_list, prey_history, predator_history, elapsed_time):
-    stats_height = HEIGHT - SIMULATION_HEIGHT
-    pygame.draw.rect(screen, PANEL_BACKGROUND, (0, SIMULATION_HEIGHT, SIMULATION_WIDTH, stats_height))
-    pygame.draw.line(screen, SIMULATION_BORDER, (0, SIMULATION_HEIGHT), (SIMULATION_WIDTH, SIMULATION_HEIGHT), 2)
-
-    # Create columns
-    col_width = SIMULATION_WIDTH // 3
-    
-    # Column 1: Population stats
-    prey_count = len(prey_list)
-    predator_count = len(predator_list)
-    ratio = prey_count / predator_count if predator_count > 0 else float('inf')
-    
-    pop_title = font.render("Population", True, TEXT_COLOR)
-    prey_text = font.render(f"Prey: {prey_count}", True, PREY_COLOR)
-    predator_text = font.render(f"Predators: {predator_count}", True, PREDATOR_COLOR)
-    ratio_text = font.render(f"Prey-Predator Ratio: {ratio:.2f}", True, TEXT_COLOR)
-    
-    screen.blit(pop_title, (20, HEIGHT - stats_height + 10))
-    screen.blit(prey_text, (20, HEIGHT - stats_height + 40))
-    screen.blit(predator_text, (20, HEIGHT - stats_height + 70))
-    screen.blit(ratio_text, (20, HEIGHT - stats_height + 100))
-
-    # Column 2: Energy levels
-    avg_prey_energy = sum(prey.energy for prey in prey_list) / max(len(prey_list), 1)
-    avg_predator_energy = sum(predator.energy for predator in predator_list) / max(len(predator_list), 1)
-    
-    energy_title = font.render("Average Energy", True, TEXT_COLOR)
-    prey_energy_text = font.render(f"Prey: {avg_prey_energy:.2f}", True, PREY_COLOR)
-    predator_energy_text = font.render(f"Predators: {avg_predator_energy:.2f}", True, PREDATOR_COLOR)
-    
-    screen.blit(energy_title, (col_width + 20, HEIGHT - stats_height + 10))
-    screen.blit(prey_energy_text, (col_width + 20, HEIGHT - stats_height + 40))
-    screen.blit(predator_energy_text, (col_width + 20, HEIGHT - stats_height + 70))
-
-    # Column 3: Other stats
-    avg_prey_lifespan = sum(prey.age for prey in prey_list) / max(len(prey_list), 1)
-    avg_predator_lifespan = sum(predator.age for predator in predator_list) / max(len(predator_list), 1)
-    time_text = font.render(f"Simulation Time: {elapsed_time / 1000:.2f} s", True, TEXT_COLOR)
-
-    other_title = font.render("Other Statistics", True, TEXT_COLOR)
-    lifespan_text = font.render(f"Avg Lifespan - Prey: {avg_prey_lifespan:.2f}", True, PREY_COLOR)
-    predator_lifespan_text = font.render(f"Predators: {avg_predator_lifespan:.2f}", True, PREDATOR_COLOR)
-
-    screen.blit(other_title, (2 * col_width + 20, HEIGHT - stats_height + 10))
-    screen.blit(lifespan_text, (2 * col_width + 20, HEIGHT - stats_height + 40))
-    screen.blit(predator_lifespan_text, (2 * col_width + 20, HEIGHT - stats_height + 70))
-    screen.blit(time_text, (2 * col_width + 20, HEIGHT - stats_height + 100))
-
-    # Draw vertical separators
-    pygame.draw.line(screen, SIMULATION_BORDER, (col_width, HEIGHT - stats_height), (col_width, HEIGHT), 2)
-    pygame.draw.line(screen, SIMULATION_BORDER, (2 * col_width, HEIGHT - stats_height), (2 * col_width, HEIGHT), 2)
-
-    # Population trend indicators
-    prey_trend = prey_history[-1] - prey_history[0] if len(prey_history) > 1 else 0
-    predator_trend = predator_history[-1] - predator_history[0] if len(predator_history) > 1 else 0
-
-    trend_size = 15
-    prey_trend_color = PREY_COLOR if prey_trend > 0 else PREDATOR_COLOR if prey_trend < 0 else TEXT_COLOR
-    predator_trend_color = PREY_COLOR if predator_trend > 0 else PREDATOR_COLOR if predator_trend < 0 else TEXT_COLOR
-
-    pygame.draw.polygon(screen, prey_trend_color, 
-                        [(col_width - 30, HEIGHT - stats_height + 45), 
-                         (col_width - 20, HEIGHT - stats_height + 35), 
-                         (col_width - 10, HEIGHT - stats_height + 45)] if prey_trend > 0 else
-                        [(col_width - 30, HEIGHT - stats_height + 35), 
-                         (col_width - 20, HEIGHT - stats_height + 45), 
-                         (col_width - 10, HEIGHT - stats_height + 35)] if prey_trend < 0 else
-                        [(col_width - 30, HEIGHT - stats_height + 40), 
-                         (col_width - 20, HEIGHT - stats_height + 40), 
-                         (col_width - 10, HEIGHT - stats_height + 40)])
-
-    pygame.draw.polygon(screen, predator_trend_color, 
-                        [(col_width - 30, HEIGHT - stats_height + 75), 
-                         (col_width - 20, HEIGHT - stats_height + 65), 
-                         (col_width - 10, HEIGHT - stats_height + 75)] if predator_trend > 0 else
-                        [(col_width - 30, HEIGHT - stats_height + 65), 
-                         (col_width - 20, HEIGHT - stats_height + 75), 
-                         (col_width - 10, HEIGHT - stats_height + 65)] if predator_trend < 0 else
-                        [(col_width - 30, HEIGHT - stats_height + 70), 
-                         (col_width - 20, HEIGHT - stats_height + 70), 
-                         (col_width - 10, HEIGHT - stats_height + 70)])
-
-font = pygame.font.Font(None, 24)
-
-while running:
-    current_time = pygame.time.get_ticks()
-    
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            if event.button == 1:  
-                for slider in sliders:
-                    slider.update(event.pos)
-                for button in buttons:
-                    button.handle_event(event)
-        elif event.type == pygame.MOUSEMOTION:
-            if event.buttons[0]:  
-                for slider in sliders:
-                    slider.update(event.pos)
-
-    if not paused:
-        # Update elapsed time
-        if last_update_time > 0:
-            elapsed_time += current_time - last_update_time
-        
-        # Update simulation parameters
-        Prey.energy_decay_rate = sliders[0].value
-        Prey.energy_gain_rate = sliders[1].value
-        Predator.energy_decay_rate = sliders[2].value
-        Predator.energy_gain_from_prey = sliders[3].value
-        Predator.reproduction_threshold = int(sliders[4].value)
-
-        # Create spatial hash for agents
-        spatial_hash_prey = create_spatial_hash(prey_list, CELL_SIZE)
-        spatial_hash_predator = create_spatial_hash(predator_list, CELL_SIZE)
-
-        # Update agents
-        for prey in prey_list[:]:
-            prey.update(prey_list, predator_list, SIMULATION_WIDTH, SIMULATION_HEIGHT, obstacles, food_areas, hiding_spots, spatial_hash_prey, spatial_hash_predator, CELL_SIZE)
-
-        for predator in predator_list[:]:
-            predator.update(prey_list, predator_list, SIMULATION_WIDTH, SIMULATION_HEIGHT, obstacles, food_areas, hiding_spots, spatial_hash_prey, spatial_hash_predator, CELL_SIZE)
-
-        # Update statistics
-        prey_history.append(len(prey_list))
-        predator_history.append(len(predator_list))
-        if len(prey_history) > MAX_HISTORY:
-            prey_history.pop(0)
-            predator_history.pop(0)
-
-    last_update_time = current_time
-
-    # Draw everything
-    screen.fill(BACKGROUND_COLOR)
-    
-    # Draw simulation area
-    pygame.draw.rect(screen, SIMULATION_BORDER, (0, 0, SIMULATION_WIDTH, SIMULATION_HEIGHT), 2)
-
-    # Draw environmental features
-    for obstacle in obstacles:
-        obstacle.draw(screen)
-    for food_area in food_areas:
-        food_area.draw(screen)
-    for hiding_spot in hiding_spots:
-        hiding_spot.draw(screen)
-
-    for prey in prey_list:
-        prey.draw(screen)
-
-    for predator in predator_list:
-        predator.draw(screen)
-
-    # Draw control panel
-    pygame.draw.rect(screen, PANEL_BACKGROUND, (SIMULATION_WIDTH, 0, CONTROL_PANEL_WIDTH, HEIGHT))
-    
-    # Draw title
-    font_large = pygame.font.Font(None, 36)
-    title = font_large.render("Simulation Controls", True, TEXT_COLOR)
-    screen.blit(title, (SIMULATION_WIDTH + 20, 30))
-
-    # Draw sliders
-    for slider in sliders:
-        slider.draw(screen)
-
-    # Draw buttons
-    for button in buttons:
-        button.draw(screen)
-
-    # Display population counts and average energy levels
-    font = pygame.font.Font(None, 24)
-    
-    # Prey stats
-    pygame.draw.rect(screen, PREY_COLOR, (SIMULATION_WIDTH + 20, 440, 260, 70))
-    prey_text = font.render(f"Prey: {len(prey_list)}", True, BACKGROUND_COLOR)
-    screen.blit(prey_text, (SIMULATION_WIDTH + 30, 450))
-    
-    avg_prey_energy = sum(prey.energy for prey in prey_list) / len(prey_list) if prey_list else 0
-    prey_energy_text = font.render(f"Avg Prey Energy: {avg_prey_energy:.2f}", True, BACKGROUND_COLOR)
-    screen.blit(prey_energy_text, (SIMULATION_WIDTH + 30, 480))
-    
-    # Predator stats
-    pygame.draw.rect(screen, PREDATOR_COLOR, (SIMULATION_WIDTH + 20, 520, 260, 70))
-    predator_text = font.render(f"Predators: {len(predator_list)}", True, BACKGROUND_COLOR)
-    screen.blit(predator_text, (SIMULATION_WIDTH + 30, 530))
-    
-    avg_predator_energy = sum(predator.energy for predator in predator_list) / len(predator_list) if predator_list else 0
-    predator_energy_text = font.render(f"Avg Predator Energy: {avg_predator_energy:.2f}", True, BACKGROUND_COLOR)
-    screen.blit(predator_energy_text, (SIMULATION_WIDTH + 30, 560))
-
-    # Draw statistics
-    draw_statistics(screen, font, prey_list, predator_list, prey_history, predator_history, elapsed_time)
-
-    # Display paused status
-    if paused:
-        pause_text = font_large.render("PAUSED", True, PREDATOR_COLOR)
-        text_rect = pause_text.get_rect(center=(SIMULATION_WIDTH // 2, SIMULATION_HEIGHT // 2))
-        screen.blit(pause_text, text_rect)
-
-    pygame.display.flip()
-    clock.tick(60)
-
-pygame.quit()
\ No newline at end of file
+import pygame
+import argparse
+from profiler import Profiler, export_trace
+from population import PreyPopulation, PredatorPopulation
+from recorder import Recorder, Replay
+from remote import RemoteConnection
+from telemetry import OVERFLOW_POLICIES, Telemetry
+from render import WorldRenderer, BACKGROUND_COLOR, SIMULATION_BORDER, PREY_COLOR, PREDATOR_COLOR
+from simulation import VectorSimulation, SIMULATION_WIDTH, SIMULATION_HEIGHT, MAX_HISTORY
+from scheduler import SPEEDS, Scheduler
+from stats import summary, trend
+from ui import Panel, Slider, Button, text_cache, PANEL_BACKGROUND, TEXT_COLOR
+
+# Set up the display
+WIDTH, HEIGHT = 1200, 800
+CONTROL_PANEL_WIDTH = WIDTH - SIMULATION_WIDTH
+
+def draw_statistics(screen, summary, prey_trend, predator_trend, elapsed_time):
+    stats_height = HEIGHT - SIMULATION_HEIGHT
+    pygame.draw.rect(screen, PANEL_BACKGROUND, (0, SIMULATION_HEIGHT, SIMULATION_WIDTH, stats_height))
+    pygame.draw.line(screen, SIMULATION_BORDER, (0, SIMULATION_HEIGHT), (SIMULATION_WIDTH, SIMULATION_HEIGHT), 2)
+
+    # Create columns
+    col_width = SIMULATION_WIDTH // 3
+    
+    # Column 1: Population stats
+    prey_count = summary['prey']
+    predator_count = summary['predators']
+    ratio = prey_count / predator_count if predator_count > 0 else float('inf')
+    
+    pop_title = text_cache.render("Population", TEXT_COLOR)
+    prey_text = text_cache.render(f"Prey: {prey_count}", PREY_COLOR)
+    predator_text = text_cache.render(f"Predators: {predator_count}", PREDATOR_COLOR)
+    ratio_text = text_cache.render(f"Prey-Predator Ratio: {ratio:.2f}", TEXT_COLOR)
+    
+    screen.blit(pop_title, (20, HEIGHT - stats_height + 10))
+    screen.blit(prey_text, (20, HEIGHT - stats_height + 40))
+    screen.blit(predator_text, (20, HEIGHT - stats_height + 70))
+    screen.blit(ratio_text, (20, HEIGHT - stats_height + 100))
+
+    # Column 2: Energy levels
+    avg_prey_energy = summary['prey_energy']
+    avg_predator_energy = summary['predator_energy']
+    
+    energy_title = text_cache.render("Average Energy", TEXT_COLOR)
+    prey_energy_text = text_cache.render(f"Prey: {avg_prey_energy:.2f}", PREY_COLOR)
+    predator_energy_text = text_cache.render(f"Predators: {avg_predator_energy:.2f}", PREDATOR_COLOR)
+    
+    screen.blit(energy_title, (col_width + 20, HEIGHT - stats_height + 10))
+    screen.blit(prey_energy_text, (col_width + 20, HEIGHT - stats_height + 40))
+    screen.blit(predator_energy_text, (col_width + 20, HEIGHT - stats_height + 70))
+
+    # Column 3: Other stats
+    avg_prey_lifespan = summary['prey_age']
+    avg_predator_lifespan = summary['predator_age']
+    time_text = text_cache.render(f"Simulation Time: {elapsed_time / 1000:.2f} s", TEXT_COLOR)
+
+    other_title = text_cache.render("Other Statistics", TEXT_COLOR)
+    lifespan_text = text_cache.render(f"Avg Lifespan - Prey: {avg_prey_lifespan:.2f}", PREY_COLOR)
+    predator_lifespan_text = text_cache.render(f"Predators: {avg_predator_lifespan:.2f}", PREDATOR_COLOR)
+
+    screen.blit(other_title, (2 * col_width + 20, HEIGHT - stats_height + 10))
+    screen.blit(lifespan_text, (2 * col_width + 20, HEIGHT - stats_height + 40))
+    screen.blit(predator_lifespan_text, (2 * col_width + 20, HEIGHT - stats_height + 70))
+    screen.blit(time_text, (2 * col_width + 20, HEIGHT - stats_height + 100))
+
+    # Draw vertical separators
+    pygame.draw.line(screen, SIMULATION_BORDER, (col_width, HEIGHT - stats_height), (col_width, HEIGHT), 2)
+    pygame.draw.line(screen, SIMULATION_BORDER, (2 * col_width, HEIGHT - stats_height), (2 * col_width, HEIGHT), 2)
+
+    # Population trend indicators
+    trend_size = 15
+    prey_trend_color = PREY_COLOR if prey_trend > 0 else PREDATOR_COLOR if prey_trend < 0 else TEXT_COLOR
+    predator_trend_color = PREY_COLOR if predator_trend > 0 else PREDATOR_COLOR if predator_trend < 0 else TEXT_COLOR
+
+    pygame.draw.polygon(screen, prey_trend_color, 
+                        [(col_width - 30, HEIGHT - stats_height + 45), 
+                         (col_width - 20, HEIGHT - stats_height + 35), 
+                         (col_width - 10, HEIGHT - stats_height + 45)] if prey_trend > 0 else
+                        [(col_width - 30, HEIGHT - stats_height + 35), 
+                         (col_width - 20, HEIGHT - stats_height + 45), 
+                         (col_width - 10, HEIGHT - stats_height + 35)] if prey_trend < 0 else
+                        [(col_width - 30, HEIGHT - stats_height + 40), 
+                         (col_width - 20, HEIGHT - stats_height + 40), 
+                         (col_width - 10, HEIGHT - stats_height + 40)])
+
+    pygame.draw.polygon(screen, predator_trend_color, 
+                        [(col_width - 30, HEIGHT - stats_height + 75), 
+                         (col_width - 20, HEIGHT - stats_height + 65), 
+                         (col_width - 10, HEIGHT - stats_height + 75)] if predator_trend > 0 else
+                        [(col_width - 30, HEIGHT - stats_height + 65), 
+                         (col_width - 20, HEIGHT - stats_height + 75), 
+                         (col_width - 10, HEIGHT - stats_height + 65)] if predator_trend < 0 else
+                        [(col_width - 30, HEIGHT - stats_height + 70), 
+                         (col_width - 20, HEIGHT - stats_height + 70), 
+                         (col_width - 10, HEIGHT - stats_height + 70)])
+
+
+def speed_label(speed):
+    return "Max" if speed is None else f"{speed}x"
+
+def mean(values):
+    return float(values.mean()) if len(values) else 0.0
+
+class Viewer:
+    """Pygame window on top of a VectorSimulation.
+
+    The simulation runs on a Scheduler thread at its own fixed tick rate,
+    times the fast-forward speed. The viewer redraws at up to 60 frames per
+    second from the latest published snapshot. Slider values, pauses and
+    restarts reach the simulation as commands queued between ticks.
+
+    F3 toggles an overlay of per-phase timings from the simulation's and the
+    viewer's profilers. With ``trace`` set, both profilers record from the
+    start and their events are written to that path on exit.
+    """
+
+    def __init__(self, simulation, speed=1, trace=None):
+        self.simulation = simulation
+        self.profiler = Profiler('render')
+        self.overlay = False
+        self.trace = trace
+        if trace:
+            self.profiler.enable(trace=True)
+            simulation.profiler.enable(trace=True)
+        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("Emergent Ecosystem Simulation")
+        self.clock = pygame.time.Clock()
+        self.renderer = WorldRenderer(SIMULATION_WIDTH, SIMULATION_HEIGHT)
+        self.panels = {
+            'world': Panel(0, 0, SIMULATION_WIDTH, SIMULATION_HEIGHT),
+            'statistics': Panel(0, SIMULATION_HEIGHT, SIMULATION_WIDTH, HEIGHT - SIMULATION_HEIGHT),
+            'controls': Panel(SIMULATION_WIDTH, 0, CONTROL_PANEL_WIDTH, 430),
+            'species': Panel(SIMULATION_WIDTH, 430, CONTROL_PANEL_WIDTH, 170),
+            'performance': Panel(SIMULATION_WIDTH, 600, CONTROL_PANEL_WIDTH, HEIGHT - 600),
+        }
+
+        self.sliders = self.create_sliders(simulation)
+        self.speed_button = Button(SIMULATION_WIDTH + 200, 380, 80, 40, speed_label(speed), self.cycle_speed)
+        self.buttons = [
+            Button(SIMULATION_WIDTH + 20, 380, 80, 40, "Pause", self.toggle_pause),
+            Button(SIMULATION_WIDTH + 110, 380, 80, 40, "Restart", self.restart_simulation),
+            self.speed_button,
+        ]
+
+        self.paused = False
+        self.running = True
+        # The sliders start from the simulation's own values, so there is nothing to apply yet
+        self.applied = tuple(slider.value for slider in self.sliders)
+        self.scheduler = self.create_scheduler(simulation, speed)
+        self.snapshot = self.scheduler.snapshot
+
+    def create_sliders(self, simulation):
+        prey = simulation.prey.parameters()
+        predator = simulation.predator.parameters()
+        return [
+            Slider(SIMULATION_WIDTH + 20, 80, 260, 20, 0.005, 0.02, prey['energy_decay_rate'], "Prey Energy Decay"),
+            Slider(SIMULATION_WIDTH + 20, 140, 260, 20, 0.05, 0.3, prey['energy_gain_rate'], "Prey Energy Gain"),
+            Slider(SIMULATION_WIDTH + 20, 200, 260, 20, 0.01, 0.03, predator['energy_decay_rate'], "Predator Energy Decay"),
+            Slider(SIMULATION_WIDTH + 20, 260, 260, 20, 20, 60, predator['energy_gain_from_prey'], "Predator Energy Gain"),
+            Slider(SIMULATION_WIDTH + 20, 320, 260, 20, 3, 10, predator['reproduction_threshold'], "Predator Reproduction Threshold")
+        ]
+
+    def create_scheduler(self, simulation, speed):
+        return Scheduler(simulation, self.capture, speed=speed)
+
+    def toggle_pause(self):
+        self.paused = not self.paused
+        self.scheduler.paused = self.paused
+
+    def restart_simulation(self):
+        self.scheduler.submit(self.simulation.reset)
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        enabled = self.overlay or bool(self.trace)
+        self.profiler.enable(enabled)
+        self.scheduler.submit(self.simulation.profiler.enable, enabled)
+
+    def cycle_speed(self):
+        speed = SPEEDS[(SPEEDS.index(self.scheduler.speed) + 1) % len(SPEEDS)]
+        self.scheduler.speed = speed
+        self.speed_button.text = speed_label(speed)
+
+    def handle_events(self):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.running = False
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                for panel in self.panels.values():
+                    panel.invalidate()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.toggle_overlay()
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if event.button == 1:  
+                    for slider in self.sliders:
+                        slider.update(event.pos)
+                    for button in self.buttons:
+                        button.handle_event(event)
+            elif event.type == pygame.MOUSEMOTION:
+                if event.buttons[0]:  
+                    for slider in self.sliders:
+                        slider.update(event.pos)
+
+    def apply_parameters(self):
+        values = tuple(slider.value for slider in self.sliders)
+        if values == self.applied:
+            return
+        self.applied = values
+        self.scheduler.submit(self.simulation.prey.set_parameters, {
+            'energy_decay_rate': values[0],
+            'energy_gain_rate': values[1],
+        })
+        self.scheduler.submit(self.simulation.predator.set_parameters, {
+            'energy_decay_rate': values[2],
+            'energy_gain_from_prey': values[3],
+            'reproduction_threshold': int(values[4]),
+        })
+
+    def positions(self, simulation):
+        """Position arrays of the live prey and predators."""
+        return [population.position[:population.count] for population in (simulation.prey, simulation.predator)]
+
+    def summary(self, simulation):
+        return summary(simulation.prey_stats, simulation.predator_stats)
+
+    def capture(self, simulation):
+        """Copy of everything draw() reads; runs on the scheduler thread."""
+        sim = simulation
+        return {
+            'tick': sim.tick,
+            'positions': [position.copy() for position in self.positions(sim)],
+            'summary': self.summary(sim),
+            'prey_trend': trend(sim.prey_history),
+            'predator_trend': trend(sim.predator_history),
+            # Replaced, never modified, on reset: the renderer keys its cache on them
+            'features': (sim.obstacle_array, sim.food_area_array, sim.hiding_spot_array),
+            'profile': sim.profiler.report() if sim.profiler.enabled else None,
+        }
+
+    def draw_world(self, screen):
+        with self.profiler.section('world.background'):
+            self.renderer.draw_background(screen, *self.snapshot['features'])
+        prey_position, predator_position = self.snapshot['positions']
+        with self.profiler.section('world.agents'):
+            self.renderer.draw_agents(screen, prey_position, PREY_COLOR, PreyPopulation.radius)
+            self.renderer.draw_agents(screen, predator_position, PREDATOR_COLOR, PredatorPopulation.radius)
+
+    def draw_world_panel(self, screen, overlay):
+        self.draw_world(screen)
+        if self.paused:
+            pause_text = text_cache.render("PAUSED", PREDATOR_COLOR, 36)
+            text_rect = pause_text.get_rect(center=(SIMULATION_WIDTH // 2, SIMULATION_HEIGHT // 2))
+            screen.blit(pause_text, text_rect)
+        if overlay:
+            self.draw_overlay(screen, overlay)
+
+    def overlay_lines(self, profile):
+        """Profiler averages as text, nested sections indented under their phase."""
+        lines = []
+        for title, report in (("Simulation ms/tick", profile), ("Render ms/frame", self.profiler.report())):
+            if report is None:
+                continue
+            times, counters = report
+            lines.append(title)
+            for name in sorted(times):
+                lines.append(f"{'  ' * (name.count('.') + 1)}{name.rsplit('.', 1)[-1]}: {times[name]:.2f}")
+            for name in sorted(counters):
+                lines.append(f"  {name}: {counters[name]:.1f}")
+        return tuple(lines)
+
+    def draw_overlay(self, screen, lines):
+        box = pygame.Surface((340, 18 * len(lines) + 10), pygame.SRCALPHA)
+        box.fill((*PANEL_BACKGROUND, 210))
+        for row, line in enumerate(lines):
+            box.blit(text_cache.render(line, TEXT_COLOR, 20), (8, 5 + 18 * row))
+        screen.blit(box, (10, 10))
+
+    def draw_controls(self, screen):
+        pygame.draw.rect(screen, PANEL_BACKGROUND, self.panels['controls'].rect)
+        title = text_cache.render("Simulation Controls", TEXT_COLOR, 36)
+        screen.blit(title, (SIMULATION_WIDTH + 20, 30))
+
+        for slider in self.sliders:
+            slider.draw(screen)
+
+        for button in self.buttons:
+            button.draw(screen)
+
+    def draw_species(self, screen, prey_count, prey_energy, predator_count, predator_energy):
+        pygame.draw.rect(screen, PANEL_BACKGROUND, self.panels['species'].rect)
+
+        # Prey stats
+        pygame.draw.rect(screen, PREY_COLOR, (SIMULATION_WIDTH + 20, 440, 260, 70))
+        screen.blit(text_cache.render(f"Prey: {prey_count}", BACKGROUND_COLOR), (SIMULATION_WIDTH + 30, 450))
+        screen.blit(text_cache.render(f"Avg Prey Energy: {prey_energy}", BACKGROUND_COLOR), (SIMULATION_WIDTH + 30, 480))
+
+        # Predator stats
+        pygame.draw.rect(screen, PREDATOR_COLOR, (SIMULATION_WIDTH + 20, 520, 260, 70))
+        screen.blit(text_cache.render(f"Predators: {predator_count}", BACKGROUND_COLOR), (SIMULATION_WIDTH + 30, 530))
+        screen.blit(text_cache.render(f"Avg Predator Energy: {predator_energy}", BACKGROUND_COLOR), (SIMULATION_WIDTH + 30, 560))
+
+    def draw_performance(self, screen, *lines):
+        pygame.draw.rect(screen, PANEL_BACKGROUND, self.panels['performance'].rect)
+        for row, line in enumerate(lines):
+            screen.blit(text_cache.render(line, TEXT_COLOR), (SIMULATION_WIDTH + 20, 610 + 30 * row))
+
+    def draw(self):
+        """Redraw the panels whose displayed values changed and push only
+        their rectangles to the display."""
+        published = self.scheduler.published
+        self.snapshot = snapshot = self.scheduler.snapshot
+        screen = self.screen
+        summary = snapshot['summary']
+        panels = self.panels
+        prey_trend = snapshot['prey_trend']
+        predator_trend = snapshot['predator_trend']
+        simulated_time = snapshot['tick'] * 1000 / self.scheduler.tick_rate
+
+        species = (summary['prey'], f"{summary['prey_energy']:.2f}", summary['predators'], f"{summary['predator_energy']:.2f}")
+        statistics = (species, f"{summary['prey_age']:.2f}", f"{summary['predator_age']:.2f}",
+                      f"{simulated_time / 1000:.2f}", prey_trend > 0, prey_trend < 0, predator_trend > 0, predator_trend < 0)
+        performance = (f"Tick: {snapshot['tick']}",
+                       f"Ticks/s: {self.scheduler.ticks_per_second:.0f}",
+                       f"FPS: {self.clock.get_fps():.0f}")
+        overlay = self.overlay_lines(snapshot['profile']) if self.overlay else None
+        dirty = [
+            self.update_panel('world', (published, self.paused, overlay), self.draw_world_panel, overlay),
+            self.update_panel('controls', tuple(slider.value for slider in self.sliders) +
+                              tuple(button.text for button in self.buttons), self.draw_controls),
+            self.update_panel('species', species, self.draw_species, *species),
+            self.update_panel('statistics', statistics, draw_statistics, summary, prey_trend,
+                              predator_trend, simulated_time),
+            self.update_panel('performance', performance, self.draw_performance, *performance),
+        ]
+        with self.profiler.section('display'):
+            pygame.display.update([rect for rect in dirty if rect is not None])
+        self.profiler.frame()
+
+    def update_panel(self, name, state, draw, *args):
+        with self.profiler.section(name):
+            return self.panels[name].update(self.screen, state, draw, *args)
+
+    def run(self):
+        self.scheduler.start()
+        try:
+            while self.running:
+                self.handle_events()
+                self.apply_parameters()
+                self.draw()
+                self.clock.tick(60)
+        finally:
+            self.scheduler.stop()
+            if self.trace:
+                export_trace(self.trace, self.simulation.profiler, self.profiler)
+
+class Playback:
+    """Steps through a recorded Replay the way the viewer steps a simulation."""
+
+    def __init__(self, replay, max_history=MAX_HISTORY):
+        self.replay = replay
+        self.max_history = max_history
+        self.obstacle_array = replay.obstacle_array
+        self.food_area_array = replay.food_area_array
+        self.hiding_spot_array = replay.hiding_spot_array
+        self.profiler = Profiler('playback')
+        self.reset()
+
+    def reset(self):
+        self.seek(0)
+
+    def seek(self, index):
+        self.index = max(0, min(index, len(self.replay) - 1))
+        self.tick = int(self.replay.ticks[self.index])
+        prey, predators = self.replay.frame(self.index)
+        self.prey = prey[prey['alive'] != 0]
+        self.predators = predators[predators['alive'] != 0]
+        start = max(0, self.index + 1 - self.max_history)
+        self.prey_history = self.replay.prey_counts[start:self.index + 1]
+        self.predator_history = self.replay.predator_counts[start:self.index + 1]
+
+    def step(self, n=1):
+        with self.profiler.section('seek'):
+            self.seek(self.index + n)
+        self.profiler.frame()
+
+class ReplayViewer(Viewer):
+    """Viewer for a recorded trajectory. The slider scrubs to any frame;
+    Pause, Restart and the speed button work as they do for a live run."""
+
+    def __init__(self, replay, speed=1, trace=None):
+        super().__init__(Playback(replay), speed, trace)
+        self.frame = 0
+
+    def create_sliders(self, simulation):
+        return [Slider(SIMULATION_WIDTH + 20, 80, 260, 20, 0, max(len(simulation.replay) - 1, 1), 0, "Frame")]
+
+    def handle_events(self):
+        super().handle_events()
+        frame = int(round(self.sliders[0].value))
+        if frame != self.frame:
+            self.frame = frame
+            self.scheduler.submit(self.simulation.seek, frame)
+
+    def apply_parameters(self):
+        pass
+
+    def positions(self, simulation):
+        return [records['position'] for records in (simulation.prey, simulation.predators)]
+
+    def summary(self, simulation):
+        prey = simulation.prey
+        predators = simulation.predators
+        return {
+            'prey': len(prey),
+            'predators': len(predators),
+            'prey_energy': mean(prey['energy']),
+            'predator_energy': mean(predators['energy']),
+            'prey_age': mean(prey['age']),
+            'predator_age': mean(predators['age']),
+        }
+
+    def capture(self, simulation):
+        snapshot = super().capture(simulation)
+        snapshot['index'] = simulation.index
+        return snapshot
+
+    def restart_simulation(self):
+        super().restart_simulation()
+        self.sliders[0].value = self.frame = 0
+
+    def draw(self):
+        self.frame = self.scheduler.snapshot['index']
+        self.sliders[0].value = self.frame
+        super().draw()
+
+class RemoteViewer(Viewer):
+    """Viewer for a simulation served by remote.RemoteServer, possibly on
+    another machine. Frames arrive over the connection, scaled to the world
+    panel, and the sliders and buttons are sent back as commands."""
+
+    def __init__(self, address, trace=None):
+        super().__init__(RemoteConnection(address, (SIMULATION_WIDTH, SIMULATION_HEIGHT)), trace=trace)
+        connection = self.scheduler
+        self.paused = connection.paused
+        self.speed_button.text = speed_label(connection.speed)
+
+    def create_scheduler(self, simulation, speed):
+        # The connection runs the receiving end and passes commands on
+        return simulation
+
+    def toggle_overlay(self):
+        super().toggle_overlay()
+        self.scheduler.send({'profile': self.overlay})
+
+def view(simulation, speed=1, trace=None, record=None, telemetry=None, telemetry_overflow='drop'):
+    """Open the viewer on ``simulation`` until the window is closed, optionally
+    recording it and streaming telemetry."""
+    pygame.init()
+    recorder = Recorder(record, simulation) if record else None
+    telemetry = Telemetry(simulation, telemetry, overflow=telemetry_overflow) if telemetry else None
+    Viewer(simulation, speed, trace).run()
+    if recorder is not None:
+        recorder.close()
+    if telemetry is not None:
+        telemetry.close()
+    pygame.quit()
+
+def replay(path, speed=1, trace=None):
+    """Open the viewer on a recorded trajectory."""
+    pygame.init()
+    ReplayViewer(Replay(path), speed, trace).run()
+    pygame.quit()
+
+def connect(address, trace=None):
+    """Open the viewer on a simulation served at ``address``."""
+    pygame.init()
+    RemoteViewer(address, trace).run()
+    pygame.quit()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Interactive predator-prey simulation.")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--record', metavar='PATH', help="stream every tick to a trajectory file")
+    parser.add_argument('--replay', metavar='PATH', help="play back a recorded trajectory instead of simulating")
+    parser.add_argument('--connect', metavar='ADDRESS',
+                        help="view a simulation served at tcp://host:port or unix:/path instead of simulating")
+    parser.add_argument('--speed', type=int, default=1, choices=[speed for speed in SPEEDS if speed],
+                        help="initial fast-forward multiplier")
+    parser.add_argument('--trace', metavar='PATH', help="profile from the start and write a Chrome trace on exit")
+    parser.add_argument('--telemetry', metavar='TARGET',
+                        help="stream per-tick statistics to a .csv file, an NPZ directory or tcp://host:port")
+    parser.add_argument('--telemetry-overflow', choices=OVERFLOW_POLICIES, default='drop',
+                        help="what to do when the telemetry writer falls behind (default: drop)")
+    args = parser.parse_args(argv)
+
+    if args.connect:
+        connect(args.connect, args.trace)
+    elif args.replay:
+        replay(args.replay, args.speed, args.trace)
+    else:
+        view(VectorSimulation(seed=args.seed), args.speed, args.trace, args.record, args.telemetry,
+             args.telemetry_overflow)
+
+if __name__ == "__main__":
+    main()
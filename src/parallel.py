@@ -0,0 +1,272 @@
+from multiprocessing import resource_tracker, shared_memory
+from population import PreyPopulation, PredatorPopulation
+from profiler import Profiler
+from simulation import VectorSimulation
+from spatial import SpatialGrid
+import multiprocessing
+import numpy as np
+import os
+
+class SharedArrays:
+    """NumPy arrays backed by named shared-memory blocks that grow on demand."""
+
+    def __init__(self):
+        self.blocks = {}
+
+    def array(self, key, shape, dtype):
+        dtype = np.dtype(dtype)
+        nbytes = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        block = self.blocks.get(key)
+        if block is None or block.size < nbytes:
+            if block is not None:
+                block.close()
+                block.unlink()
+            block = shared_memory.SharedMemory(create=True, size=2 * nbytes)
+            self.blocks[key] = block
+        return np.ndarray(shape, dtype, buffer=block.buf)
+
+    def publish(self, arrays):
+        """Copy ``arrays`` into shared memory; returns the specs workers attach by."""
+        specs = {}
+        for key, value in arrays.items():
+            self.array(key, value.shape, value.dtype)[...] = value
+            specs[key] = self.spec(key, value.shape, value.dtype)
+        return specs
+
+    def spec(self, key, shape, dtype):
+        return self.blocks[key].name, tuple(shape), np.dtype(dtype).str
+
+    def close(self):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
+
+class SharedView:
+    """Worker-side cache of attached shared-memory blocks."""
+
+    def __init__(self):
+        self.blocks = {}
+
+    def array(self, spec):
+        name, shape, dtype = spec
+        block = self.blocks.get(name)
+        if block is None:
+            # Workers share the master's resource tracker, which registered
+            # the block once; only the master unlinks it
+            block = shared_memory.SharedMemory(name=name)
+            self.blocks[name] = block
+        return np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+
+    def prune(self, specs):
+        """Detach blocks the master has since replaced with larger ones."""
+        active = {name for name, _, _ in specs.values()}
+        for name in list(self.blocks):
+            if name not in active:
+                self.blocks.pop(name).close()
+
+    def close(self):
+        for block in self.blocks.values():
+            block.close()
+        self.blocks = {}
+
+def tile_owners(grid, tiles, workers):
+    """Worker index for every grid cell when the world is cut into roughly
+    square tiles that are dealt out to the workers round-robin."""
+    tiles_x = min(grid.columns, max(1, int(round(np.sqrt(tiles * grid.width / grid.height)))))
+    tiles_y = min(grid.rows, max(1, int(np.ceil(tiles / tiles_x))))
+    cell_x = np.arange(grid.columns) * tiles_x // grid.columns
+    cell_y = np.arange(grid.rows) * tiles_y // grid.rows
+    tile = (cell_y[:, None] * tiles_x + cell_x[None, :]).ravel()
+    return tile % workers
+
+class TileWorker:
+    """World as seen from one worker process.
+
+    Arrays are views of the master's shared memory. The worker steers only
+    the awake prey in the cells it owns. Neighbours in the surrounding halo ring of
+    cells are read straight from the shared arrays, so no copies are
+    exchanged between tiles.
+    """
+
+    steer_prey = VectorSimulation.steer_prey
+    index_features = VectorSimulation.index_features
+
+    def __init__(self, index, config):
+        self.index = index
+        self.owner = config['owner']
+        self.width = config['width']
+        self.height = config['height']
+        self.obstacle_array = config['obstacle_array']
+        self.food_area_array = config['food_area_array']
+        self.hiding_spot_array = config['hiding_spot_array']
+        self.index_features()
+        self.profiler = Profiler('tile worker')
+        self.prey = PreyPopulation(0)
+        self.predator = PredatorPopulation(0)
+        self.prey_grid = SpatialGrid(config['width'], config['height'], config['cell_size'])
+        self.predator_grid = SpatialGrid(config['width'], config['height'], config['cell_size'])
+
+    def attach(self, view, specs, parameters):
+        arrays = {key: view.array(spec) for key, spec in specs.items()}
+        self.prey.set_parameters(parameters['prey'])
+        self.predator.set_parameters(parameters['predator'])
+        for population, species in ((self.prey, 'prey'), (self.predator, 'predator')):
+            population.position = arrays[species + '_position']
+            population.velocity = arrays[species + '_velocity']
+            population.energy = arrays[species + '_energy']
+            population.count = len(population.position)
+        for grid, species in ((self.prey_grid, 'prey'), (self.predator_grid, 'predator')):
+            grid.cell = arrays[species + '_cell']
+            grid.order = arrays[species + '_order']
+            grid.counts = arrays[species + '_counts']
+            grid.cell_start = arrays[species + '_cell_start']
+        return arrays
+
+    def steer(self, arrays):
+        rows = arrays['prey_rows']
+        owned = rows[self.owner[self.prey_grid.cell[rows]] == self.index]
+        if not len(owned):
+            return 0
+        steer, evade, stacked, energy, velocity = self.steer_prey(owned, arrays['prey_alive'], arrays['predator_alive'])
+        arrays['out_steer'][owned] = steer
+        arrays['out_evade'][owned] = evade
+        arrays['out_stacked'][owned] = stacked
+        arrays['out_energy'][owned] = energy
+        arrays['out_velocity'][owned] = velocity
+        return len(owned)
+
+    def take_timings(self):
+        """The section times and counters recorded since the last call."""
+        timings = self.profiler.current, self.profiler.current_counts
+        self.profiler.current, self.profiler.current_counts = {}, {}
+        return timings
+
+def run_worker(index, connection):
+    view = SharedView()
+    worker = None
+    while True:
+        message = connection.recv()
+        command = message[0]
+        reply = command
+        if command == 'configure':
+            worker = TileWorker(index, message[1])
+        elif command == 'steer':
+            _, specs, parameters, profile = message
+            arrays = worker.attach(view, specs, parameters)
+            view.prune(specs)
+            worker.profiler.enable(profile)
+            reply = (worker.steer(arrays),) + worker.take_timings()
+            del arrays
+        connection.send(reply)
+        if command == 'close':
+            break
+    view.close()
+    connection.close()
+
+class ParallelSimulation(VectorSimulation):
+    """VectorSimulation whose prey steering, the bulk of every tick, is split
+    across worker processes by spatial tiles.
+
+    The master publishes the live state and both grids to shared memory once
+    per tick, workers write the steering of the prey in their tiles into
+    shared output arrays, and the master finishes the tick exactly as the
+    serial engine does. All random draws stay on the master's Generators and each prey's
+    neighbours are visited in the same order, so a run matches
+    VectorSimulation bit for bit. While ``profiler`` is enabled, the workers'
+    steering timings and counters are merged into it every tick.
+    """
+
+    def __init__(self, *args, workers=None, tiles=None, **kwargs):
+        self.workers = workers or os.cpu_count() or 1
+        self.tiles = tiles or 4 * self.workers
+        self.shared = SharedArrays()
+        context = multiprocessing.get_context()
+        # Started before the workers, so they inherit it instead of each
+        # starting a tracker that would outlive the blocks the master unlinks
+        resource_tracker.ensure_running()
+        self.connections = []
+        self.processes = []
+        for index in range(self.workers):
+            parent, child = context.Pipe()
+            process = context.Process(target=run_worker, args=(index, child), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        super().__init__(*args, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def broadcast(self, message):
+        for connection in self.connections:
+            connection.send(message)
+        return [connection.recv() for connection in self.connections]
+
+    def reset(self, seed=None):
+        super().reset(seed)
+        self.configure_workers()
+
+    def load_state(self, state):
+        super().load_state(state)
+        self.configure_workers()
+
+    def configure_workers(self):
+        self.broadcast(('configure', {
+            'width': self.width,
+            'height': self.height,
+            'cell_size': self.cell_size,
+            'owner': tile_owners(self.prey_grid, self.tiles, self.workers),
+            'obstacle_array': self.obstacle_array,
+            'food_area_array': self.food_area_array,
+            'hiding_spot_array': self.hiding_spot_array,
+        }))
+
+    def steer_prey(self, rows, prey_alive, predator_alive):
+        prey = self.prey
+        predator = self.predator
+        n = prey.count
+        arrays = {'prey_rows': rows, 'prey_alive': prey_alive, 'predator_alive': predator_alive}
+        for population, grid, species in ((prey, self.prey_grid, 'prey'), (predator, self.predator_grid, 'predator')):
+            arrays[species + '_position'] = population.position[:population.count]
+            arrays[species + '_velocity'] = population.velocity[:population.count]
+            arrays[species + '_energy'] = population.energy[:population.count]
+            arrays[species + '_cell'] = grid.cell
+            arrays[species + '_order'] = grid.order
+            arrays[species + '_counts'] = grid.counts
+            arrays[species + '_cell_start'] = grid.cell_start
+        specs = self.shared.publish(arrays)
+
+        outputs = {
+            'out_steer': ((n, 2), float),
+            'out_evade': ((n, 2), float),
+            'out_stacked': ((n,), np.intp),
+            'out_energy': ((n,), float),
+            'out_velocity': ((n, 2), float),
+        }
+        for key, (shape, dtype) in outputs.items():
+            self.shared.array(key, shape, dtype)
+            specs[key] = self.shared.spec(key, shape, dtype)
+
+        profile = self.profiler
+        replies = self.broadcast(('steer', specs, {'prey': prey.parameters(), 'predator': predator.parameters()},
+                                  profile.enabled))
+        if profile.enabled:
+            # Times add up over the workers; per-agent counters are weighted by the rows each steered
+            for steered, durations, counts in replies:
+                profile.merge(durations, counts, steered / max(len(rows), 1))
+        return tuple(self.shared.array(key, shape, dtype)[rows].copy() for key, (shape, dtype) in outputs.items())
+
+    def close(self):
+        if not self.connections:
+            return
+        self.broadcast(('close',))
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+        self.shared.close()
@@ -0,0 +1,306 @@
+from spatial import pair_passes
+import numpy as np
+
+def limit_force(force, max_force):
+    length_squared = np.einsum('ij,ij->i', force, force)
+    over = length_squared > max_force * max_force
+    force[over] *= (max_force / np.sqrt(length_squared[over]))[:, None]
+    return force
+
+def scale_to_length(vectors, length):
+    length_squared = np.einsum('ij,ij->i', vectors, vectors)
+    nonzero = length_squared > 0
+    vectors[nonzero] *= (length / np.sqrt(length_squared[nonzero]))[:, None]
+    return vectors
+
+def random_unit_vectors(n, rng):
+    vectors = rng.uniform(-1, 1, (n, 2))
+    return scale_to_length(vectors, 1.0)
+
+class Population:
+    """Structure-of-arrays store for one species.
+
+    Every per-agent attribute of Agent lives in a preallocated NumPy array and
+    only the first ``count`` rows are live. Species parameters are class
+    attributes, like on Prey and Predator, and can be overridden per instance.
+    All randomness for the species comes from its own Generator ``rng``.
+    ``identity`` numbers the agents in the order they were added, so it
+    follows an agent across the row moves of keep().
+    """
+
+    max_speed = 2
+    max_speed_squared = 4
+    max_force = 0.05
+    perception_radius = 75
+    perception_radius_squared = 5625
+    initial_energy = 150
+    max_energy = 300
+    radius = 5
+    parameter_names = ('max_speed', 'max_speed_squared', 'max_force', 'perception_radius',
+                       'perception_radius_squared', 'initial_energy', 'max_energy', 'radius')
+
+    def __init__(self, capacity=256, rng=None):
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.capacity = 0
+        self.count = 0
+        self.next_identity = 0
+        self.position = np.zeros((0, 2))
+        self.velocity = np.zeros((0, 2))
+        self.acceleration = np.zeros((0, 2))
+        self.energy = np.zeros(0)
+        self.age = np.zeros(0, dtype=np.int32)
+        self.reproduction_timer = np.zeros(0, dtype=np.int32)
+        self.prey_eaten = np.zeros(0, dtype=np.int32)
+        # Never reused, so rows stay in increasing identity order
+        self.identity = np.zeros(0, dtype=np.int64)
+        self.reserve(capacity)
+
+    def __len__(self):
+        return self.count
+
+    def fields(self):
+        return ('position', 'velocity', 'acceleration', 'energy', 'age', 'reproduction_timer', 'prey_eaten',
+                'identity')
+
+    def parameters(self):
+        return {name: getattr(self, name) for name in self.parameter_names}
+
+    def parameter(self, name, rows):
+        """Value of parameter ``name`` for ``rows``; one value for all of them
+        here, but subclasses may vary it per row."""
+        return getattr(self, name)
+
+    def set_parameters(self, parameters):
+        for name, value in parameters.items():
+            if name not in self.parameter_names:
+                raise ValueError(f"Unknown {type(self).__name__} parameter: {name}")
+            setattr(self, name, value)
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        for name in self.fields():
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def add(self, positions, energy=None):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        n = len(positions)
+        start = self.count
+        if start + n > self.capacity:
+            self.reserve(max(start + n, 2 * self.capacity))
+        end = start + n
+        self.position[start:end] = positions
+        self.velocity[start:end] = self.random_unit_vectors(n)
+        self.acceleration[start:end] = 0
+        self.energy[start:end] = self.initial_energy if energy is None else energy
+        self.age[start:end] = 0
+        self.reproduction_timer[start:end] = 0
+        self.prey_eaten[start:end] = 0
+        self.identity[start:end] = np.arange(self.next_identity, self.next_identity + n)
+        self.next_identity += n
+        self.count = end
+        return np.arange(start, end)
+
+    def keep(self, mask):
+        """Compact the live rows, keeping those where ``mask`` is True."""
+        n = self.count
+        kept = int(np.count_nonzero(mask))
+        if kept == n:
+            return
+        for name in self.fields():
+            array = getattr(self, name)
+            array[:kept] = array[:n][mask]
+        self.count = kept
+
+    def nbytes(self):
+        return sum(getattr(self, name)[:self.count].nbytes for name in self.fields())
+
+    def update(self, width, height):
+        n = self.count
+        velocity = self.velocity[:n]
+        velocity += self.acceleration[:n]
+        speed_squared = np.einsum('ij,ij->i', velocity, velocity)
+        over = speed_squared > self.max_speed_squared
+        velocity[over] *= (self.max_speed / np.sqrt(speed_squared[over]))[:, None]
+        self.position[:n] += velocity
+        self.acceleration[:n] = 0
+        self.wrap(width, height)
+        self.age[:n] += 1
+
+    def random_unit_vectors(self, n):
+        return random_unit_vectors(n, self.rng)
+
+    def wrap(self, width, height):
+        position = self.position[:self.count]
+        np.mod(position[:, 0], width, out=position[:, 0])
+        np.mod(position[:, 1], height, out=position[:, 1])
+
+    def limit_force(self, force):
+        return limit_force(force, self.max_force)
+
+    def seek(self, targets, rows=slice(None), velocity=None):
+        desired = targets - self.position[:self.count][rows]
+        if velocity is None:
+            velocity = self.velocity[:self.count][rows]
+        scale_to_length(desired, self.max_speed)
+        nonzero = np.einsum('ij,ij->i', desired, desired) > 0
+        steer = np.where(nonzero[:, None], desired - velocity, 0.0)
+        return self.limit_force(steer)
+
+    def avoid_obstacle(self, obstacles):
+        """``obstacles`` and the other feature arguments are FeatureIndexes;
+        each pass of pairs adds one feature per agent, in feature order."""
+        n = self.count
+        i, _, away = obstacles.pairs(self.position[:n], obstacles.radius + self.radius + 10)
+        for rows in pair_passes(i):
+            self.acceleration[i[rows]] += scale_to_length(away[rows], self.max_force * 2)
+
+class PreyPopulation(Population):
+    color = (46, 139, 87)  # Sea Green
+    energy_decay_rate = 0.01
+    energy_gain_rate = 0.15
+    reproduction_energy_cost = 75
+    reproduction_interval = 400
+    max_population = 150
+    # Weights of the steering behaviours
+    flock_weight = 0.3
+    evade_weight = 2.5
+    obstacle_weight = 1.2
+    food_weight = 0.5
+    hiding_weight = 0.7
+    parameter_names = Population.parameter_names + ('energy_decay_rate', 'energy_gain_rate', 'reproduction_energy_cost',
+                                                    'reproduction_interval', 'max_population', 'flock_weight',
+                                                    'evade_weight', 'obstacle_weight', 'food_weight', 'hiding_weight')
+
+    def __init__(self, capacity=256, rng=None):
+        # Last full steering force, reused while a prey sleeps
+        self.steering = np.zeros((0, 2))
+        super().__init__(capacity, rng)
+
+    def fields(self):
+        return super().fields() + ('steering',)
+
+    def add(self, positions, energy=None):
+        rows = super().add(positions, energy)
+        self.steering[rows] = 0
+        return rows
+
+    def graze(self, food_areas, rows):
+        """The energy seek_food() adds, without the steering, for ``rows``."""
+        i, _, _ = food_areas.pairs(self.position[rows], food_areas.radius)
+        for pairs in pair_passes(i):
+            inside = rows[i[pairs]]
+            self.energy[inside] = np.minimum(self.energy[inside] + self.parameter('energy_gain_rate', inside),
+                                             self.max_energy)
+
+    # The steering behaviours below work on any subset ``rows`` of the live
+    # prey and only read shared state, so disjoint subsets can be computed
+    # independently. Per-row results that would otherwise be written back
+    # (energy, velocity) go into caller-owned arrays aligned with ``rows``.
+
+    def flock(self, neighbours, rows):
+        """Alignment, cohesion and separation for every prey in ``rows``.
+
+        ``neighbours`` is (i, j, offset): i indexes into ``rows``, j is the row
+        of another prey that i can see and offset the wrapped vector to it.
+        """
+        n = len(rows)
+        i, j, offset = neighbours
+        velocity = self.velocity[rows]
+
+        distance_squared = np.einsum('ij,ij->i', offset, offset)
+        inverse = np.divide(1.0, distance_squared, out=np.zeros_like(distance_squared), where=distance_squared > 0)
+
+        total = np.bincount(i, minlength=n)
+        flocking = total > 0
+        total = total[flocking][:, None]
+
+        def neighbour_sum(values):
+            return np.column_stack((np.bincount(i, values[:, 0], n), np.bincount(i, values[:, 1], n)))[flocking]
+
+        alignment = scale_to_length(neighbour_sum(self.velocity[j]) / total, self.max_speed)
+        cohesion = scale_to_length(neighbour_sum(offset) / total, self.max_speed)
+        separation = scale_to_length(neighbour_sum(offset * inverse[:, None]) / total, self.max_speed)
+        alignment -= velocity[flocking]
+        cohesion -= velocity[flocking]
+        separation -= velocity[flocking]
+
+        force = np.zeros((n, 2))
+        force[flocking] = self.limit_force(alignment * 0.5 + cohesion * 0.3 + separation * 0.5)
+        return force
+
+    def evade(self, neighbours, rows):
+        """Unclamped evasion sum for every prey in ``rows``.
+
+        ``neighbours`` is (i, away): i indexes into ``rows`` and away is the
+        wrapped offset from a threatening predator to that prey. Predators
+        sitting exactly on a prey are only counted; scatter() gives them a
+        random direction so this stays deterministic.
+        """
+        n = len(rows)
+        i, away = neighbours
+        stacked = np.einsum('ij,ij->i', away, away) == 0
+        away = scale_to_length(away.copy(), self.max_speed)
+        # Weighted bincount of nothing comes back as integers
+        force = np.column_stack((np.bincount(i, away[:, 0], n), np.bincount(i, away[:, 1], n))).astype(np.float64)
+        return force, np.bincount(i[stacked], minlength=n)
+
+    def scatter(self, force, stacked):
+        rows = np.flatnonzero(stacked)
+        if len(rows):
+            flee = self.random_unit_vectors(int(stacked[rows].sum())) * self.max_speed
+            np.add.at(force, np.repeat(rows, stacked[rows]), flee)
+        return self.limit_force(force)
+
+    def avoid_obstacles(self, obstacles, rows):
+        force = np.zeros((len(rows), 2))
+        i, _, away = obstacles.pairs(self.position[rows], obstacles.radius + self.radius + 10)
+        for pairs in pair_passes(i):
+            force[i[pairs]] += scale_to_length(away[pairs], self.max_speed)
+        return self.limit_force(force)
+
+    def seek_food(self, food_areas, rows, energy, velocity):
+        force = np.zeros((len(rows), 2))
+        i, f, _ = food_areas.pairs(self.position[rows], food_areas.radius)
+        for pairs in pair_passes(i):
+            inside = i[pairs]
+            energy[inside] = np.minimum(energy[inside] + self.parameter('energy_gain_rate', rows[inside]),
+                                        self.max_energy)
+            force[inside] += self.seek(food_areas.centres[f[pairs]], rows[inside], velocity[inside])
+        return self.limit_force(force)
+
+    def use_hiding_spots(self, hiding_spots, rows, threats, velocity):
+        force = np.zeros((len(rows), 2))
+        i, f, _ = hiding_spots.pairs(self.position[rows], hiding_spots.radius)
+        threatened = threats[i] > 0
+        i, f = i[threatened], f[threatened]
+        for pairs in pair_passes(i):
+            hiding = i[pairs]
+            force[hiding] += self.seek(hiding_spots.centres[f[pairs]], rows[hiding], velocity[hiding]) * threats[hiding][:, None]
+            velocity[hiding] *= (0.8 ** threats[hiding])[:, None]
+        return self.limit_force(force)
+
+class PredatorPopulation(Population):
+    color = (178, 34, 34)  # Firebrick
+    max_speed = 1.8
+    energy_decay_rate = 0.015
+    energy_gain_from_prey = 40
+    reproduction_threshold = 6
+    reproduction_energy_cost = 120
+    max_population = 15
+    # Weights of chasing prey and of wandering, as fractions of max_force for the latter
+    chase_weight = 0.8
+    wander_weight = 0.5
+    parameter_names = Population.parameter_names + ('energy_decay_rate', 'energy_gain_from_prey', 'reproduction_threshold',
+                                                    'reproduction_energy_cost', 'max_population', 'chase_weight',
+                                                    'wander_weight')
+
+    def avoid_hiding_spots(self, hiding_spots):
+        n = self.count
+        i, _, away = hiding_spots.pairs(self.position[:n], hiding_spots.radius * 1.5)
+        for rows in pair_passes(i):
+            self.acceleration[i[rows]] += scale_to_length(away[rows], self.max_force * 0.3)
@@ -0,0 +1,120 @@
+from collections import deque
+from contextlib import nullcontext
+import json
+import os
+import threading
+import time
+
+# Shared by every disabled section() so the disabled path allocates nothing
+DISABLED = nullcontext()
+# Common time origin, so traces from several profilers line up
+EPOCH = time.perf_counter()
+
+class Section:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.name, self.start, time.perf_counter() - self.start)
+
+class Profiler:
+    """Named timers and counters for one thread's hot path.
+
+    Code wraps a phase in ``with profiler.section(name)`` and reports
+    quantities with count(name, value); frame() closes a tick or a rendered
+    frame. Per-frame totals are smoothed into ``averages`` (milliseconds for
+    sections) and ``counters``. With ``trace`` on, every section and counter
+    is also kept as an event for export_trace(). While disabled, section()
+    returns a shared no-op context and count() returns at once.
+    """
+
+    def __init__(self, name, smoothing=0.1, trace_capacity=1000000):
+        self.name = name
+        self.smoothing = smoothing
+        self.enabled = False
+        self.trace = False
+        self.events = deque(maxlen=trace_capacity)
+        self.thread = threading.get_ident()
+        self.reset()
+
+    def reset(self):
+        self.current = {}
+        self.current_counts = {}
+        self.averages = {}
+        self.counters = {}
+        self.frames = 0
+
+    def enable(self, enabled=True, trace=None):
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = enabled
+        if trace is not None:
+            self.trace = trace
+
+    def section(self, name):
+        return Section(self, name) if self.enabled else DISABLED
+
+    def add(self, name, start, duration):
+        self.current[name] = self.current.get(name, 0.0) + duration
+        if self.trace:
+            self.events.append(('X', name, start, duration))
+
+    def count(self, name, value):
+        if not self.enabled:
+            return
+        self.current_counts[name] = self.current_counts.get(name, 0) + value
+        if self.trace:
+            self.events.append(('C', name, time.perf_counter(), value))
+
+    def merge(self, durations, counts, weight=1.0):
+        """Add another profiler's unfinished frame, such as a worker
+        process's, to this one. Counter values are scaled by ``weight``."""
+        for name, duration in durations.items():
+            self.current[name] = self.current.get(name, 0.0) + duration
+        for name, value in counts.items():
+            self.current_counts[name] = self.current_counts.get(name, 0) + value * weight
+
+    def frame(self):
+        if not self.enabled:
+            return
+        self.thread = threading.get_ident()
+        # The first frame seeds the averages instead of decaying from zero
+        weight = self.smoothing if self.frames else 1.0
+        for totals, averages, scale in ((self.current, self.averages, 1000.0),
+                                        (self.current_counts, self.counters, 1.0)):
+            for name in averages.keys() - totals.keys():
+                averages[name] *= 1 - weight
+            for name, value in totals.items():
+                averages[name] = averages.get(name, 0.0) * (1 - weight) + value * scale * weight
+            totals.clear()
+        self.frames += 1
+
+    def report(self):
+        """Copy of the smoothed section times (ms per frame) and counters."""
+        return dict(self.averages), dict(self.counters)
+
+    def trace_events(self):
+        """Recorded events in Chrome trace event format (microseconds)."""
+        events = [{'ph': 'M', 'name': 'thread_name', 'pid': os.getpid(), 'tid': self.thread,
+                   'args': {'name': self.name}}]
+        for kind, name, start, value in self.events:
+            event = {'ph': kind, 'name': name, 'pid': os.getpid(), 'tid': self.thread,
+                     'ts': (start - EPOCH) * 1e6}
+            if kind == 'X':
+                event['dur'] = value * 1e6
+            else:
+                event['args'] = {'value': value}
+            events.append(event)
+        return events
+
+def export_trace(path, *profilers):
+    """Write the profilers' events as one JSON trace for chrome://tracing or Perfetto."""
+    events = [event for profiler in profilers for event in profiler.trace_events()]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
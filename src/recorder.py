@@ -0,0 +1,179 @@
+import json
+import numpy as np
+
+MAGIC = b'PPTRAJ\x00\x01'
+
+# One agent in one frame, packed
+RECORD_DTYPE = np.dtype([
+    ('position', '<f4', 2),
+    ('velocity', '<f4', 2),
+    ('energy', '<f4'),
+    ('age', '<i4'),
+    ('alive', 'u1'),
+])
+# Per-chunk header: number of frames and size of everything after the header
+CHUNK_DTYPE = np.dtype([('frames', '<i8'), ('nbytes', '<i8')])
+# Per-frame table entry: record counts and how many of them are alive
+FRAME_DTYPE = np.dtype([
+    ('tick', '<i8'),
+    ('prey', '<i4'),
+    ('predators', '<i4'),
+    ('prey_alive', '<i4'),
+    ('predators_alive', '<i4'),
+])
+
+def population_records(population, alive=None):
+    n = population.count
+    records = np.empty(n, dtype=RECORD_DTYPE)
+    records['position'] = population.position[:n]
+    records['velocity'] = population.velocity[:n]
+    records['energy'] = population.energy[:n]
+    records['age'] = population.age[:n]
+    records['alive'] = True if alive is None else alive
+    return records
+
+def agent_records(agents):
+    records = np.empty(len(agents), dtype=RECORD_DTYPE)
+    if agents:
+        records['position'] = [tuple(agent.position) for agent in agents]
+        records['velocity'] = [tuple(agent.velocity) for agent in agents]
+        records['energy'] = [agent.energy for agent in agents]
+        records['age'] = [agent.age for agent in agents]
+        records['alive'] = [agent.alive for agent in agents]
+    return records
+
+def feature_list(features):
+    return [[f.position.x, f.position.y, f.radius] for f in features]
+
+def feature_lists(simulation):
+    """[x, y, radius] rows of the obstacles, food areas and hiding spots,
+    straight from the feature arrays when the engine has them."""
+    if hasattr(simulation, 'obstacle_array'):
+        return [array.tolist() for array in (simulation.obstacle_array, simulation.food_area_array,
+                                             simulation.hiding_spot_array)]
+    return [feature_list(features) for features in (simulation.obstacles, simulation.food_areas,
+                                                    simulation.hiding_spots)]
+
+class Recorder:
+    """Streams every tick of a simulation to a chunked binary trajectory.
+
+    The file is a magic number, a JSON header (world size, seed, environment
+    features) and then chunks of ``chunk_frames`` frames, each written with a
+    single call: a CHUNK_DTYPE header, the FRAME_DTYPE table and the prey and
+    predator records of every frame in turn. A frame holds every agent that
+    acted during the tick, with ``alive`` cleared for those that starved or
+    were eaten; newborns appear from the next frame on.
+
+    Attaching records the current state as the first frame. Only complete
+    chunks are ever read back, so a run that is killed loses at most the
+    frames still buffered.
+    """
+
+    def __init__(self, path, simulation, chunk_frames=64):
+        self.simulation = simulation
+        self.chunk_frames = chunk_frames
+        self.frames = []
+        self.records = []
+        obstacles, food_areas, hiding_spots = feature_lists(simulation)
+        header = json.dumps({
+            'engine': type(simulation).__name__,
+            'width': simulation.width,
+            'height': simulation.height,
+            'seed': simulation.seed,
+            'obstacles': obstacles,
+            'food_areas': food_areas,
+            'hiding_spots': hiding_spots,
+        }).encode()
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + np.array(len(header), dtype='<u4').tobytes() + header)
+        simulation.recorder = self
+        self.record(simulation.tick, *simulation.records())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record(self, tick, prey, predators):
+        self.frames.append((tick, len(prey), len(predators),
+                            np.count_nonzero(prey['alive']), np.count_nonzero(predators['alive'])))
+        self.records.append(prey)
+        self.records.append(predators)
+        if len(self.frames) >= self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        if not self.frames:
+            return
+        frames = np.array(self.frames, dtype=FRAME_DTYPE)
+        records = np.concatenate(self.records)
+        chunk = np.array((len(frames), frames.nbytes + records.nbytes), dtype=CHUNK_DTYPE)
+        self.file.write(chunk.tobytes() + frames.tobytes() + records.tobytes())
+        self.file.flush()
+        self.frames = []
+        self.records = []
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+        if self.simulation.recorder is self:
+            self.simulation.recorder = None
+
+class Replay:
+    """Read-only, memory-mapped view of a trajectory written by Recorder.
+
+    Opening only walks the chunk headers; frame(index) returns record arrays
+    that are views straight into the mapped file, so scrubbing to any frame
+    costs the same and nothing is loaded until it is touched.
+    """
+
+    def __init__(self, path):
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(self.data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"Not a trajectory file: {path}")
+        start = len(MAGIC) + 4
+        length = int(self.data[len(MAGIC):start].view('<u4')[0])
+        self.header = json.loads(bytes(self.data[start:start + length]))
+        self.width = self.header['width']
+        self.height = self.header['height']
+        self.obstacle_array = np.array(self.header['obstacles'], dtype=float).reshape(-1, 3)
+        self.food_area_array = np.array(self.header['food_areas'], dtype=float).reshape(-1, 3)
+        self.hiding_spot_array = np.array(self.header['hiding_spots'], dtype=float).reshape(-1, 3)
+
+        tables = []
+        starts = []
+        offset = start + length
+        while offset + CHUNK_DTYPE.itemsize <= len(self.data):
+            chunk = self.data[offset:offset + CHUNK_DTYPE.itemsize].view(CHUNK_DTYPE)[0]
+            body = offset + CHUNK_DTYPE.itemsize
+            if body + chunk['nbytes'] > len(self.data):
+                break  # truncated last chunk
+            table = np.array(self.data[body:body + int(chunk['frames']) * FRAME_DTYPE.itemsize].view(FRAME_DTYPE))
+            sizes = (table['prey'] + table['predators']).astype(np.int64) * RECORD_DTYPE.itemsize
+            tables.append(table)
+            starts.append(body + table.nbytes + np.cumsum(sizes) - sizes)
+            offset = body + int(chunk['nbytes'])
+        self.frames = np.concatenate(tables) if tables else np.zeros(0, dtype=FRAME_DTYPE)
+        self.offsets = np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64)
+        self.ticks = self.frames['tick']
+        self.prey_counts = self.frames['prey_alive']
+        self.predator_counts = self.frames['predators_alive']
+
+    def __len__(self):
+        return len(self.frames)
+
+    def frame(self, index):
+        """(prey, predators) record arrays of frame ``index``."""
+        frame = self.frames[index]
+        start = int(self.offsets[index])
+        middle = start + int(frame['prey']) * RECORD_DTYPE.itemsize
+        end = middle + int(frame['predators']) * RECORD_DTYPE.itemsize
+        return self.data[start:middle].view(RECORD_DTYPE), self.data[middle:end].view(RECORD_DTYPE)
+
+    def index(self, tick):
+        """First frame at or after ``tick`` (ticks only increase unless the
+        simulation was reset while recording)."""
+        return min(int(np.searchsorted(self.ticks, tick)), len(self) - 1)
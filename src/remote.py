@@ -0,0 +1,592 @@
+from profiler import Profiler
+from scheduler import SPEEDS, Scheduler
+from stats import summary, trend
+import json
+import numpy as np
+import os
+import queue
+import socket
+import threading
+import time
+import zlib
+
+# Every message: its kind and the size of the body that follows
+MESSAGE_DTYPE = np.dtype([('kind', 'u1'), ('nbytes', '<u4')])
+WORLD, FRAME, COMMAND = 1, 2, 3
+# Per species in a frame: live agents and the row count of the frame it is
+# encoded against, -1 for a key frame
+SPECIES_DTYPE = np.dtype([('count', '<u4'), ('previous', '<i4')])
+# A step too large for one byte
+ESCAPE = -128
+
+def parse_address(address):
+    """(family, address) of tcp://host:port or unix:/path."""
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    if address.startswith('tcp://'):
+        address = address[len('tcp://'):]
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or 'localhost', int(port))
+
+def pack_message(kind, body):
+    return np.array((kind, len(body)), dtype=MESSAGE_DTYPE).tobytes() + body
+
+def receive_exactly(connection, nbytes):
+    data = bytearray(nbytes)
+    view = memoryview(data)
+    received = 0
+    while received < nbytes:
+        n = connection.recv_into(view[received:])
+        if not n:
+            return None
+        received += n
+    return bytes(data)
+
+def receive_message(connection):
+    """(kind, body) of the next message, or None once the peer has gone."""
+    header = receive_exactly(connection, MESSAGE_DTYPE.itemsize)
+    if header is None:
+        return None
+    header = np.frombuffer(header, dtype=MESSAGE_DTYPE)[0]
+    body = receive_exactly(connection, int(header['nbytes']))
+    return None if body is None else (int(header['kind']), body)
+
+def quantise(position, width, height, bits):
+    """Positions as 16-bit fractions of the world with only the top ``bits``
+    bits kept. The range spans the world exactly, so crossing a wrapping
+    edge is an integer overflow and still a small step."""
+    grid = (position * (65536 / width, 65536 / height)).astype(np.int32)
+    grid &= 0x10000 - (1 << (16 - bits))
+    return grid.astype(np.uint16)
+
+def encode_deltas(grid, reference, bits):
+    """Signed steps of 2**(16 - bits) from ``reference`` to ``grid``: one
+    byte per coordinate, with ESCAPE standing in for the few steps that do
+    not fit, which follow as 16-bit values."""
+    delta = np.subtract(grid, reference, dtype=np.uint16).view(np.int16)
+    delta >>= 16 - bits
+    steps = delta.astype(np.int8)
+    escaped = steps != delta
+    escaped |= steps == ESCAPE
+    steps[escaped] = ESCAPE
+    return steps.tobytes() + delta[escaped].astype('<i2').tobytes()
+
+def delta_nbytes(data, count):
+    """Size of the encode_deltas() output for ``count`` agents at the start of ``data``."""
+    steps = np.frombuffer(data, dtype=np.int8, count=2 * count)
+    return 2 * count + 2 * int(np.count_nonzero(steps == ESCAPE))
+
+def decode_deltas(data, reference, bits):
+    steps = np.frombuffer(data, dtype=np.int8, count=reference.size)
+    delta = steps.astype(np.int16)
+    escaped = steps == ESCAPE
+    delta[escaped] = np.frombuffer(data, dtype='<i2', offset=steps.size)
+    delta <<= 16 - bits
+    return np.add(reference, delta.view(np.uint16).reshape(reference.shape), dtype=np.uint16)
+
+def key_block(grid, bits):
+    return len(grid), -1, b'', encode_deltas(grid, np.zeros_like(grid), bits)
+
+def rows(grid, mask):
+    # Both coordinates as one 32-bit value: a much faster gather
+    return grid.view(np.uint32)[:, 0][mask].view(np.uint16).reshape(-1, 2)
+
+class DeltaEncoder:
+    """Grid positions of one species, each frame encoded as the change from
+    the one before.
+
+    Rows are matched by Population.identity. The survivors of the previous
+    frame keep their order and newborns follow them, so a frame needs one
+    bit per previous row (did it survive?) and one small step per live row;
+    newborns step from the origin. The first frame, or one whose rows do not
+    line up (a restored checkpoint), is a key frame.
+    """
+
+    def __init__(self, bits):
+        self.bits = bits
+        self.identity = None
+        self.grid = None
+
+    def survivors(self, identity):
+        """Mask of the previous rows still alive, or None for a key frame."""
+        previous = self.identity
+        if previous is None:
+            return None
+        if not len(previous):
+            return np.zeros(0, dtype=bool)
+        survivors = identity[:np.searchsorted(identity, previous[-1], side='right')]
+        if len(survivors) == len(previous):
+            return np.ones(len(previous), dtype=bool) if np.array_equal(previous, survivors) else None
+        first = previous[0]
+        if previous[-1] - first <= 16 * len(previous) and not (len(survivors) and survivors[0] < first):
+            # Identities are never reused, so a table over their range marks the survivors
+            alive = np.zeros(previous[-1] - first + 1, dtype=bool)
+            alive[survivors - first] = True
+            kept = alive[previous - first]
+        else:
+            kept = np.zeros(len(previous), dtype=bool)
+            kept[np.minimum(np.searchsorted(previous, survivors), len(previous) - 1)] = True
+        if not np.array_equal(previous[kept], survivors):
+            return None
+        return kept
+
+    def encode(self, identity, grid):
+        """(count, previous, kept bits, deltas) of the next frame."""
+        kept = self.survivors(identity)
+        if kept is None:
+            block = key_block(grid, self.bits)
+        else:
+            reference = np.zeros_like(grid)
+            survivors = rows(self.grid, kept)
+            reference[:len(survivors)] = survivors
+            block = (len(grid), len(kept), np.packbits(kept).tobytes(), encode_deltas(grid, reference, self.bits))
+        self.identity = identity
+        self.grid = grid
+        return block
+
+class DeltaDecoder:
+    """Client side of DeltaEncoder."""
+
+    def __init__(self, bits):
+        self.bits = bits
+        self.grid = np.zeros((0, 2), dtype=np.uint16)
+
+    def decode(self, count, previous, kept, deltas):
+        reference = np.zeros((count, 2), dtype=np.uint16)
+        if previous >= 0:
+            if previous != len(self.grid):
+                raise ValueError("Frame does not follow the previous one")
+            survivors = rows(self.grid, np.unpackbits(np.frombuffer(kept, dtype=np.uint8), count=previous).view(bool))
+            reference[:len(survivors)] = survivors
+        self.grid = decode_deltas(deltas, reference, self.bits)
+        return self.grid
+
+def compress(data):
+    # The steps are small but have no repeats worth searching for, so
+    # Huffman coding alone is both smaller and several times faster
+    compressor = zlib.compressobj(1, zlib.DEFLATED, 15, 9, zlib.Z_HUFFMAN_ONLY)
+    return compressor.compress(data) + compressor.flush()
+
+def pack_frame(meta, blocks):
+    meta = json.dumps(meta, default=lambda value: value.item()).encode()
+    species = np.array([(count, previous) for count, previous, _, _ in blocks], dtype=SPECIES_DTYPE)
+    payload = compress(b''.join(kept + deltas for _, _, kept, deltas in blocks))
+    return pack_message(FRAME, np.array(len(meta), dtype='<u4').tobytes() + meta + species.tobytes() + payload)
+
+def unpack_frame(body):
+    """(meta, blocks) of a frame body; blocks as DeltaEncoder.encode() made them."""
+    length = int(np.frombuffer(body, dtype='<u4', count=1)[0])
+    meta = json.loads(body[4:4 + length])
+    start = 4 + length
+    species = np.frombuffer(body, dtype=SPECIES_DTYPE, count=2, offset=start)
+    payload = memoryview(zlib.decompress(body[start + species.nbytes:]))
+    blocks = []
+    offset = 0
+    for count, previous in species.tolist():
+        end = offset + ((previous + 7) // 8 if previous >= 0 else 0)
+        kept = payload[offset:end]
+        offset = end + delta_nbytes(payload[end:], count)
+        blocks.append((count, previous, kept, payload[end:offset]))
+    return meta, blocks
+
+class RemoteClient:
+    """One connected viewer of a RemoteServer. Messages wait in a short
+    queue for a sender thread and a reader thread takes its commands."""
+
+    def __init__(self, server, connection, backlog=2):
+        self.server = server
+        self.connection = connection
+        self.queue = queue.Queue(backlog)
+        self.synced = False
+        self.closed = False
+        threading.Thread(target=self.send_loop, daemon=True).start()
+        threading.Thread(target=self.read_loop, daemon=True).start()
+
+    def send(self, message):
+        """Queue ``message``; a full queue drops it and marks the viewer as
+        needing a key frame."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except queue.Full:
+            self.synced = False
+            return False
+
+    def send_loop(self):
+        while not self.closed:
+            message = self.queue.get()
+            if message is None:
+                break
+            try:
+                self.connection.sendall(message)
+            except OSError:
+                break
+            self.server.bytes_sent += len(message)
+        self.close()
+
+    def read_loop(self):
+        try:
+            while not self.closed:
+                message = receive_message(self.connection)
+                if message is None:
+                    break
+                kind, body = message
+                if kind != COMMAND:
+                    raise ValueError(f"Unexpected message kind {kind}")
+                self.server.command(json.loads(body))
+        except (OSError, ValueError):
+            pass
+        self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.server.remove(self)
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self.connection.close()
+
+class RemoteServer:
+    """Runs a simulation headless and streams it to remote viewers.
+
+    The simulation runs on a Scheduler as it would under the local viewer.
+    Up to ``fps`` times a second the latest snapshot is quantised to a grid
+    of 2**bits steps per axis, delta-encoded (DeltaEncoder) and compressed,
+    once for all viewers, on a thread of its own; the simulation thread only
+    pays for copying the snapshot. The default 10 bits is about a pixel of
+    the viewer's world panel. A viewer that
+    connects first gets the world (size, features, parameters) and a key
+    frame. One that falls behind has frames dropped rather than slowing
+    anyone else, and is sent the world and a key frame again.
+
+    Viewers send back JSON commands, which run between ticks: species
+    ``parameters``, ``pause``, ``speed`` (one of SPEEDS), ``reset`` and
+    ``profile``.
+    """
+
+    def __init__(self, simulation, address, fps=30, bits=10, speed=1):
+        if speed not in SPEEDS:
+            raise ValueError(f"Unknown speed: {speed}")
+        self.simulation = simulation
+        self.fps = fps
+        self.bits = bits
+        self.encoders = [DeltaEncoder(bits), DeltaEncoder(bits)]
+        self.clients = []
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.bytes_sent = 0
+        self.encode_seconds = 0.0
+        self.running = False
+        self.threads = []
+        self.scheduler = Scheduler(simulation, self.capture, speed=speed)
+        family, self.address = parse_address(address)
+        if family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+        self.listener = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(self.address)
+        self.listener.listen()
+        self.listener.settimeout(0.2)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def capture(self, simulation):
+        """Copy of everything a frame needs; runs on the scheduler thread."""
+        populations = (simulation.prey, simulation.predator)
+        return {
+            'tick': simulation.tick,
+            'identity': [population.identity[:population.count].copy() for population in populations],
+            'positions': [population.position[:population.count].copy() for population in populations],
+            'summary': summary(simulation.prey_stats, simulation.predator_stats),
+            'prey_trend': trend(simulation.prey_history),
+            'predator_trend': trend(simulation.predator_history),
+            'features': (simulation.obstacle_array, simulation.food_area_array, simulation.hiding_spot_array),
+            'parameters': {'prey': simulation.prey.parameters(), 'predator': simulation.predator.parameters()},
+            'profile': simulation.profiler.report() if simulation.profiler.enabled else None,
+        }
+
+    def world(self, snapshot):
+        simulation = self.simulation
+        return pack_message(WORLD, json.dumps({
+            'width': simulation.width,
+            'height': simulation.height,
+            'bits': self.bits,
+            'tick_rate': self.scheduler.tick_rate,
+            'speed': self.scheduler.speed,
+            'paused': self.scheduler.paused,
+            'features': [features.tolist() for features in snapshot['features']],
+            'parameters': snapshot['parameters'],
+        }, default=lambda value: value.item()).encode())
+
+    def encode(self, snapshot):
+        """(delta frame, key frame) messages for ``snapshot``; the key frame
+        is encoded only when some viewer needs it."""
+        meta = {name: snapshot[name] for name in ('tick', 'summary', 'prey_trend', 'predator_trend', 'profile')}
+        meta['ticks_per_second'] = self.scheduler.ticks_per_second
+        grids = [quantise(position, self.simulation.width, self.simulation.height, self.bits)
+                 for position in snapshot['positions']]
+        blocks = [encoder.encode(identity, grid)
+                  for encoder, identity, grid in zip(self.encoders, snapshot['identity'], grids)]
+        return pack_frame(meta, blocks), lambda: pack_frame(meta, [key_block(grid, self.bits) for grid in grids])
+
+    def broadcast_loop(self):
+        published = None
+        features = None
+        while self.running:
+            start = time.perf_counter()
+            if self.scheduler.published != published:
+                published = self.scheduler.published
+                snapshot = self.scheduler.snapshot
+                if snapshot['features'] is not features:
+                    # A reset: everyone gets the new layout
+                    features = snapshot['features']
+                    for client in self.connected():
+                        client.synced = False
+                frame, key_frame = self.encode(snapshot)
+                resync = None
+                for client in self.connected():
+                    if client.synced:
+                        client.send(frame)
+                        continue
+                    if resync is None:
+                        resync = self.world(snapshot) + key_frame()
+                    client.synced = client.send(resync)
+                self.frames += 1
+                self.encode_seconds += time.perf_counter() - start
+            time.sleep(max(1 / self.fps - (time.perf_counter() - start), 0.001))
+
+    def accept_loop(self):
+        while self.running:
+            try:
+                connection, _ = self.listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            connection.settimeout(None)
+            if connection.family == socket.AF_INET:
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.lock:
+                self.clients.append(RemoteClient(self, connection))
+
+    def connected(self):
+        with self.lock:
+            return list(self.clients)
+
+    def remove(self, client):
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    def command(self, command):
+        """Queue a viewer's command; anything unknown raises ValueError."""
+        simulation = self.simulation
+        scheduler = self.scheduler
+        populations = {'prey': simulation.prey, 'predator': simulation.predator}
+        for name, value in command.items():
+            if name == 'parameters':
+                for species, parameters in value.items():
+                    if species not in populations:
+                        raise ValueError(f"Unknown species: {species}")
+                    population = populations[species]
+                    unknown = sorted(set(parameters) - set(population.parameter_names))
+                    if unknown:
+                        raise ValueError(f"Unknown {species} parameters: {', '.join(unknown)}")
+                    scheduler.submit(population.set_parameters, parameters)
+            elif name == 'pause':
+                scheduler.paused = bool(value)
+            elif name == 'speed':
+                if value not in SPEEDS:
+                    raise ValueError(f"Unknown speed: {value}")
+                scheduler.speed = value
+            elif name == 'reset':
+                scheduler.submit(simulation.reset)
+            elif name == 'profile':
+                scheduler.submit(simulation.profiler.enable, bool(value))
+            else:
+                raise ValueError(f"Unknown command: {name}")
+
+    def start(self):
+        self.running = True
+        self.scheduler.start()
+        self.threads = [threading.Thread(target=loop, daemon=True) for loop in (self.accept_loop, self.broadcast_loop)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self.scheduler.stop()
+        for client in self.connected():
+            client.close()
+        self.listener.close()
+        if self.listener.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+
+def serve(simulation, address, fps=30, bits=10, speed=1):
+    """Stream ``simulation`` on ``address`` until interrupted."""
+    with RemoteServer(simulation, address, fps, bits, speed) as server:
+        print(f"Serving on {address}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        print(f"Sent {server.frames} frames, {server.bytes_sent / 1e6:.1f} MB")
+
+class RemoteSpecies:
+    """Stands in for a Population in the viewer: parameters() are the
+    server's at connection time and set_parameters() is sent to the server."""
+
+    def __init__(self, connection, species):
+        self.connection = connection
+        self.species = species
+
+    def parameters(self):
+        return self.connection.parameters[self.species]
+
+    def set_parameters(self, parameters):
+        self.connection.send({'parameters': {self.species: parameters}})
+
+class RemoteConnection:
+    """Viewer end of a RemoteServer, in the shape of both the simulation and
+    the Scheduler that the viewer drives.
+
+    ``snapshot`` holds what Viewer.draw() reads, decoded from the latest
+    frame, with positions and features scaled from the world to ``size``
+    (the world's own size by default); ``published`` counts the frames.
+    Setting ``paused`` or ``speed``, reset() and the ``prey`` and
+    ``predator`` set_parameters() are sent to the server. ``profiler`` times
+    the decoding.
+    """
+
+    def __init__(self, address, size=None, timeout=10):
+        family, address = parse_address(address)
+        self.connection = socket.socket(family, socket.SOCK_STREAM)
+        self.connection.settimeout(timeout)
+        self.connection.connect(address)
+        if family == socket.AF_INET:
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.size = size
+        self.send_lock = threading.Lock()
+        self.profiler = Profiler('remote')
+        self.prey = RemoteSpecies(self, 'prey')
+        self.predator = RemoteSpecies(self, 'predator')
+        self.published = 0
+        self.ticks_per_second = 0.0
+        self.bytes_received = 0
+        self.features = None
+        self.snapshot = None
+        self.thread = None
+        # The viewer reads the world and a first frame while it is built
+        while self.snapshot is None:
+            if not self.receive():
+                raise ConnectionError("Server closed the connection")
+        self.connection.settimeout(None)
+
+    @property
+    def paused(self):
+        return self._paused
+
+    @paused.setter
+    def paused(self, paused):
+        self._paused = paused
+        self.send({'pause': paused})
+
+    @property
+    def speed(self):
+        return self._speed
+
+    @speed.setter
+    def speed(self, speed):
+        self._speed = speed
+        self.send({'speed': speed})
+
+    def send(self, command):
+        with self.send_lock:
+            try:
+                self.connection.sendall(pack_message(COMMAND, json.dumps(command).encode()))
+            except OSError:
+                pass  # the server has gone; the receiver notices
+
+    def submit(self, function, *args):
+        function(*args)
+
+    def reset(self):
+        self.send({'reset': True})
+
+    def receive(self):
+        message = receive_message(self.connection)
+        if message is None:
+            return False
+        kind, body = message
+        self.bytes_received += len(body) + MESSAGE_DTYPE.itemsize
+        with self.profiler.section('decode'):
+            if kind == WORLD:
+                self.set_world(json.loads(body))
+            elif kind == FRAME:
+                self.set_frame(*unpack_frame(body))
+        if kind == FRAME:
+            self.profiler.frame()
+        return True
+
+    def set_world(self, world):
+        self.width = world['width']
+        self.height = world['height']
+        self.tick_rate = world['tick_rate']
+        self._speed = world['speed']
+        self._paused = world['paused']
+        self.parameters = world['parameters']
+        self.decoders = [DeltaDecoder(world['bits']), DeltaDecoder(world['bits'])]
+        width, height = self.size or (self.width, self.height)
+        self.scale = np.array([width / self.width, height / self.height])
+        self.grid_scale = np.array([width, height]) / 65536
+        # Agents are drawn at the middle of their grid step
+        self.grid_offset = (1 << (16 - world['bits'])) / 2
+        features = tuple(np.array(rows, dtype=float).reshape(-1, 3) * (*self.scale, self.scale.mean())
+                         for rows in world['features'])
+        # The renderer keys its cache on the arrays, so keep them unless they changed
+        if self.features is None or any(not np.array_equal(new, old) for new, old in zip(features, self.features)):
+            self.features = features
+
+    def set_frame(self, meta, blocks):
+        grids = [decoder.decode(*block) for decoder, block in zip(self.decoders, blocks)]
+        snapshot = {name: meta[name] for name in ('tick', 'summary', 'prey_trend', 'predator_trend', 'profile')}
+        snapshot['positions'] = [(grid + self.grid_offset) * self.grid_scale for grid in grids]
+        snapshot['features'] = self.features
+        self.ticks_per_second = meta['ticks_per_second']
+        self.snapshot = snapshot
+        self.published += 1
+
+    def receive_loop(self):
+        try:
+            while self.receive():
+                pass
+        except (OSError, ValueError):
+            pass
+        self.ticks_per_second = 0.0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.receive_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.connection.close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,94 @@
+import numpy as np
+import pygame
+
+BACKGROUND_COLOR = (240, 248, 255)
+SIMULATION_BORDER = (70, 130, 180)
+PREY_COLOR = (46, 139, 87)
+PREDATOR_COLOR = (178, 34, 34)
+OBSTACLE_COLOR = (119, 136, 153)
+FOOD_AREA_COLOR = (154, 205, 50)
+HIDING_SPOT_COLOR = (210, 180, 140)
+SPRITE_KEY = (255, 0, 255)
+
+def disk_offsets(radius):
+    """Integer pixel offsets covered by a filled circle of ``radius``."""
+    x, y = np.meshgrid(np.arange(-radius, radius + 1), np.arange(-radius, radius + 1))
+    inside = x * x + y * y <= radius * radius
+    return np.column_stack((x[inside], y[inside]))
+
+class WorldRenderer:
+    """Draws the simulation area from array data.
+
+    The background, border and environment features never move, so they are
+    rendered once into a cached surface that is blitted every frame until
+    invalidate() is called. Agents are drawn in bulk from their position
+    arrays: as one Surface.blits call of a pre-rendered sprite, or, above
+    ``stamp_threshold`` agents, by filling their disks straight into the
+    screen's pixels with surfarray.
+    """
+
+    stamp_threshold = 15000
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.background = None
+        self.features = None
+        self.sprites = {}
+        self.disks = {}
+
+    def invalidate(self):
+        self.background = None
+
+    def draw_background(self, screen, obstacles, food_areas, hiding_spots):
+        """Blit the cached static layer. The feature arrays are (x, y, radius)
+        rows; the cache is rebuilt when invalidated or handed different arrays."""
+        features = (obstacles, food_areas, hiding_spots)
+        if self.background is None or any(new is not old for new, old in zip(features, self.features)):
+            background = pygame.Surface((self.width, self.height)).convert()
+            background.fill(BACKGROUND_COLOR)
+            pygame.draw.rect(background, SIMULATION_BORDER, (0, 0, self.width, self.height), 2)
+            for features, color, width in ((obstacles, OBSTACLE_COLOR, 0), (food_areas, FOOD_AREA_COLOR, 2),
+                                           (hiding_spots, HIDING_SPOT_COLOR, 2)):
+                for x, y, radius in features:
+                    pygame.draw.circle(background, color, (int(x), int(y)), int(radius), width)
+            self.background = background
+            self.features = features
+        screen.blit(self.background, (0, 0))
+
+    def sprite(self, color, radius):
+        key = (color, radius)
+        if key not in self.sprites:
+            sprite = pygame.Surface((2 * radius + 1, 2 * radius + 1)).convert()
+            sprite.fill(SPRITE_KEY)
+            sprite.set_colorkey(SPRITE_KEY)
+            pygame.draw.circle(sprite, color, (radius, radius), radius)
+            self.sprites[key] = sprite
+        return self.sprites[key]
+
+    def draw_agents(self, screen, positions, color, radius):
+        if len(positions) > self.stamp_threshold and screen.get_bytesize() == 4:
+            self.stamp(screen, positions, color, radius)
+            return
+        sprite = self.sprite(color, radius)
+        corners = positions.astype(int) - radius
+        screen.blits([(sprite, corner) for corner in corners.tolist()], doreturn=False)
+
+    def stamp(self, screen, positions, color, radius):
+        """Mark agent centres in a mask, dilate it by the disk's pixel offsets
+        and fill the covered pixels in one assignment. The cost depends on
+        the screen area rather than the number of agents."""
+        if radius not in self.disks:
+            self.disks[radius] = disk_offsets(radius)
+        width, height = self.width, self.height
+        x, y = positions.astype(np.intp).T
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        centres = np.zeros((width, height), dtype=bool)
+        centres[x[inside], y[inside]] = True
+        covered = np.zeros_like(centres)
+        for dx, dy in self.disks[radius]:
+            covered[max(dx, 0):width + min(dx, 0), max(dy, 0):height + min(dy, 0)] |= \
+                centres[max(-dx, 0):width - max(dx, 0), max(-dy, 0):height - max(dy, 0)]
+        pixels = pygame.surfarray.pixels2d(screen)
+        pixels[:width, :height][covered] = screen.map_rgb(color)
+        del pixels
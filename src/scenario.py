@@ -0,0 +1,130 @@
+from population import PreyPopulation, PredatorPopulation
+from simulation import FEATURE_KINDS
+import inspect
+import json
+
+ENGINES = ('vector', 'object', 'parallel', 'ensemble')
+SCENARIO_KEYS = ('name', 'description', 'engine', 'seed', 'ticks', 'worlds', 'world', 'prey', 'predator',
+                 'environment')
+SPECIES = {'prey': PreyPopulation, 'predator': PredatorPopulation}
+# World caps the ensemble takes as species parameters, shared by its worlds
+ENSEMBLE_CAPS = {'max_prey': 'prey.max_population', 'max_predators': 'predator.max_population'}
+
+def read_scenario_file(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not path.endswith('.toml'):
+        return json.loads(data)
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise ValueError(f"Reading {path} needs Python 3.11+ or the tomli package; JSON scenarios need neither")
+    return tomllib.loads(data.decode())
+
+def engine_class(engine):
+    """The simulation class behind an engine name, imported on first use."""
+    if engine == 'object':
+        from simulation import Simulation
+        return Simulation
+    if engine == 'parallel':
+        from parallel import ParallelSimulation
+        return ParallelSimulation
+    if engine == 'ensemble':
+        from ensemble import EnsembleSimulation
+        return EnsembleSimulation
+    from simulation import VectorSimulation
+    return VectorSimulation
+
+def constructor_parameters(cls):
+    """Keyword arguments ``cls`` takes, following ``**kwargs`` up to the base
+    class constructors they are passed on to."""
+    names = set()
+    for base in cls.__mro__:
+        if '__init__' not in vars(base):
+            continue
+        parameters = list(inspect.signature(base.__init__).parameters.values())[1:]
+        names |= {parameter.name for parameter in parameters
+                  if parameter.kind in (parameter.POSITIONAL_OR_KEYWORD, parameter.KEYWORD_ONLY)}
+        if not any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters):
+            break
+    return names
+
+def check_world(world, engine, source):
+    """Raise ValueError for ``world`` settings that ``engine`` does not take."""
+    accepted = constructor_parameters(engine_class(engine)) - {'seed'}
+    if engine == 'ensemble':
+        accepted |= set(ENSEMBLE_CAPS)
+    unknown = sorted(set(world) - accepted)
+    if unknown:
+        raise ValueError(f"Unknown {engine} world settings in {source}: {', '.join(unknown)}")
+
+def load_scenario(path):
+    """Read a scenario from a .json or .toml file and check its keys.
+
+    A scenario has optional ``name``, ``description``, ``engine`` (one of
+    ENGINES), ``seed`` and ``ticks`` entries and these tables:
+
+    - ``world``: constructor arguments of the engine (size, populations,
+      feature counts, caps, ...);
+    - ``prey`` and ``predator``: species parameters, including the
+      behaviour weights, by their Population attribute names;
+    - ``environment``: fixed [[x, y, radius], ...] layouts for any of
+      obstacles, food_areas and hiding_spots.
+
+    ``worlds`` is the number of worlds of the ensemble engine.
+    """
+    scenario = read_scenario_file(path)
+    unknown = sorted(set(scenario) - set(SCENARIO_KEYS))
+    if unknown:
+        raise ValueError(f"Unknown scenario keys in {path}: {', '.join(unknown)}")
+    engine = scenario.get('engine', 'vector')
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine in {path}: {engine}")
+    check_world(scenario.get('world', {}), engine, path)
+    for species, population in SPECIES.items():
+        unknown = sorted(set(scenario.get(species, {})) - set(population.parameter_names))
+        if unknown:
+            raise ValueError(f"Unknown {species} parameters in {path}: {', '.join(unknown)}")
+    unknown = sorted(set(scenario.get('environment', {})) - set(FEATURE_KINDS))
+    if unknown:
+        raise ValueError(f"Unknown environment features in {path}: {', '.join(unknown)}")
+    return scenario
+
+def scenario_parameters(scenario):
+    """The scenario's species parameters in sweep's "species.attribute" naming."""
+    return {f'{species}.{name}': value for species in SPECIES for name, value in scenario.get(species, {}).items()}
+
+def simulation_settings(scenario):
+    """Constructor arguments for the scenario's world, layout included."""
+    world = dict(scenario.get('world', {}))
+    if 'environment' in scenario:
+        world['environment'] = scenario['environment']
+    return world
+
+def build_simulation(scenario, engine=None, seed=None, **kwargs):
+    """A simulation of ``scenario`` on its engine, or on ``engine`` if given;
+    ``seed`` overrides the scenario's and ``kwargs`` go to the constructor."""
+    from sweep import apply_parameters
+    engine = engine or scenario.get('engine', 'vector')
+    world = dict(simulation_settings(scenario), **kwargs)
+    seed = scenario.get('seed') if seed is None else seed
+    parameters = scenario_parameters(scenario)
+    if engine == 'object' and parameters:
+        raise ValueError("The object engine takes its species parameters from the Prey and Predator classes; "
+                         "run scenarios with prey or predator settings on an array engine")
+    if engine == 'ensemble' and 'environment' in world:
+        raise ValueError("Ensemble worlds are laid out from their own seeds; drop the environment table")
+    # The engine may have been overridden since the scenario was loaded
+    check_world(world, engine, scenario.get('name', 'the scenario'))
+    if engine == 'ensemble':
+        caps = {ENSEMBLE_CAPS[name]: world.pop(name) for name in list(world) if name in ENSEMBLE_CAPS}
+        parameters = dict(caps, **parameters)
+        simulation = engine_class(engine)(scenario.get('worlds', 100), seed=seed, **world)
+    else:
+        simulation = engine_class(engine)(seed=seed, **world)
+    if parameters:
+        apply_parameters(simulation, parameters)
+    return simulation
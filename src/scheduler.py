@@ -0,0 +1,93 @@
+from collections import deque
+import threading
+import time
+
+# Fast-forward steps of the viewer's speed button; None runs the simulation flat out
+SPEEDS = (1, 10, 100, None)
+
+class Scheduler:
+    """Advances a simulation with a fixed timestep on its own thread.
+
+    The simulation runs at ``tick_rate * speed`` ticks per second, or as fast
+    as it can when ``speed`` is None. Ticks owed are carried over between
+    batches, so a slow frame never drops ticks; only a simulation that cannot
+    keep up at all has its backlog capped at ``max_batch``. A batch ends after
+    ``1 / publish_rate`` seconds or as soon as a command arrives, whatever the
+    speed, so the backlog is worked off between snapshots and commands.
+
+    Nothing outside the thread touches the simulation. Changes go through
+    submit(), which queues a call that runs between ticks. After each batch
+    the thread stores ``capture(simulation)`` in ``snapshot`` and bumps
+    ``published``. Readers only ever see complete snapshots.
+    """
+
+    def __init__(self, simulation, capture, tick_rate=60, speed=1, publish_rate=60, max_batch=1000):
+        self.simulation = simulation
+        self.capture = capture
+        self.tick_rate = tick_rate
+        self.speed = speed
+        self.publish_rate = publish_rate
+        self.max_batch = max_batch
+        self.paused = False
+        self.commands = deque()
+        self.snapshot = capture(simulation)
+        self.published = 0
+        self.ticks_per_second = 0.0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def submit(self, function, *args):
+        self.commands.append((function, args))
+
+    def run(self):
+        owed = 0.0
+        last = time.perf_counter()
+        window_start = last
+        window_ticks = 0
+        while self.running:
+            changed = bool(self.commands)
+            while self.commands:
+                function, args = self.commands.popleft()
+                function(*args)
+
+            now = time.perf_counter()
+            ticks = 0
+            if self.paused:
+                owed = 0.0
+            elif self.speed is None:
+                # Flat out, but still publish at the display rate
+                deadline = now + 1 / self.publish_rate
+                while time.perf_counter() < deadline and not self.commands:
+                    self.simulation.step()
+                    ticks += 1
+            else:
+                owed = min(owed + (now - last) * self.tick_rate * self.speed, self.max_batch)
+                deadline = now + 1 / self.publish_rate
+                while owed >= 1 and time.perf_counter() < deadline and not self.commands:
+                    self.simulation.step()
+                    ticks += 1
+                    owed -= 1
+            last = time.perf_counter() if self.speed is None else now
+
+            if ticks or changed:
+                self.snapshot = self.capture(self.simulation)
+                self.published += 1
+            window_ticks += ticks
+            if now - window_start >= 0.5:
+                self.ticks_per_second = window_ticks / (now - window_start)
+                window_start = now
+                window_ticks = 0
+            if not ticks and not self.commands:
+                time.sleep(0.001 if self.paused or self.speed is None
+                           else min((1 - owed) / (self.tick_rate * self.speed), 1 / self.publish_rate))
@@ -0,0 +1,631 @@
+from population import PreyPopulation, PredatorPopulation
+from spatial import FeatureIndex, SpatialGrid
+from recorder import agent_records, population_records
+from profiler import Profiler
+from stats import SpeciesStatistics, agent_sums, population_sums
+from collections import defaultdict
+import json
+import numpy as np
+
+# Default world configuration
+SIMULATION_WIDTH = 900
+SIMULATION_HEIGHT = 600
+NUM_PREY = 100
+NUM_PREDATORS = 3
+NUM_OBSTACLES = 5
+NUM_FOOD_AREAS = 3
+NUM_HIDING_SPOTS = 3
+CELL_SIZE = 50
+MAX_HISTORY = 500
+
+def create_spatial_hash(agents, cell_size):
+    spatial_hash = defaultdict(list)
+    for agent in agents:
+        cell_x = int(agent.position.x // cell_size)
+        cell_y = int(agent.position.y // cell_size)
+        spatial_hash[(cell_x, cell_y)].append(agent)
+    return spatial_hash
+
+def nearest_pairs(i, distance_squared):
+    """Index of the closest pair for every distinct query row in i."""
+    order = np.lexsort((distance_squared, i))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = i[order][1:] != i[order][:-1]
+    return order[first]
+
+# Environment feature kinds, in layout order, with their radius ranges
+FEATURE_KINDS = ('obstacles', 'food_areas', 'hiding_spots')
+FEATURE_RADII = ((20, 40), (50, 80), (30, 60))
+
+def environment_arrays(width, height, num_obstacles, num_food_areas, num_hiding_spots, rng, environment=None):
+    """Random (x, y, radius) rows of obstacles, food areas and hiding spots.
+
+    Kinds given in ``environment`` ({kind: [[x, y, radius], ...]}) use that
+    fixed layout instead; the random draws are made either way, so the rest
+    of the run sees the same random stream.
+    """
+    def randint(low, high):
+        return int(rng.integers(low, high, endpoint=True))
+
+    arrays = []
+    for kind, count, (low, high) in zip(FEATURE_KINDS, (num_obstacles, num_food_areas, num_hiding_spots),
+                                        FEATURE_RADII):
+        rows = [(randint(50, width - 50), randint(50, height - 50), randint(low, high)) for _ in range(count)]
+        if environment and kind in environment:
+            rows = environment[kind]
+        arrays.append(np.array(rows, dtype=float).reshape(-1, 3))
+    return arrays
+
+def feature_objects(obstacles, food_areas, hiding_spots):
+    """Obstacle, FoodArea and HidingSpot objects for feature arrays."""
+    # The feature classes are built on pygame vectors; only load them when asked
+    from environment import Obstacle, FoodArea, HidingSpot
+    return ([Obstacle(x, y, int(r)) for x, y, r in obstacles], [FoodArea(x, y, int(r)) for x, y, r in food_areas],
+            [HidingSpot(x, y, int(r)) for x, y, r in hiding_spots])
+
+def create_environment(width, height, num_obstacles, num_food_areas, num_hiding_spots, rng, environment=None):
+    return feature_objects(*environment_arrays(width, height, num_obstacles, num_food_areas, num_hiding_spots, rng,
+                                               environment))
+
+class Simulation:
+    """Headless predator-prey world. Owns the agents and environment and
+    advances them with step(); it never touches the display.
+
+    All randomness comes from the simulation's own Generator, so the same
+    ``seed`` and configuration always replay the same run. With seed=None
+    every reset draws fresh entropy.
+
+    Births stop at ``max_prey`` and ``max_predators`` (the species defaults
+    when None). Dead agents are kept in an AgentPool and reused for births.
+    ``environment`` fixes the layout of any feature kind it lists (see
+    environment_arrays()). The agents are pygame-vector objects, so this
+    engine imports pygame when it is created.
+    """
+
+    def __init__(self, width=SIMULATION_WIDTH, height=SIMULATION_HEIGHT, num_prey=NUM_PREY,
+                 num_predators=NUM_PREDATORS, num_obstacles=NUM_OBSTACLES, num_food_areas=NUM_FOOD_AREAS,
+                 num_hiding_spots=NUM_HIDING_SPOTS, cell_size=CELL_SIZE, max_history=MAX_HISTORY, history_interval=1,
+                 seed=None, max_prey=None, max_predators=None, environment=None):
+        from agent import AgentPool, Prey, Predator
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.num_prey = num_prey
+        self.num_predators = num_predators
+        self.num_obstacles = num_obstacles
+        self.num_food_areas = num_food_areas
+        self.num_hiding_spots = num_hiding_spots
+        self.cell_size = cell_size
+        self.max_history = max_history
+        self.environment = environment
+        self.max_prey = Prey.max_population if max_prey is None else max_prey
+        self.max_predators = Predator.max_population if max_predators is None else max_predators
+        self.prey_stats = SpeciesStatistics(max_history, history_interval)
+        self.predator_stats = SpeciesStatistics(max_history, history_interval)
+        self.recorder = None
+        self.telemetry = None
+        self.profiler = Profiler('simulation')
+        self.pool = AgentPool()
+        self.prey_list = []
+        self.predator_list = []
+        self.reset()
+
+    def reset(self, seed=None):
+        from agent import Prey, Predator
+        if seed is not None:
+            self.seed = seed
+        self.rng = np.random.default_rng(self.seed)
+        self.pool.release(self.prey_list + self.predator_list)
+        self.prey_list = [self.pool.acquire(Prey, *self.random_position(), self.rng) for _ in range(self.num_prey)]
+        self.predator_list = [self.pool.acquire(Predator, *self.random_position(), self.rng)
+                              for _ in range(self.num_predators)]
+
+        self.obstacles, self.food_areas, self.hiding_spots = create_environment(
+            self.width, self.height, self.num_obstacles, self.num_food_areas, self.num_hiding_spots, self.rng,
+            self.environment)
+
+        self.prey_stats.reset(*agent_sums(self.prey_list))
+        self.predator_stats.reset(*agent_sums(self.predator_list))
+        self.tick = 0
+
+    @property
+    def prey_history(self):
+        return self.prey_stats.history
+
+    @property
+    def predator_history(self):
+        return self.predator_stats.history
+
+    def random_position(self):
+        return int(self.rng.integers(0, self.width, endpoint=True)), int(self.rng.integers(0, self.height, endpoint=True))
+
+    def records(self):
+        return agent_records(self.prey_list), agent_records(self.predator_list)
+
+    def step(self, n=1):
+        for _ in range(n):
+            self.update()
+
+    def update(self):
+        from agent import Lifecycle
+        profile = self.profiler
+        with profile.section('tick'):
+            with profile.section('spatial_hash'):
+                spatial_hash_prey = create_spatial_hash(self.prey_list, self.cell_size)
+                spatial_hash_predator = create_spatial_hash(self.predator_list, self.cell_size)
+
+            lifecycle = Lifecycle(self.prey_list, self.predator_list, self.pool, self.max_prey, self.max_predators)
+            with profile.section('prey'):
+                for prey in self.prey_list:
+                    prey.update(lifecycle, self.width, self.height, self.obstacles, self.food_areas,
+                                self.hiding_spots, spatial_hash_prey, spatial_hash_predator, self.cell_size)
+
+            with profile.section('predators'):
+                for predator in self.predator_list:
+                    predator.update(lifecycle, self.width, self.height, self.obstacles, self.food_areas,
+                                    self.hiding_spots, spatial_hash_prey, spatial_hash_predator, self.cell_size)
+            if self.recorder is not None:
+                with profile.section('record'):
+                    self.recorder.record(self.tick + 1, *self.records())
+            prey_count = len(self.prey_list)
+            predator_count = len(self.predator_list)
+            with profile.section('lifecycle'):
+                lifecycle.finish()
+
+            self.tick += 1
+            prey_births = len(lifecycle.prey_births)
+            predator_births = len(lifecycle.predator_births)
+            with profile.section('stats'):
+                self.prey_stats.tick(self.tick, *agent_sums(self.prey_list), prey_births,
+                                     prey_count + prey_births - len(self.prey_list))
+                self.predator_stats.tick(self.tick, *agent_sums(self.predator_list), predator_births,
+                                         predator_count + predator_births - len(self.predator_list),
+                                         len(lifecycle.claims))
+            if self.telemetry is not None:
+                with profile.section('telemetry'):
+                    self.telemetry.collect(self)
+        profile.frame()
+
+class VectorSimulation:
+    """Same world as Simulation, but each species lives in a structure-of-arrays
+    Population and every agent is advanced synchronously in batched NumPy
+    operations.
+
+    ``seed`` feeds a SeedSequence that is split into independent Generator
+    streams for the world layout, the prey and the predators, so a seed and
+    configuration always produce the same trajectory.
+
+    With ``sleep_interval`` k > 1, prey far from every predator sleep: they
+    get the full steering update only once every k ticks, staggered by grid
+    cell, and in between keep their last steering force while still grazing
+    and moving. A prey wakes on the tick a predator comes within its
+    perception radius (plus one tick of closing distance), so it never misses
+    a threat; the only error is steering up to k - 1 ticks stale.
+
+    ``max_prey`` and ``max_predators`` set the species' max_population.
+    Population rows are recycled in place, so births and deaths only allocate
+    when a population outgrows every size it has had before; with
+    ``preallocate`` the rows for both caps are reserved up front and a run
+    never reallocates them.
+
+    Features live only in the (x, y, radius) arrays, so this engine runs
+    without pygame; ``obstacles``, ``food_areas`` and ``hiding_spots`` build
+    the feature objects on demand. ``environment`` fixes the layout of any
+    feature kind it lists (see environment_arrays()).
+    """
+
+    prey_class = PreyPopulation
+    predator_class = PredatorPopulation
+
+    def __init__(self, width=SIMULATION_WIDTH, height=SIMULATION_HEIGHT, num_prey=NUM_PREY,
+                 num_predators=NUM_PREDATORS, num_obstacles=NUM_OBSTACLES, num_food_areas=NUM_FOOD_AREAS,
+                 num_hiding_spots=NUM_HIDING_SPOTS, cell_size=None, max_history=MAX_HISTORY, history_interval=1,
+                 seed=None, max_prey=None, max_predators=None, preallocate=False, sleep_interval=1,
+                 environment=None):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.num_prey = num_prey
+        self.num_predators = num_predators
+        self.num_obstacles = num_obstacles
+        self.num_food_areas = num_food_areas
+        self.num_hiding_spots = num_hiding_spots
+        self.max_history = max_history
+        self.environment = environment
+        self.sleep_interval = sleep_interval
+        self.awake = 0
+        self.prey_stats = SpeciesStatistics(max_history, history_interval)
+        self.predator_stats = SpeciesStatistics(max_history, history_interval)
+        self.prey = self.prey_class(num_prey)
+        self.predator = self.predator_class(num_predators)
+        if max_prey is not None:
+            self.prey.max_population = max_prey
+        if max_predators is not None:
+            self.predator.max_population = max_predators
+        if preallocate:
+            self.prey.reserve(max(num_prey, self.prey.max_population))
+            self.predator.reserve(max(num_predators, self.predator.max_population))
+        # One ring of cells must cover the widest perception radius
+        if cell_size is None:
+            cell_size = max(self.prey.perception_radius, self.predator.perception_radius)
+        self.cell_size = cell_size
+        self.prey_grid = self.create_grid()
+        self.predator_grid = self.create_grid()
+        self.recorder = None
+        self.telemetry = None
+        self.profiler = Profiler('simulation')
+        self.reset()
+
+    def reseed(self, seed=None):
+        """Restart the world, prey and predator random streams from ``seed``
+        without touching the agents."""
+        if seed is not None:
+            self.seed = seed
+        world, prey, predator = np.random.SeedSequence(self.seed).spawn(3)
+        self.rng = np.random.default_rng(world)
+        self.prey.rng = np.random.default_rng(prey)
+        self.predator.rng = np.random.default_rng(predator)
+
+    def reset(self, seed=None):
+        self.reseed(seed)
+        self.prey.count = 0
+        self.predator.count = 0
+        self.prey.add(self.random_positions(self.num_prey))
+        self.predator.add(self.random_positions(self.num_predators))
+        self.prey_grid.rebuild(self.prey.position[:self.prey.count])
+        self.predator_grid.rebuild(self.predator.position[:self.predator.count])
+
+        self.obstacle_array, self.food_area_array, self.hiding_spot_array = environment_arrays(
+            self.width, self.height, self.num_obstacles, self.num_food_areas, self.num_hiding_spots, self.rng,
+            self.environment)
+        self.index_features()
+
+        self.prey_stats.reset(*population_sums(self.prey))
+        self.predator_stats.reset(*population_sums(self.predator))
+        self.tick = 0
+
+    @property
+    def prey_history(self):
+        return self.prey_stats.history
+
+    @property
+    def predator_history(self):
+        return self.predator_stats.history
+
+    @property
+    def obstacles(self):
+        return feature_objects(self.obstacle_array, (), ())[0]
+
+    @property
+    def food_areas(self):
+        return feature_objects((), self.food_area_array, ())[1]
+
+    @property
+    def hiding_spots(self):
+        return feature_objects((), (), self.hiding_spot_array)[2]
+
+    def state(self):
+        """Complete world state as a flat dict of arrays; load_state() and
+        checkpoint.save_checkpoint() take it as is.
+
+        Besides every agent field it holds the grids' cell order, so a
+        restored world visits neighbours in the same order and continues
+        exactly like the original.
+        """
+        meta = {
+            'width': self.width,
+            'height': self.height,
+            'num_prey': self.num_prey,
+            'num_predators': self.num_predators,
+            'num_obstacles': self.num_obstacles,
+            'num_food_areas': self.num_food_areas,
+            'num_hiding_spots': self.num_hiding_spots,
+            'cell_size': self.cell_size,
+            'max_history': self.max_history,
+            'history_interval': self.prey_stats.history_interval,
+            'sleep_interval': self.sleep_interval,
+            'prey_totals': self.prey_stats.totals(),
+            'predator_totals': self.predator_stats.totals(),
+            'seed': self.seed,
+            'tick': self.tick,
+            'prey_parameters': self.prey.parameters(),
+            'predator_parameters': self.predator.parameters(),
+            'rng': [self.rng.bit_generator.state, self.prey.rng.bit_generator.state,
+                    self.predator.rng.bit_generator.state],
+        }
+        state = {
+            'meta': np.array(json.dumps(meta, default=lambda value: value.item())),
+            'obstacle_array': self.obstacle_array,
+            'food_area_array': self.food_area_array,
+            'hiding_spot_array': self.hiding_spot_array,
+            'prey_history': self.prey_history.values(),
+            'predator_history': self.predator_history.values(),
+        }
+        for population, grid, species in ((self.prey, self.prey_grid, 'prey'), (self.predator, self.predator_grid, 'predator')):
+            for name in population.fields():
+                state[f'{species}_{name}'] = getattr(population, name)[:population.count].copy()
+            state[f'{species}_grid_cell'] = grid.cell.copy()
+            state[f'{species}_grid_order'] = grid.order.copy()
+            state[f'{species}_grid_counts'] = grid.counts.copy()
+        return state
+
+    def load_state(self, state):
+        """Replace the whole world with one captured by state()."""
+        meta = json.loads(str(state['meta']))
+        for name in ('width', 'height', 'num_prey', 'num_predators', 'num_obstacles', 'num_food_areas',
+                     'num_hiding_spots', 'cell_size', 'max_history', 'seed', 'tick'):
+            setattr(self, name, meta[name])
+        self.sleep_interval = meta.get('sleep_interval', 1)
+        self.prey.set_parameters(meta['prey_parameters'])
+        self.predator.set_parameters(meta['predator_parameters'])
+        for generator, rng_state in zip((self.rng, self.prey.rng, self.predator.rng), meta['rng']):
+            generator.bit_generator.state = rng_state
+
+        self.obstacle_array = np.array(state['obstacle_array'], dtype=float)
+        self.food_area_array = np.array(state['food_area_array'], dtype=float)
+        self.hiding_spot_array = np.array(state['hiding_spot_array'], dtype=float)
+        self.index_features()
+
+        self.prey_grid = self.create_grid()
+        self.predator_grid = self.create_grid()
+        for population, grid, species in ((self.prey, self.prey_grid, 'prey'), (self.predator, self.predator_grid, 'predator')):
+            n = len(state[f'{species}_position'])
+            population.count = 0
+            population.reserve(n)
+            for name in population.fields():
+                # Fields added since the checkpoint was written start at zero
+                getattr(population, name)[:n] = state.get(f'{species}_{name}', 0)
+            if f'{species}_identity' not in state:
+                population.identity[:n] = np.arange(n)
+            population.count = n
+            population.next_identity = int(population.identity[:n].max(initial=-1)) + 1
+            grid.cell = np.array(state[f'{species}_grid_cell'])
+            grid.order = np.array(state[f'{species}_grid_order'])
+            grid.counts = np.array(state[f'{species}_grid_counts'])
+            grid.refresh_offsets()
+
+        # Checkpoints from before the statistics module only carry the history
+        history_interval = meta.get('history_interval', 1)
+        self.prey_stats = SpeciesStatistics(self.max_history, history_interval)
+        self.predator_stats = SpeciesStatistics(self.max_history, history_interval)
+        for population, statistics, species in ((self.prey, self.prey_stats, 'prey'),
+                                                (self.predator, self.predator_stats, 'predator')):
+            statistics.reset(*population_sums(population))
+            if f'{species}_totals' in meta:
+                statistics.set_totals(meta[f'{species}_totals'])
+            statistics.history.extend(state[f'{species}_history'])
+
+    def create_grid(self):
+        return SpatialGrid(self.width, self.height, self.cell_size)
+
+    def index_features(self):
+        """Build the static lookup grids the steering code queries instead of
+        scanning every feature."""
+        self.obstacle_index = FeatureIndex(self.obstacle_array, self.width, self.height)
+        self.food_area_index = FeatureIndex(self.food_area_array, self.width, self.height)
+        self.hiding_spot_index = FeatureIndex(self.hiding_spot_array, self.width, self.height)
+
+    def fork(self, seed=None, **kwargs):
+        """Independent copy of this world. With a ``seed`` the copy's random
+        streams restart from it, so branches diverge; without one the copy
+        replays exactly what this world would do. ``kwargs`` go to the new
+        simulation's constructor."""
+        simulation = type(self)(num_prey=0, num_predators=0, num_obstacles=0, num_food_areas=0,
+                                num_hiding_spots=0, **kwargs)
+        simulation.load_state(self.state())
+        if seed is not None:
+            simulation.reseed(seed)
+        return simulation
+
+    def random_positions(self, n):
+        return np.column_stack((self.rng.integers(0, self.width, n, endpoint=True),
+                                self.rng.integers(0, self.height, n, endpoint=True)))
+
+    def records(self, prey_alive=None, predator_alive=None):
+        return population_records(self.prey, prey_alive), population_records(self.predator, predator_alive)
+
+    def step(self, n=1):
+        for _ in range(n):
+            self.update()
+
+    def update(self):
+        # Deaths and births are only recorded during the tick; both populations
+        # are compacted once at the end so rows stay stable while acting.
+        profile = self.profiler
+        with profile.section('tick'):
+            prey_alive = self.starve(self.prey)
+            predator_alive = self.starve(self.predator)
+            starved = self.prey.count - int(np.count_nonzero(prey_alive))
+            with profile.section('prey'):
+                prey_births = self.update_prey(prey_alive, predator_alive)
+            with profile.section('predators'):
+                predator_births = self.update_predators(prey_alive, predator_alive)
+            if self.recorder is not None:
+                with profile.section('record'):
+                    self.recorder.record(self.tick + 1, *self.records(prey_alive, predator_alive))
+            prey_deaths = self.prey.count - int(np.count_nonzero(prey_alive))
+            predator_deaths = self.predator.count - int(np.count_nonzero(predator_alive))
+            with profile.section('compact'):
+                self.compact(self.prey, self.prey_grid, prey_alive, prey_births)
+                self.compact(self.predator, self.predator_grid, predator_alive, predator_births)
+
+            self.tick += 1
+            with profile.section('stats'):
+                self.prey_stats.tick(self.tick, *population_sums(self.prey), len(prey_births), prey_deaths)
+                self.predator_stats.tick(self.tick, *population_sums(self.predator), len(predator_births),
+                                         predator_deaths, prey_deaths - starved)
+            if self.telemetry is not None:
+                with profile.section('telemetry'):
+                    self.telemetry.collect(self)
+        profile.frame()
+
+    def starve(self, population):
+        energy = population.energy[:population.count]
+        energy -= population.parameter('energy_decay_rate', slice(0, population.count))
+        return energy > 0
+
+    def compact(self, population, grid, alive, births):
+        population.keep(alive)
+        grid.keep(alive)
+        if len(births):
+            rows = population.add(births)
+            population.energy[rows] = population.parameter('reproduction_energy_cost', rows) / 2
+            grid.add(population.position[rows])
+
+    def limit_births(self, population, ready, alive):
+        """The first of the ``ready`` rows that fit under max_population."""
+        return ready[:max(0, population.max_population - int(np.count_nonzero(alive)))]
+
+    def steer_prey(self, rows, prey_alive, predator_alive):
+        """Deterministic steering for the prey in ``rows``.
+
+        Returns the weighted flock, obstacle, food and hiding forces, the raw
+        evasion sum, the count of predators stacked on each prey and the new
+        energy and velocity of each row. Nothing shared is written, so any
+        partition of the rows gives identical results.
+        """
+        prey = self.prey
+        profile = self.profiler
+        position = prey.position[:prey.count]
+        predator_position = self.predator.position[:self.predator.count]
+        with profile.section('prey.neighbours'):
+            i, j, offset = self.prey_grid.query(position[rows], prey.perception_radius, position)
+        profile.count('prey neighbour candidates / agent', self.prey_grid.examined / max(len(rows), 1))
+        with profile.section('prey.flock'):
+            others = (rows[i] != j) & prey_alive[j]
+            flock = prey.flock((i[others], j[others], offset[others]), rows)
+
+        with profile.section('prey.evade'):
+            i, k, offset = self.predator_grid.query(position[rows], prey.perception_radius, predator_position)
+            hunting = predator_alive[k]
+            i, away = i[hunting], -offset[hunting]
+            evade, stacked = prey.evade((i, away), rows)
+            threats = np.bincount(i, minlength=len(rows))
+
+        energy = prey.energy[rows]
+        velocity = prey.velocity[rows]
+        steer = flock * prey.flock_weight
+        with profile.section('prey.avoid_obstacles'):
+            steer += prey.avoid_obstacles(self.obstacle_index, rows) * prey.obstacle_weight
+        with profile.section('prey.seek_food'):
+            steer += prey.seek_food(self.food_area_index, rows, energy, velocity) * prey.food_weight
+        with profile.section('prey.use_hiding_spots'):
+            steer += prey.use_hiding_spots(self.hiding_spot_index, rows, threats, velocity) * prey.hiding_weight
+        return steer, evade, stacked, energy, velocity
+
+    def update_prey(self, prey_alive, predator_alive):
+        prey = self.prey
+        n = prey.count
+        if not prey_alive.any():
+            return np.zeros((0, 2))
+
+        rows = np.arange(n)
+        if self.sleep_interval > 1:
+            awake = self.awake_prey()
+            rows = rows[awake]
+        self.awake = len(rows)
+        self.profiler.count('prey awake fraction', len(rows) / n)
+        steer, evade, stacked, energy, velocity = self.steer_prey(rows, prey_alive, predator_alive)
+        with self.profiler.section('prey.move'):
+            prey.energy[rows] = energy
+            prey.velocity[rows] = velocity
+            prey.acceleration[rows] = prey.limit_force(steer + prey.scatter(evade, stacked) * prey.evade_weight)
+            if self.sleep_interval > 1:
+                prey.steering[rows] = prey.acceleration[rows]
+                asleep = np.flatnonzero(~awake)
+                prey.graze(self.food_area_index, asleep)
+                prey.acceleration[asleep] = prey.steering[asleep]
+            prey.update(self.width, self.height)
+            self.prey_grid.update(prey.position[:n])
+
+        live = slice(0, n)
+        prey.reproduction_timer[:n] += 1
+        ready = np.flatnonzero((prey.reproduction_timer[:n] >= prey.parameter('reproduction_interval', live)) &
+                               (prey.energy[:n] > prey.parameter('reproduction_energy_cost', live)) & prey_alive)
+        parents = self.limit_births(prey, ready, prey_alive)
+        prey.energy[parents] -= prey.parameter('reproduction_energy_cost', parents)
+        prey.reproduction_timer[ready] = 0
+        return prey.position[parents].copy()
+
+    def awake_prey(self):
+        """Mask of the prey that get the full steering update this tick: those
+        in cells a predator could see from, newborns, and the rest on their
+        cell's turn."""
+        prey = self.prey
+        grid = self.prey_grid
+        k = self.sleep_interval
+        reach = prey.perception_radius + prey.max_speed + self.predator.max_speed
+        # Both grids share one layout, so predator cells dilate onto prey cells
+        hot = (self.predator_grid.counts > 0).reshape(grid.shape)
+        near = np.zeros_like(hot)
+        for dx, dy in zip(*grid.neighbour_offsets(reach)):
+            near |= np.roll(hot, (dy, dx), axis=(0, -1))
+        cell = grid.cell
+        return near.ravel()[cell] | ((cell + self.tick) % k == 0) | (prey.age[:prey.count] < k)
+
+    def update_predators(self, prey_alive, predator_alive):
+        prey = self.prey
+        predator = self.predator
+        m = predator.count
+        if not predator_alive.any():
+            return np.zeros((0, 2))
+
+        profile = self.profiler
+        prey_position = prey.position[:prey.count]
+        predator_position = predator.position[:m]
+        # One pass finds every live prey a predator can see. It targets the
+        # nearest and, since no predator moves further than max_speed, also
+        # holds every prey it can be touching after its move.
+        contact_radius = predator.radius + prey.radius
+        with profile.section('predators.hunt'):
+            radius = max(predator.perception_radius, contact_radius + predator.max_speed)
+            k, j, offset = self.prey_grid.query(predator_position, radius, prey_position)
+            profile.count('predator prey candidates / agent', self.prey_grid.examined / m)
+            visible = prey_alive[j]
+            k, j, offset = k[visible], j[visible], offset[visible]
+            hungry = predator_alive[k]
+            contact_k, contact_j = k[hungry], j[hungry]
+            distance_squared = np.einsum('ij,ij->i', offset, offset)
+            seen = distance_squared < predator.perception_radius * predator.perception_radius
+            k, offset = k[seen], offset[seen]
+            nearest = nearest_pairs(k, distance_squared[seen])
+            chasing = np.zeros(m, dtype=bool)
+            chasing[k[nearest]] = True
+            targets = predator_position[k[nearest]] + offset[nearest]
+
+            acceleration = predator.acceleration[:m]
+            acceleration[chasing] = predator.seek(targets, chasing) * predator.chase_weight
+            acceleration[~chasing] = (predator.random_unit_vectors(m - int(np.count_nonzero(chasing))) *
+                                      (predator.max_force * predator.wander_weight))
+
+        with profile.section('predators.avoid'):
+            predator.avoid_obstacle(self.obstacle_index)
+            predator.avoid_hiding_spots(self.hiding_spot_index)
+        with profile.section('predators.move'):
+            predator.update(self.width, self.height)
+            self.predator_grid.update(predator.position[:m])
+
+        # Every hungry predator claims the nearest prey it touches. A prey
+        # claimed twice goes to the closer predator, ties to the lower row.
+        with profile.section('predators.eat'):
+            offset = self.prey_grid.wrap_offsets(prey_position[contact_j] - predator_position[contact_k])
+            distance_squared = np.einsum('ij,ij->i', offset, offset)
+            contact = distance_squared < contact_radius * contact_radius
+            k, j, distance_squared = contact_k[contact], contact_j[contact], distance_squared[contact]
+            claims = nearest_pairs(k, distance_squared)
+            k, j, distance_squared = k[claims], j[claims], distance_squared[claims]
+            winners = np.lexsort((k, distance_squared, j))
+            first = np.ones(len(winners), dtype=bool)
+            first[1:] = j[winners][1:] != j[winners][:-1]
+            k, j = k[winners[first]], j[winners[first]]
+            prey_alive[j] = False
+
+        predator.prey_eaten[k] += 1
+        predator.energy[k] = np.minimum(predator.energy[k] + predator.parameter('energy_gain_from_prey', k),
+                                        predator.max_energy)
+        ready = np.sort(k[(predator.prey_eaten[k] >= predator.parameter('reproduction_threshold', k)) &
+                          (predator.energy[k] > predator.parameter('reproduction_energy_cost', k) * 1.2)])
+        parents = self.limit_births(predator, ready, predator_alive)
+        predator.energy[parents] -= predator.parameter('reproduction_energy_cost', parents)
+        predator.prey_eaten[ready] = 0
+        return predator.position[parents].copy()
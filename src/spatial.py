@@ -0,0 +1,222 @@
+import numpy as np
+
+class SpatialGrid:
+    """Persistent uniform grid over the rows of a Population on the wrapped
+    (toroidal) world.
+
+    Membership is kept in flat arrays in counting-sort layout: ``order`` lists
+    agent rows grouped by cell and ``cell_start[c]:cell_start[c] + counts[c]``
+    is the slice of ``order`` that lives in cell ``c``. Agents are only moved
+    between cells when they cross a cell boundary, and row renumbering from
+    Population.keep/add is mirrored with keep/add here.
+
+    The world is split into whole cells at least ``cell_size`` wide, so a
+    radius query only has to visit ceil(radius / cell_size) rings of cells,
+    wrapped around the edges, before filtering by periodic distance.
+    """
+
+    def __init__(self, width, height, cell_size):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.columns = max(1, int(width // cell_size))
+        self.rows = max(1, int(height // cell_size))
+        self.cell_width = width / self.columns
+        self.cell_height = height / self.rows
+        self.cell = np.zeros(0, dtype=np.intp)
+        self.order = np.zeros(0, dtype=np.intp)
+        self.counts = np.zeros(self.columns * self.rows, dtype=np.intp)
+        self.cell_start = np.zeros(self.columns * self.rows, dtype=np.intp)
+        self.examined = 0
+
+    def __len__(self):
+        return len(self.cell)
+
+    @property
+    def shape(self):
+        """Cell counts as an array of this shape, columns last."""
+        return self.rows, self.columns
+
+    def cell_coordinates(self, positions):
+        cell_x = np.minimum((positions[:, 0] // self.cell_width).astype(np.intp), self.columns - 1)
+        cell_y = np.minimum((positions[:, 1] // self.cell_height).astype(np.intp), self.rows - 1)
+        return cell_x, cell_y
+
+    def cell_index(self, positions):
+        cell_x, cell_y = self.cell_coordinates(positions)
+        return cell_y * self.columns + cell_x
+
+    def rebuild(self, positions):
+        self.cell = self.cell_index(positions)
+        self.order = np.argsort(self.cell, kind='stable')
+        self.counts = np.bincount(self.cell, minlength=len(self.counts))
+        self.refresh_offsets()
+
+    def refresh_offsets(self):
+        self.cell_start[0] = 0
+        np.cumsum(self.counts[:-1], out=self.cell_start[1:])
+
+    def insert(self, rows):
+        rows = rows[np.argsort(self.cell[rows], kind='stable')]
+        where = np.searchsorted(self.cell[self.order], self.cell[rows], side='right')
+        self.order = np.insert(self.order, where, rows)
+        np.add.at(self.counts, self.cell[rows], 1)
+
+    def update(self, positions):
+        """Re-bin the agents that crossed a cell boundary; returns how many moved."""
+        cell = self.cell_index(positions)
+        moved = np.flatnonzero(cell != self.cell)
+        if not len(moved):
+            return 0
+        np.subtract.at(self.counts, self.cell[moved], 1)
+        staying = cell[self.order] == self.cell[self.order]
+        self.order = self.order[staying]
+        self.cell = cell
+        self.insert(moved)
+        self.refresh_offsets()
+        return len(moved)
+
+    def keep(self, mask):
+        removed = np.flatnonzero(~mask)
+        if not len(removed):
+            return
+        np.subtract.at(self.counts, self.cell[removed], 1)
+        new_index = np.cumsum(mask) - 1
+        self.order = new_index[self.order[mask[self.order]]]
+        self.cell = self.cell[mask]
+        self.refresh_offsets()
+
+    def add(self, positions):
+        if not len(positions):
+            return
+        start = len(self.cell)
+        self.cell = np.concatenate((self.cell, self.cell_index(positions)))
+        self.insert(np.arange(start, len(self.cell)))
+        self.refresh_offsets()
+
+    def neighbour_offsets(self, radius):
+        ring_x = int(np.ceil(radius / self.cell_width))
+        ring_y = int(np.ceil(radius / self.cell_height))
+        # Distinct wrapped offsets only, so small grids never visit a cell twice
+        dx = np.unique(np.arange(-ring_x, ring_x + 1) % self.columns)
+        dy = np.unique(np.arange(-ring_y, ring_y + 1) % self.rows)
+        return np.repeat(dx, len(dy)), np.tile(dy, len(dx))
+
+    def candidates(self, positions, radius):
+        """Pairs (i, j) of query rows and grid rows in every cell that can hold
+        an agent within ``radius`` of query position i, without any per-query
+        lists."""
+        dx, dy = self.neighbour_offsets(radius)
+        cell_x, cell_y = self.cell_coordinates(positions)
+        x = (cell_x[:, None] + dx) % self.columns
+        y = (cell_y[:, None] + dy) % self.rows
+        query = np.repeat(np.arange(len(positions)), len(dx))
+        return self.expand(query, (y * self.columns + x).ravel())
+
+    def expand(self, query, cell):
+        count = self.counts[cell]
+        total = int(count.sum())
+        i = np.repeat(query, count)
+        offset = np.arange(total) - np.repeat(np.cumsum(count) - count, count)
+        j = self.order[np.repeat(self.cell_start[cell], count) + offset]
+        return i, j
+
+    def wrap_offsets(self, offset):
+        offset[:, 0] -= self.width * np.round(offset[:, 0] / self.width)
+        offset[:, 1] -= self.height * np.round(offset[:, 1] / self.height)
+        return offset
+
+    def query(self, positions, radius, source_positions):
+        """Pairs (i, j) with grid row j strictly within ``radius`` of query
+        position i under periodic boundaries, plus the shortest offset from i
+        to j across the wrap. ``examined`` keeps the number of candidate
+        pairs tested."""
+        i, j = self.candidates(positions, radius)
+        self.examined = len(i)
+        offset = self.wrap_offsets(source_positions[j] - positions[i])
+        close = np.einsum('ij,ij->i', offset, offset) < radius * radius
+        return i[close], j[close], offset[close]
+
+def pair_passes(i):
+    """Split pairs sorted by query row into passes in which every row occurs
+    at most once: pass r holds each row's r-th pair. Applying the passes in
+    turn keeps every row's updates in pair order without Python loops over
+    rows."""
+    if not len(i):
+        return []
+    starts = np.flatnonzero(np.concatenate(([True], i[1:] != i[:-1])))
+    rank = np.arange(len(i)) - np.repeat(starts, np.diff(np.append(starts, len(i))))
+    order = np.argsort(rank, kind='stable')
+    return np.split(order, np.cumsum(np.bincount(rank))[:-1])
+
+class FeatureIndex:
+    """Static lookup grid over circular environment features, (x, y, radius)
+    rows that never move.
+
+    For a given reach (how far from its centre each feature acts) the index
+    lists, in the same counting-sort layout as SpatialGrid, the features that
+    reach into every cell. A lookup only tests the few features listed for an
+    agent's cell, so its cost does not grow with the number of features. The
+    lists are built once per distinct reach and kept; features are not
+    wrapped across the world's edges.
+    """
+
+    def __init__(self, features, width, height, cell_size=64):
+        self.features = features
+        self.centres = features[:, :2]
+        self.radius = features[:, 2]
+        self.columns = max(1, int(width // cell_size))
+        self.rows = max(1, int(height // cell_size))
+        self.cell_width = width / self.columns
+        self.cell_height = height / self.rows
+        self.lists = {}
+
+    def __len__(self):
+        return len(self.features)
+
+    def cell_coordinates(self, positions):
+        x = np.clip((positions[:, 0] // self.cell_width).astype(np.intp), 0, self.columns - 1)
+        y = np.clip((positions[:, 1] // self.cell_height).astype(np.intp), 0, self.rows - 1)
+        return x, y
+
+    def cell_lists(self, reach):
+        key = reach.tobytes()
+        if key not in self.lists:
+            self.lists[key] = self.build(reach)
+        return self.lists[key]
+
+    def build(self, reach):
+        """(cell_start, counts, members) for features acting within ``reach``."""
+        x0, y0 = self.cell_coordinates(self.centres - reach[:, None])
+        x1, y1 = self.cell_coordinates(self.centres + reach[:, None])
+        width = x1 - x0 + 1
+        count = width * (y1 - y0 + 1)
+        feature = np.repeat(np.arange(len(self.features)), count)
+        k = np.arange(int(count.sum())) - np.repeat(np.cumsum(count) - count, count)
+        x = x0[feature] + k % width[feature]
+        y = y0[feature] + k // width[feature]
+        # Drop bounding-box cells the disc never touches, with a pixel of
+        # slack against rounding at cell edges
+        centre = self.centres[feature]
+        dx = np.maximum(np.maximum(x * self.cell_width - centre[:, 0], centre[:, 0] - (x + 1) * self.cell_width), 0)
+        dy = np.maximum(np.maximum(y * self.cell_height - centre[:, 1], centre[:, 1] - (y + 1) * self.cell_height), 0)
+        touches = dx * dx + dy * dy < (reach[feature] + 1) ** 2
+        cell = (y * self.columns + x)[touches]
+        members = feature[touches][np.argsort(cell, kind='stable')]
+        counts = np.bincount(cell, minlength=self.columns * self.rows)
+        return np.cumsum(counts) - counts, counts, members
+
+    def pairs(self, positions, reach):
+        """Pairs (i, f) with position i strictly within ``reach[f]`` of
+        feature f's centre, plus the offset from the centre to i. Pairs are
+        ordered by i, then f, as a scan over every feature would find them."""
+        cell_start, counts, members = self.cell_lists(reach)
+        x, y = self.cell_coordinates(positions)
+        cell = y * self.columns + x
+        count = counts[cell]
+        i = np.repeat(np.arange(len(positions)), count)
+        k = np.arange(len(i)) - np.repeat(np.cumsum(count) - count, count)
+        f = members[np.repeat(cell_start[cell], count) + k]
+        offset = positions[i] - self.centres[f]
+        close = np.einsum('ij,ij->i', offset, offset) < reach[f] ** 2
+        return i[close], f[close], offset[close]
@@ -0,0 +1,120 @@
+import numpy as np
+
+class RingBuffer:
+    """Fixed-capacity FIFO of numbers in a preallocated NumPy array.
+
+    Appending overwrites the oldest value once full, and len(), indexing and
+    therefore first/last access are O(1); values() returns them oldest first.
+    With a ``shape`` every entry is an array of that shape instead.
+    """
+
+    def __init__(self, capacity, dtype=np.int64, shape=()):
+        self.data = np.zeros((capacity,) + tuple(shape), dtype=dtype)
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if not -self.size <= index < self.size:
+            raise IndexError("ring buffer index out of range")
+        return self.data[(self.start + index % self.size) % len(self.data)]
+
+    def __iter__(self):
+        return iter(self.values())
+
+    def append(self, value):
+        capacity = len(self.data)
+        self.data[(self.start + self.size) % capacity] = value
+        if self.size < capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % capacity
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def clear(self):
+        self.start = 0
+        self.size = 0
+
+    def values(self):
+        end = self.start + self.size
+        if end <= len(self.data):
+            return self.data[self.start:end].copy()
+        return np.concatenate((self.data[self.start:], self.data[:end - len(self.data)]))
+
+class SpeciesStatistics:
+    """Running aggregates for one species and its population history.
+
+    ``count``, ``energy_sum`` and ``age_sum`` describe the live agents after
+    the latest tick; ``births``, ``deaths`` and ``kills`` (prey caught, so
+    predators only) are totals since the last reset. The engine folds each
+    tick in with tick(), so reading any of them, or the means, costs O(1).
+    The count is sampled into ``history`` every ``history_interval`` ticks.
+    """
+
+    def __init__(self, history_length, history_interval=1):
+        self.history = RingBuffer(history_length)
+        self.history_interval = history_interval
+        self.reset()
+
+    def reset(self, count=0, energy_sum=0.0, age_sum=0):
+        self.count = count
+        self.energy_sum = energy_sum
+        self.age_sum = age_sum
+        self.births = 0
+        self.deaths = 0
+        self.kills = 0
+        self.history.clear()
+
+    @property
+    def mean_energy(self):
+        return self.energy_sum / self.count if self.count else 0.0
+
+    @property
+    def mean_age(self):
+        return self.age_sum / self.count if self.count else 0.0
+
+    def tick(self, tick, count, energy_sum, age_sum, births, deaths, kills=0):
+        self.count = count
+        self.energy_sum = energy_sum
+        self.age_sum = age_sum
+        self.births += births
+        self.deaths += deaths
+        self.kills += kills
+        if tick % self.history_interval == 0:
+            self.history.append(count)
+
+    def totals(self):
+        return {'births': self.births, 'deaths': self.deaths, 'kills': self.kills}
+
+    def set_totals(self, totals):
+        self.births = totals['births']
+        self.deaths = totals['deaths']
+        self.kills = totals['kills']
+
+def trend(history):
+    return history[-1] - history[0] if len(history) > 1 else 0
+
+def summary(prey, predator):
+    """The viewer's statistics from the prey and predator SpeciesStatistics."""
+    return {
+        'prey': prey.count,
+        'predators': predator.count,
+        'prey_energy': prey.mean_energy,
+        'predator_energy': predator.mean_energy,
+        'prey_age': prey.mean_age,
+        'predator_age': predator.mean_age,
+    }
+
+def population_sums(population):
+    """(count, energy sum, age sum) of a Population's live rows."""
+    n = population.count
+    return n, float(population.energy[:n].sum()), int(population.age[:n].sum(dtype=np.int64))
+
+def agent_sums(agents):
+    """(count, energy sum, age sum) of a list of agents."""
+    return len(agents), float(sum(agent.energy for agent in agents)), sum(agent.age for agent in agents)
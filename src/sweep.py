@@ -0,0 +1,127 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from simulation import VectorSimulation
+import argparse
+import csv
+import itertools
+import numpy as np
+import os
+
+# The viewer's slider parameters, as "species.attribute"
+SLIDER_PARAMETERS = (
+    'prey.energy_decay_rate',
+    'prey.energy_gain_rate',
+    'predator.energy_decay_rate',
+    'predator.energy_gain_from_prey',
+    'predator.reproduction_threshold',
+)
+
+def parse_values(text):
+    """'a:b:n' is n evenly spaced values from a to b, 'x,y,z' is a list."""
+    if ':' in text:
+        start, stop, num = text.split(':')
+        return [float(value) for value in np.linspace(float(start), float(stop), int(num))]
+    return [float(value) for value in text.split(',')]
+
+def parse_ranges(arguments):
+    """{name: [values]} from NAME=VALUES command-line arguments."""
+    ranges = {}
+    for argument in arguments:
+        name, _, values = argument.partition('=')
+        ranges[name] = parse_values(values)
+    return ranges
+
+def parameter_grid(ranges):
+    """Every combination of the values in ``ranges`` ({name: [values]})."""
+    names = list(ranges)
+    return [dict(zip(names, values)) for values in itertools.product(*(ranges[name] for name in names))]
+
+def apply_parameters(simulation, parameters):
+    species = {'prey': {}, 'predator': {}}
+    for name, value in parameters.items():
+        population, attribute = name.split('.', 1)
+        if population not in species:
+            raise ValueError(f"Unknown species in parameter: {name}")
+        if attribute == 'reproduction_threshold':
+            value = int(value)
+        species[population][attribute] = value
+    simulation.prey.set_parameters(species['prey'])
+    simulation.predator.set_parameters(species['predator'])
+
+def run_replicate(task):
+    """Run one headless simulation; executed inside a pool worker."""
+    simulation = VectorSimulation(seed=task['seed'], **task['world'])
+    apply_parameters(simulation, task['parameters'])
+
+    samples = task['ticks'] // task['interval'] + 1
+    prey = np.zeros(samples, dtype=np.int32)
+    predators = np.zeros(samples, dtype=np.int32)
+    prey[0] = simulation.prey.count
+    predators[0] = simulation.predator.count
+    for sample in range(1, samples):
+        simulation.step(task['interval'])
+        prey[sample] = simulation.prey.count
+        predators[sample] = simulation.predator.count
+    return task, prey, predators
+
+def run_sweep(ranges, out_dir, replicates=1, ticks=5000, interval=10, seed=0, workers=None, world=None,
+              parameters=None):
+    """Run every parameter combination ``replicates`` times across a process
+    pool and write each run's population series to ``out_dir``.
+
+    ``ranges`` maps "prey.<attribute>" / "predator.<attribute>" names to lists
+    of values; ``parameters`` holds fixed values in the same naming that every
+    run starts from. Each run's series is saved as run_<index>.npz and
+    summarised in runs.csv; returns the path of runs.csv.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    seeds = np.random.SeedSequence(seed).generate_state(len(parameter_grid(ranges)) * replicates)
+    tasks = []
+    for combination in parameter_grid(ranges):
+        for replicate in range(replicates):
+            tasks.append({
+                'run': len(tasks),
+                'replicate': replicate,
+                'seed': int(seeds[len(tasks)]),
+                'parameters': dict(parameters or {}, **combination),
+                'ticks': ticks,
+                'interval': interval,
+                'world': world or {},
+            })
+
+    summary_path = os.path.join(out_dir, 'runs.csv')
+    names = list(ranges)
+    with open(summary_path, 'w', newline='') as summary_file, ProcessPoolExecutor(max_workers=workers) as pool:
+        summary = csv.writer(summary_file)
+        summary.writerow(['run', 'replicate', 'seed'] + names + ['final_prey', 'final_predators', 'file'])
+        futures = [pool.submit(run_replicate, task) for task in tasks]
+        for future in as_completed(futures):
+            task, prey, predators = future.result()
+            filename = f"run_{task['run']:05d}.npz"
+            np.savez_compressed(os.path.join(out_dir, filename), tick=np.arange(len(prey)) * task['interval'],
+                                prey=prey, predators=predators)
+            summary.writerow([task['run'], task['replicate'], task['seed']] +
+                             [task['parameters'][name] for name in names] +
+                             [prey[-1], predators[-1], filename])
+            summary_file.flush()
+    return summary_path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep species parameters over headless replicate runs.")
+    parser.add_argument('parameters', nargs='+', metavar='NAME=VALUES',
+                        help="e.g. prey.energy_gain_rate=0.05:0.3:6 or predator.reproduction_threshold=3,6,9; "
+                             "slider parameters: " + ', '.join(SLIDER_PARAMETERS))
+    parser.add_argument('--out', default='sweep_output')
+    parser.add_argument('--replicates', type=int, default=1)
+    parser.add_argument('--ticks', type=int, default=5000)
+    parser.add_argument('--interval', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    ranges = parse_ranges(args.parameters)
+    path = run_sweep(ranges, args.out, replicates=args.replicates, ticks=args.ticks, interval=args.interval,
+                     seed=args.seed, workers=args.workers)
+    print(f"Wrote {path}")
+
+if __name__ == "__main__":
+    main()
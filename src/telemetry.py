@@ -0,0 +1,272 @@
+from recorder import RECORD_DTYPE
+import csv
+import json
+import numpy as np
+import os
+import queue
+import socket
+import threading
+import time
+
+OVERFLOW_POLICIES = ('block', 'drop', 'sample')
+# Energy histogram edges; the last bin also takes anything above max_energy
+ENERGY_BINS = np.linspace(0, 300, 16, endpoint=False)
+# Age histogram edges, doubling, with an open last bin
+AGE_BINS = np.concatenate(([0], 2 ** np.arange(15)))
+SPECIES = ('prey', 'predator')
+# One sampled agent: the trajectory record plus when and what it was
+SAMPLE_DTYPE = np.dtype([('tick', '<i8'), ('species', 'u1')] + RECORD_DTYPE.descr)
+
+def histogram(values, edges):
+    """Counts of ``values`` in [edges[b], edges[b + 1]); the first bin also
+    takes values below edges[0] and the last everything from edges[-1] on."""
+    bins = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 1)
+    return np.bincount(bins, minlength=len(edges))
+
+def species_columns(simulation):
+    """(energy, age) arrays of the live agents of each species."""
+    if hasattr(simulation, 'prey_list'):
+        return [(np.array([agent.energy for agent in agents], dtype=float),
+                 np.array([agent.age for agent in agents], dtype=np.int64))
+                for agents in (simulation.prey_list, simulation.predator_list)]
+    return [(population.energy[:population.count], population.age[:population.count])
+            for population in (simulation.prey, simulation.predator)]
+
+class CSVSink:
+    """Appends telemetry rows to ``path``, one column per value and one per
+    histogram bin. Agent samples go to a second file, <name>_agents.csv."""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        stem, _ = os.path.splitext(path)
+        self.agents_path = stem + '_agents.csv'
+        self.agents_file = None
+        self.names = None
+
+    def write(self, columns, agents):
+        if self.names is None:
+            self.names = list(columns)
+            header = []
+            for name in self.names:
+                width = columns[name].shape[1] if columns[name].ndim > 1 else 0
+                header += [f'{name}_{b}' for b in range(width)] if width else [name]
+            self.writer.writerow(header)
+        # Column by column, so integer columns are not written as floats
+        parts = [columns[name].reshape(len(columns[name]), -1).tolist() for name in self.names]
+        self.writer.writerows([value for part in row for value in part] for row in zip(*parts))
+        self.file.flush()
+        if len(agents):
+            if self.agents_file is None:
+                self.agents_file = open(self.agents_path, 'w', newline='')
+                self.agents_writer = csv.writer(self.agents_file)
+                self.agents_writer.writerow(['tick', 'species', 'x', 'y', 'vx', 'vy', 'energy', 'age', 'alive'])
+            self.agents_writer.writerows(zip(agents['tick'].tolist(), (SPECIES[s] for s in agents['species']),
+                                             *agents['position'].T.tolist(), *agents['velocity'].T.tolist(),
+                                             agents['energy'].tolist(), agents['age'].tolist(),
+                                             agents['alive'].tolist()))
+            self.agents_file.flush()
+
+    def close(self):
+        self.file.close()
+        if self.agents_file is not None:
+            self.agents_file.close()
+
+class NPZSink:
+    """Writes every batch as one compressed chunk_<n>.npz of column arrays
+    (plus the batch's agent samples, if any) in ``directory``."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunks = 0
+
+    def write(self, columns, agents):
+        path = os.path.join(self.directory, f'chunk_{self.chunks:05d}.npz')
+        np.savez_compressed(path, agents=agents, **columns)
+        self.chunks += 1
+
+    def close(self):
+        pass
+
+class SocketSink:
+    """Streams rows as newline-delimited JSON to a TCP listener, such as a
+    local dashboard; a batch's agent samples follow as one {"agents": ...}
+    line of per-field lists."""
+
+    def __init__(self, host, port):
+        self.socket = socket.create_connection((host, port))
+
+    def write(self, columns, agents):
+        lines = [json.dumps({name: values[row].tolist() for name, values in columns.items()})
+                 for row in range(len(columns['tick']))]
+        if len(agents):
+            lines.append(json.dumps({'agents': {name: agents[name].tolist() for name in SAMPLE_DTYPE.names}}))
+        self.socket.sendall(('\n'.join(lines) + '\n').encode())
+
+    def close(self):
+        self.socket.close()
+
+def open_sink(target):
+    """Sink for ``target``: tcp://host:port, a .csv file or an NPZ directory."""
+    if target.startswith('tcp://'):
+        host, _, port = target[len('tcp://'):].rpartition(':')
+        return SocketSink(host or 'localhost', int(port))
+    if target.endswith('.csv'):
+        return CSVSink(target)
+    return NPZSink(target)
+
+class Telemetry:
+    """Per-tick statistics of a running simulation, written to ``sink`` by a
+    background thread so the tick loop never waits on I/O.
+
+    Every ``interval`` ticks the engine hands over a row: population counts,
+    births, deaths and kills since the previous row, mean energy and age and
+    their histograms over ENERGY_BINS and AGE_BINS. With ``agent_samples``
+    the row also carries that many randomly chosen agents of each species
+    every ``sample_interval`` ticks. Rows are copies, so the simulation can
+    move on at once.
+
+    Rows wait in a queue of at most ``capacity`` and the writer passes them
+    to the sink in batches of up to ``batch`` rows, or whatever has arrived
+    after ``flush_seconds``. When the queue is full, ``overflow`` decides:
+    'block' waits for the writer (backpressure), 'drop' discards the row and
+    'sample' discards it and halves the row rate until the queue has drained
+    to a quarter. ``dropped`` counts discarded rows; births, deaths and kills
+    of a discarded row are carried into the next one that is written.
+    """
+
+    def __init__(self, simulation, sink, interval=1, agent_samples=0, sample_interval=100, capacity=1024,
+                 batch=256, flush_seconds=1.0, overflow='block', seed=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.simulation = simulation
+        self.sink = open_sink(sink) if isinstance(sink, str) else sink
+        self.interval = interval
+        self.agent_samples = agent_samples
+        self.sample_interval = sample_interval
+        self.capacity = capacity
+        self.batch = batch
+        self.flush_seconds = flush_seconds
+        self.overflow = overflow
+        # Agent sampling has its own stream so the simulation's draws are untouched
+        self.rng = np.random.default_rng(seed)
+        self.stride = 1
+        self.dropped = 0
+        self.written = 0
+        self.error = None
+        self.last_tick = None
+        self.totals = None
+        self.queue = queue.Queue(capacity)
+        self.thread = threading.Thread(target=self.write_loop, name='telemetry writer', daemon=True)
+        self.thread.start()
+        simulation.telemetry = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def collect(self, simulation):
+        """Called by the engine at the end of every tick."""
+        if self.error is not None:
+            raise self.error
+        tick = simulation.tick
+        if self.last_tick is not None and tick < self.last_tick:
+            self.totals = None  # the simulation was reset
+        self.last_tick = tick
+        if tick % (self.interval * self.stride):
+            return
+        totals = [statistics.totals() for statistics in (simulation.prey_stats, simulation.predator_stats)]
+        row = self.row(simulation, totals)
+        if self.put(row):
+            self.totals = totals
+        if self.overflow == 'sample' and self.stride > 1 and self.queue.qsize() <= self.capacity // 4:
+            self.stride //= 2
+
+    def row(self, simulation, totals):
+        previous = self.totals or [{'births': 0, 'deaths': 0, 'kills': 0}] * 2
+        row = {'tick': simulation.tick}
+        for species, count, statistics, columns, now, before in zip(
+                SPECIES, ('prey', 'predators'), (simulation.prey_stats, simulation.predator_stats),
+                species_columns(simulation), totals, previous):
+            energy, age = columns
+            row[count] = statistics.count
+            row[f'{species}_births'] = now['births'] - before['births']
+            row[f'{species}_deaths'] = now['deaths'] - before['deaths']
+            row[f'{species}_energy'] = statistics.mean_energy
+            row[f'{species}_age'] = statistics.mean_age
+            row[f'{species}_energy_histogram'] = histogram(energy, ENERGY_BINS)
+            row[f'{species}_age_histogram'] = histogram(age, AGE_BINS)
+        row['kills'] = totals[1]['kills'] - previous[1]['kills']
+        row['agents'] = self.sample_agents(simulation)
+        return row
+
+    def sample_agents(self, simulation):
+        if not self.agent_samples or simulation.tick % self.sample_interval:
+            return np.zeros(0, dtype=SAMPLE_DTYPE)
+        samples = []
+        for species, records in enumerate(simulation.records()):
+            chosen = self.rng.choice(len(records), min(self.agent_samples, len(records)), replace=False)
+            sample = np.zeros(len(chosen), dtype=SAMPLE_DTYPE)
+            sample['tick'] = simulation.tick
+            sample['species'] = species
+            for name in RECORD_DTYPE.names:
+                sample[name] = records[name][np.sort(chosen)]
+            samples.append(sample)
+        return np.concatenate(samples)
+
+    def put(self, row):
+        if self.overflow == 'block':
+            self.queue.put(row)
+            return True
+        try:
+            self.queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.overflow == 'sample':
+                self.stride *= 2
+            return False
+
+    def write_loop(self):
+        closing = False
+        while not closing:
+            rows = []
+            deadline = None
+            while len(rows) < self.batch:
+                try:
+                    timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                    row = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if row is None:
+                    closing = True
+                    break
+                rows.append(row)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+            if rows and self.error is None:
+                try:
+                    self.write(rows)
+                except Exception as error:
+                    # Keep draining so a blocked tick loop is never stuck
+                    self.error = error
+
+    def write(self, rows):
+        columns = {name: np.array([row[name] for row in rows]) for name in rows[0] if name != 'agents'}
+        self.sink.write(columns, np.concatenate([row['agents'] for row in rows]))
+        self.written += len(rows)
+
+    def close(self):
+        """Write out everything queued, stop the writer and close the sink."""
+        if not self.thread.is_alive():
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.sink.close()
+        if self.simulation.telemetry is self:
+            self.simulation.telemetry = None
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,96 @@
+import pygame
+
+# Colors
+PANEL_BACKGROUND = (230, 230, 250)
+TEXT_COLOR = (47, 79, 79)
+BUTTON_COLOR = (176, 196, 222)
+BUTTON_TEXT_COLOR = (25, 25, 112)
+SLIDER_COLOR = (176, 196, 222)
+SLIDER_HANDLE_COLOR = (70, 130, 180)
+
+class TextCache:
+    """Fonts by size and rendered text surfaces by (text, color, size).
+
+    Labels that never change are rendered once; numbers that do change
+    fill the cache until ``max_entries``, at which point it starts over.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.fonts = {}
+        self.surfaces = {}
+
+    def font(self, size):
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.Font(None, size)
+        return self.fonts[size]
+
+    def render(self, text, color, size=24):
+        key = (text, color, size)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            if len(self.surfaces) >= self.max_entries:
+                self.surfaces.clear()
+            surface = self.surfaces[key] = self.font(size).render(text, True, color)
+        return surface
+
+text_cache = TextCache()
+
+class Panel:
+    """Screen region that is only redrawn when the state it shows changes.
+
+    ``state`` is any comparable value (usually the tuple of displayed
+    strings); update() returns the rect to pass to pygame.display.update, or
+    None when nothing changed.
+    """
+
+    def __init__(self, x, y, width, height):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.state = None
+
+    def invalidate(self):
+        self.state = None
+
+    def update(self, screen, state, draw, *args):
+        if state is not None and state == self.state:
+            return None
+        self.state = state
+        draw(screen, *args)
+        return self.rect
+
+class Slider:
+    def __init__(self, x, y, width, height, min_val, max_val, initial_val, label):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.min_val = min_val
+        self.max_val = max_val
+        self.value = initial_val
+        self.label = label
+
+    def draw(self, screen):
+        pygame.draw.rect(screen, SLIDER_COLOR, self.rect)
+        pos = self.rect.x + int((self.value - self.min_val) / (self.max_val - self.min_val) * self.rect.width)
+        pygame.draw.line(screen, SLIDER_HANDLE_COLOR, (pos, self.rect.y), (pos, self.rect.y + self.rect.height), 4)
+        label = text_cache.render(f"{self.label}: {self.value:.2f}", TEXT_COLOR)
+        screen.blit(label, (self.rect.x, self.rect.y - 25))
+
+    def update(self, mouse_pos):
+        if self.rect.collidepoint(mouse_pos):
+            self.value = (mouse_pos[0] - self.rect.x) / self.rect.width * (self.max_val - self.min_val) + self.min_val
+            self.value = max(self.min_val, min(self.max_val, self.value))
+
+class Button:
+    def __init__(self, x, y, width, height, text, action):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.text = text
+        self.action = action
+
+    def draw(self, screen):
+        pygame.draw.rect(screen, BUTTON_COLOR, self.rect)
+        text = text_cache.render(self.text, BUTTON_TEXT_COLOR)
+        text_rect = text.get_rect(center=self.rect.center)
+        screen.blit(text, text_rect)
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            if self.rect.collidepoint(event.pos):
+                self.action()
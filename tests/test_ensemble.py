@@ -0,0 +1,13 @@
+from ensemble import run_ensemble
+import numpy as np
+
+
+def test_partial_batch():
+    results = run_ensemble([{}] * 5, ticks=10, interval=5, batch=2, workers=1)
+    assert results['prey'].shape == (3, 5)
+    assert len(results['seed']) == 5
+    assert np.all(results['prey'][0] > 0)
+
+def test_single_batch_smaller_than_batch_size():
+    results = run_ensemble([{}] * 3, ticks=10, interval=5, batch=1000, workers=1)
+    assert results['prey'].shape == (3, 3)
@@ -0,0 +1,33 @@
+from parallel import ParallelSimulation
+from simulation import VectorSimulation
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('sleep_interval', [1, 4])
+def test_matches_vector_simulation(sleep_interval):
+    world = dict(seed=4, width=1800, height=1200, num_prey=600, max_prey=5000, sleep_interval=sleep_interval)
+    serial = VectorSimulation(**world)
+    serial.step(200)
+    with ParallelSimulation(workers=2, **world) as parallel:
+        parallel.step(200)
+        for species in ('prey', 'predator'):
+            expected = getattr(serial, species)
+            actual = getattr(parallel, species)
+            assert actual.count == expected.count
+            np.testing.assert_array_equal(actual.position[:actual.count], expected.position[:expected.count])
+            np.testing.assert_array_equal(actual.energy[:actual.count], expected.energy[:expected.count])
+
+def test_profiler_merges_worker_timings():
+    world = dict(seed=4, num_prey=300, sleep_interval=4)
+    serial = VectorSimulation(**world)
+    serial.profiler.enable()
+    with ParallelSimulation(workers=2, **world) as parallel:
+        parallel.profiler.enable()
+        for simulation in (serial, parallel):
+            for _ in range(5):
+                simulation.step()
+                simulation.profiler.frame()
+        timings, counters = parallel.profiler.report()
+    assert 'prey.flock' in timings and 'prey.neighbours' in timings
+    assert counters == pytest.approx(serial.profiler.report()[1])
@@ -0,0 +1,21 @@
+from scenario import build_simulation, load_scenario
+import os
+import pytest
+
+DEFAULT = os.path.join(os.path.dirname(__file__), '..', 'scenarios', 'default.toml')
+
+
+@pytest.mark.parametrize('engine', ['vector', 'parallel', 'ensemble'])
+def test_default_scenario_builds_on_array_engines(engine):
+    simulation = build_simulation(load_scenario(DEFAULT), engine)
+    try:
+        simulation.step(2)
+    finally:
+        if hasattr(simulation, 'close'):
+            simulation.close()
+
+def test_unknown_world_setting():
+    scenario = load_scenario(DEFAULT)
+    scenario['world']['num_rocks'] = 3
+    with pytest.raises(ValueError, match='num_rocks'):
+        build_simulation(scenario, 'parallel')
@@ -0,0 +1,38 @@
+from scheduler import Scheduler
+import time
+
+
+class SlowSimulation:
+    """Stands in for a world that takes ``seconds`` per tick."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.tick = 0
+
+    def step(self, ticks=1):
+        for _ in range(ticks):
+            time.sleep(self.seconds)
+            self.tick += 1
+
+def test_fast_forward_keeps_publishing():
+    simulation = SlowSimulation(0.005)
+    scheduler = Scheduler(simulation, lambda simulation: simulation.tick, speed=100, publish_rate=20)
+    scheduler.start()
+    time.sleep(0.5)
+    started = time.perf_counter()
+    scheduler.stop()
+    assert time.perf_counter() - started < 0.2
+    # A single backlog step would have published once at most
+    assert scheduler.published >= 5
+    assert scheduler.snapshot > 0
+
+def test_commands_run_during_backlog():
+    simulation = SlowSimulation(0.005)
+    scheduler = Scheduler(simulation, lambda simulation: simulation.tick, speed=100, publish_rate=20)
+    scheduler.start()
+    time.sleep(0.2)
+    ran = []
+    scheduler.submit(lambda: ran.append(simulation.tick))
+    time.sleep(0.15)
+    scheduler.stop()
+    assert ran